@@ -0,0 +1,23 @@
+# Generated by Django 5.2.10 on 2026-10-18 11:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='avatar_bytes',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='avatar_original_bytes',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -1,10 +1,26 @@
 from django.contrib.auth.models import AbstractUser
+from django.core.files.uploadedfile import UploadedFile
 from django.db import models
+from listings.image_ingest import AVATAR, ingest
 
 class User(AbstractUser):
     school = models.CharField(max_length=200, blank=True)
     grad_year = models.IntegerField(null=True, blank=True)
     avatar = models.ImageField(upload_to='avatars/', null=True, blank=True)
+    # Avatar size before and after normalization
+    avatar_original_bytes = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    avatar_bytes = models.PositiveIntegerField(null=True, blank=True, editable=False)
     
     def __str__(self):
-        return self.email or self.username
\ No newline at end of file
+        return self.email or self.username
+    
+    def save(self, *args, **kwargs):
+        # An uncommitted avatar is a fresh upload that hasn't been written to storage yet
+        if self.avatar and not self.avatar._committed and isinstance(self.avatar.file, UploadedFile):
+            normalized, self.avatar_original_bytes, self.avatar_bytes = ingest(self.avatar.file, AVATAR)
+            self.avatar.file = normalized
+            self.avatar.name = normalized.name
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'avatar_original_bytes', 'avatar_bytes'}
+        super().save(*args, **kwargs)
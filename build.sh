@@ -1,3 +1,4 @@
 #!/bin/bash
 pip install -r requirements.txt
 python manage.py collectstatic --noinput --clear
+python manage.py createcachetable
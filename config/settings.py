@@ -1,4 +1,5 @@
 import os
+import tempfile
 from pathlib import Path
 from dotenv import load_dotenv
 import dj_database_url
@@ -37,6 +38,7 @@ INSTALLED_APPS = [
     # Third-party
     'cloudinary_storage',
     'cloudinary',
+    'django_celery_beat',
 
     # Local apps
     'accounts',
@@ -71,6 +73,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'listings.context_processors.unread_messages',
             ],
         },
     },
@@ -89,6 +92,71 @@ DATABASES = {
     )
 }
 
+# Background threads also write; IMMEDIATE transactions wait for SQLite's lock instead of failing
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    DATABASES['default'].setdefault('OPTIONS', {}).update({'transaction_mode': 'IMMEDIATE', 'timeout': 20})
+
+
+# Cache (Redis in production)
+# Search-cache generations, the autocomplete change log and unread badges are state
+# every process has to see, so without Redis the database holds them (run
+# createcachetable). Per-process memory is only for DEBUG's single runserver process.
+# Decided here, not from DEBUG at check time: the test runner turns DEBUG off later
+ALLOW_PROCESS_LOCAL_CACHE = DEBUG
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+elif ALLOW_PROCESS_LOCAL_CACHE:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'django_cache',
+        }
+    }
+
+# Seconds a cached search count stays valid (entries are also invalidated on any listing change)
+SEARCH_CACHE_TIMEOUT = int(os.getenv('SEARCH_CACHE_TIMEOUT', '900'))
+SEARCH_CACHE_STATS = os.getenv('SEARCH_CACHE_STATS', 'True') == 'True'
+
+# Seconds a user's cached unread-message count lives (reconcile_unread_counts fixes drift sooner)
+UNREAD_COUNT_TIMEOUT = int(os.getenv('UNREAD_COUNT_TIMEOUT', '86400'))
+
+# Listing-to-campus distances are only stored within this radius
+CAMPUS_DISTANCE_CUTOFF_MILES = float(os.getenv('CAMPUS_DISTANCE_CUTOFF_MILES', '25'))
+
+# Background work (geocoding etc.) runs on a small thread pool; eager runs it inline.
+# One worker by default: Nominatim allows one request a second and SQLite one writer.
+BACKGROUND_WORKERS = int(os.getenv('BACKGROUND_WORKERS', '1'))
+BACKGROUND_TASKS_EAGER = os.getenv('BACKGROUND_TASKS_EAGER', 'False') == 'True'
+# Photo uploads have their own pool: they are network-bound and only write their own row
+UPLOAD_WORKERS = int(os.getenv('UPLOAD_WORKERS', '4'))
+
+# Geocoding
+# Use 'listings.geocoding.FileGeocoder' with GEOCODER_FILE for offline runs and tests
+GEOCODER_BACKEND = os.getenv('GEOCODER_BACKEND', 'listings.geocoding.NominatimGeocoder')
+GEOCODER_USER_AGENT = os.getenv('GEOCODER_USER_AGENT', 'pillowhousing')
+GEOCODER_FILE = os.getenv('GEOCODER_FILE', str(BASE_DIR / 'geocodes.json'))
+# Off unless enabled, so dev, tests and CI never call out to Nominatim from the web process;
+# production sets GEOCODE_ON_SAVE=True (geocode_listings catches up on anything missed)
+GEOCODE_ON_SAVE = os.getenv('GEOCODE_ON_SAVE', 'False') == 'True'
+# "Not found" answers are asked again after this many days, in case the miss was transient
+GEOCODE_MISS_TTL_DAYS = int(os.getenv('GEOCODE_MISS_TTL_DAYS', '7'))
+
+# Listing photos wait here between the request and their background upload.
+# Must be persistent and shared by the web processes and the worker running the
+# retry-lost-uploads job; the temp-dir default is only good for development.
+UPLOAD_SPOOL_DIR = os.getenv('UPLOAD_SPOOL_DIR', os.path.join(tempfile.gettempdir(), 'pillowhousing-uploads'))
+
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -110,7 +178,6 @@ USE_TZ = True
 STATIC_URL = '/static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 STATICFILES_DIRS = [BASE_DIR / 'static']
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
 
 # Media files
@@ -125,8 +192,26 @@ CLOUDINARY_STORAGE = {
     'API_SECRET': os.getenv('CLOUDINARY_API_SECRET', '')
 }
 
-if CLOUDINARY_STORAGE['CLOUD_NAME']:
-    DEFAULT_FILE_STORAGE = 'cloudinary_storage.storage.MediaCloudinaryStorage'
+USE_CLOUDINARY = bool(CLOUDINARY_STORAGE['CLOUD_NAME'])
+
+
+# Storages
+# Without Cloudinary, media (listing photos included) is kept locally by content
+# hash and served by the app with immutable caching; MEDIA_STORAGE_BACKEND overrides.
+STORAGES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'MEDIA_STORAGE_BACKEND',
+            'cloudinary_storage.storage.MediaCloudinaryStorage' if USE_CLOUDINARY else 'listings.storage.ContentAddressedStorage',
+        ),
+    },
+    # Plain storage, as before STORAGES: the manifest variant needs collectstatic to have run,
+    # which tests and local DEBUG=False runs don't do. Deployments can opt in here.
+    'staticfiles': {
+        'BACKEND': os.getenv('STATICFILES_BACKEND', 'django.contrib.staticfiles.storage.StaticFilesStorage'),
+    },
+}
+SERVE_MEDIA = STORAGES['default']['BACKEND'] == 'listings.storage.ContentAddressedStorage'
 
 
 # Default primary key field type
@@ -158,6 +243,39 @@ EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER', '')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD', '')
 DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', 'Pillow Housing <noreply@pillowhousing.com>')
 
+# Celery (scheduled jobs in listings/jobs.py)
+# Without a broker, tasks run inline; use `manage.py run_scheduler` locally instead of beat
+CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL') or os.getenv('REDIS_URL') or 'memory://'
+CELERY_TASK_ALWAYS_EAGER = CELERY_BROKER_URL == 'memory://'
+CELERY_TIMEZONE = TIME_ZONE
+CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
+# Schedules are in seconds
+CELERY_BEAT_SCHEDULE = {
+    'expire-boosts': {
+        'task': 'listings.tasks.expire_boosts',
+        'schedule': 300,
+    },
+    'auto-pause-listings': {
+        'task': 'listings.tasks.auto_pause_listings',
+        'schedule': 3600,
+    },
+    'refresh-rank-scores': {
+        'task': 'listings.tasks.refresh_rank_scores',
+        'schedule': 86400,
+    },
+    'reconcile-unread-counts': {
+        'task': 'listings.tasks.reconcile_unread_counts',
+        'schedule': 3600,
+    },
+    'retry-lost-uploads': {
+        'task': 'listings.tasks.retry_lost_uploads',
+        'schedule': 900,
+    },
+}
+
+# Absolute links in emails sent outside a request (search alerts)
+SITE_URL = os.getenv('SITE_URL', 'http://localhost:8000').rstrip('/')
+
 
 # Production Security Settings
 if not DEBUG:
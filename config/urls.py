@@ -3,6 +3,7 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib.auth import views as auth_views
+from listings.views import serve_media
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -15,6 +16,11 @@ urlpatterns = [
     path('payments/', include('payments.urls')),
 ]
 
-if settings.DEBUG:
+if settings.SERVE_MEDIA:
+    # Local content-addressed media, served with immutable caching in any environment
+    urlpatterns += [path(f'{settings.MEDIA_URL.lstrip("/")}<path:name>', serve_media, name='media')]
+elif settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+
+if settings.DEBUG:
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
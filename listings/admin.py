@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Listing, ListingImage, SavedListing, ContactMessage, Campus
+from .duplicates import similar_images
+from .models import Listing, ListingImage, SavedListing, ContactMessage, Campus, GeocodeCache, SavedSearch, arrange_images
 
 class ListingImageInline(admin.TabularInline):
     model = ListingImage
@@ -13,6 +14,27 @@ class ListingAdmin(admin.ModelAdmin):
     inlines = [ListingImageInline]
     readonly_fields = ['created_at', 'updated_at']
     
+    def save_formset(self, request, form, formset, change):
+        if formset.model is not ListingImage:
+            return super().save_formset(request, form, formset, change)
+        # Order and primary are applied together by arrange_images, not row by row
+        chosen = []
+        for index, image_form in enumerate(formset.forms):
+            if image_form in formset.deleted_forms or not (image_form.instance.pk or image_form.has_changed()):
+                continue
+            data = image_form.cleaned_data
+            chosen.append((data.get('order', 0), index, image_form.instance, data.get('is_primary', False)))
+        chosen.sort(key=lambda entry: entry[:2])
+        primary = next((image for order, index, image, is_primary in chosen if is_primary), None)
+        
+        for image in formset.save(commit=False):
+            image.is_primary = False
+            image.save()
+        for image in formset.deleted_objects:
+            image.delete()
+        formset.save_m2m()
+        arrange_images(form.instance, [image.pk for order, index, image, is_primary in chosen], primary and primary.pk)
+    
     fieldsets = (
         ('Basic Info', {
             'fields': ('owner', 'posting_type', 'listing_type', 'title', 'description', 'status')
@@ -56,8 +78,14 @@ class ListingAdmin(admin.ModelAdmin):
 
 @admin.register(ListingImage)
 class ListingImageAdmin(admin.ModelAdmin):
-    list_display = ['listing', 'is_primary', 'order', 'uploaded_at']
-    list_filter = ['is_primary', 'uploaded_at']
+    list_display = ['listing', 'is_primary', 'order', 'upload_status', 'original_bytes', 'stored_bytes', 'uploaded_at']
+    list_filter = ['is_primary', 'upload_status', 'uploaded_at']
+    readonly_fields = ['content_hash', 'perceptual_hash', 'similar_photos']
+    
+    @admin.display(description='Similar photos on other listings')
+    def similar_photos(self, obj):
+        matches = similar_images(obj)
+        return ', '.join(f'#{image.pk} on "{image.listing}" ({bits} bits apart)' for image, bits in matches) or '-'
 
 @admin.register(SavedListing)
 class SavedListingAdmin(admin.ModelAdmin):
@@ -74,5 +102,18 @@ class ContactMessageAdmin(admin.ModelAdmin):
 
 @admin.register(Campus)
 class CampusAdmin(admin.ModelAdmin):
-    list_display = ['school_name', 'city', 'state']
+    list_display = ['school_name', 'city', 'state', 'latitude', 'longitude']
     search_fields = ['school_name', 'city', 'state']
+
+@admin.register(SavedSearch)
+class SavedSearchAdmin(admin.ModelAdmin):
+    list_display = ['name', 'user', 'is_active', 'created_at']
+    list_filter = ['is_active', 'duration_type', 'listing_type', 'created_at']
+    search_fields = ['name', 'user__username']
+    readonly_fields = ['filters', 'location_prefix', 'duration_type', 'listing_type', 'beds', 'created_at']
+
+@admin.register(GeocodeCache)
+class GeocodeCacheAdmin(admin.ModelAdmin):
+    list_display = ['address_key', 'latitude', 'longitude', 'created_at']
+    search_fields = ['address_key']
+    readonly_fields = ['created_at']
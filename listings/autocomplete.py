@@ -0,0 +1,228 @@
+"""In-process prefix index for location autocomplete
+
+Suggestions (city, state, zip code, campus) are kept in a sorted list of
+(key, suggestion) pairs, one key per word start, so a lookup is a bisect
+plus a short scan. Each listing's contribution is remembered, which lets
+saves and deletes adjust the index in place instead of rebuilding it.
+
+Every process holds its own copy. Each change is published to the cache
+under a new shared version number, so other processes replay the changes
+they have missed in order. Only a gap in that log (an evicted entry, or too
+many changes to replay) leads to a rebuild, and that runs in the background
+while the current copy keeps answering.
+"""
+import bisect
+import threading
+import time
+from collections import Counter
+
+from django.core.cache import cache
+
+from .background import submit
+from .location_search import US_STATES, state_abbreviation, words
+from .models import Campus, Listing
+
+
+VERSION_KEY = 'listings:autocomplete:version'
+CHANGE_KEY = 'listings:autocomplete:change:%d'
+# Seconds between checks of the shared version
+VERSION_CHECK_INTERVAL = 5
+# Changes are kept this long; a process further behind rebuilds instead
+CHANGE_LOG_TIMEOUT = 3600
+MAX_REPLAY = 1000
+MAX_SCAN = 200
+DEFAULT_LIMIT = 8
+
+# Shown first for equally popular suggestions
+KIND_ORDER = {'campus': 0, 'city': 1, 'zip': 2, 'state': 3}
+
+
+def listing_suggestions(listing):
+    """(kind, label) pairs a searchable listing contributes"""
+    if listing.status != 'active' or listing.posting_type != 'offering':
+        return frozenset()
+    suggestions = set()
+    abbreviation = state_abbreviation(listing.state)
+    city = ' '.join(words(listing.city)).title()
+    if city:
+        suggestions.add(('city', f'{city}, {abbreviation.upper()}' if abbreviation else city))
+    if abbreviation in US_STATES:
+        suggestions.add(('state', US_STATES[abbreviation].title()))
+    zip_digits = ''.join(words(listing.zip_code))[:5]
+    if zip_digits:
+        suggestions.add(('zip', zip_digits))
+    return frozenset(suggestions)
+
+
+def campus_suggestions(campus):
+    return frozenset([('campus', ' '.join(campus.school_name.split()))])
+
+
+def suggestion_keys(suggestion):
+    """Each word start of the label, so "york" finds "New York, NY" """
+    label_words = words(suggestion[1])
+    return [' '.join(label_words[i:]) for i in range(len(label_words))]
+
+
+class LocationIndex:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.keys = []
+        self.counts = Counter()
+        self.contributions = {}
+        self.version = None
+        self.checked_at = 0
+        self.rebuilding = False
+        # Version of a change found missing from the log at the last check
+        self.missing = None
+
+    def build(self):
+        # Read first: changes published during the scan are replayed afterwards
+        version = get_version()
+        contributions = {}
+        fields = ['pk', 'city', 'state', 'zip_code', 'status', 'posting_type']
+        for listing in Listing.objects.filter(status='active', posting_type='offering').only(*fields).iterator():
+            contributions[('listing', listing.pk)] = listing_suggestions(listing)
+        for campus in Campus.objects.all():
+            contributions[('campus', campus.pk)] = campus_suggestions(campus)
+
+        counts = Counter(suggestion for suggestions in contributions.values() for suggestion in suggestions)
+        keys = sorted((key, suggestion) for suggestion in counts for key in suggestion_keys(suggestion))
+        with self.lock:
+            self.contributions = contributions
+            self.counts = counts
+            self.keys = keys
+            self.version = version
+            self.checked_at = time.monotonic()
+            self.missing = None
+
+    def rebuild(self):
+        try:
+            self.build()
+        finally:
+            self.rebuilding = False
+
+    def ensure_current(self):
+        if self.version is None:
+            # Nothing to answer from yet, so the first build has to happen here
+            self.build()
+            return
+        if time.monotonic() - self.checked_at < VERSION_CHECK_INTERVAL:
+            return
+        self.checked_at = time.monotonic()
+        version = self.version
+        current = get_version()
+        if current == version:
+            return
+        changes = read_changes(version, current)
+        with self.lock:
+            if self.version != version:
+                # Another thread moved the index on meanwhile; check again next time
+                return
+            for owner, suggestions in changes or []:
+                self.apply(owner, suggestions)
+            self.version = version + len(changes or [])
+            if self.version == current:
+                return
+            # A change can be missing for a moment between its version bump
+            # and its write; missing at two checks in a row, it is gone
+            if changes is not None and (changes or self.missing != self.version):
+                self.missing = self.version
+                return
+            if self.rebuilding:
+                return
+            self.rebuilding = True
+        submit(self.rebuild)
+
+    def apply(self, owner, suggestions):
+        """Replace what ``owner`` contributes in this copy; the caller holds the lock"""
+        old = self.contributions.pop(owner, frozenset())
+        if suggestions:
+            self.contributions[owner] = suggestions
+        for suggestion in old - suggestions:
+            self.counts[suggestion] -= 1
+            if not self.counts[suggestion]:
+                del self.counts[suggestion]
+                for key in suggestion_keys(suggestion):
+                    position = bisect.bisect_left(self.keys, (key, suggestion))
+                    if position < len(self.keys) and self.keys[position] == (key, suggestion):
+                        del self.keys[position]
+        for suggestion in suggestions - old:
+            if not self.counts[suggestion]:
+                for key in suggestion_keys(suggestion):
+                    bisect.insort(self.keys, (key, suggestion))
+            self.counts[suggestion] += 1
+        return old != suggestions
+
+    def update(self, owner, suggestions):
+        """Replace what ``owner`` (('listing', pk) or ('campus', pk)) contributes, here and everywhere"""
+        with self.lock:
+            # Not built in this process yet: the first lookup builds it, but
+            # processes that are built still need to hear about the change
+            if self.version is not None and not self.apply(owner, suggestions):
+                return
+            version = publish_change(owner, suggestions)
+            # Anything but our own increment means other changes to replay first
+            if self.version is not None and version == self.version + 1:
+                self.version = version
+
+    def suggest(self, query, limit=DEFAULT_LIMIT):
+        prefix = ' '.join(words(query))
+        if not prefix:
+            return []
+        self.ensure_current()
+        with self.lock:
+            position = bisect.bisect_left(self.keys, (prefix,))
+            matches = set()
+            for key, suggestion in self.keys[position:position + MAX_SCAN]:
+                if not key.startswith(prefix):
+                    break
+                matches.add(suggestion)
+            ranked = sorted(matches, key=lambda s: (-self.counts[s], KIND_ORDER[s[0]], s[1]))
+        return [{'label': label, 'kind': kind} for kind, label in ranked[:limit]]
+
+
+def get_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, int(time.time()), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump_version():
+    try:
+        return cache.incr(VERSION_KEY)
+    except ValueError:
+        return get_version()
+
+
+def publish_change(owner, suggestions):
+    version = bump_version()
+    # add() refuses a version another process was also handed (DatabaseCache's
+    # incr is not atomic), so two changes never share a log entry
+    while not cache.add(CHANGE_KEY % version, (owner, suggestions), CHANGE_LOG_TIMEOUT):
+        version = bump_version()
+    return version
+
+
+def read_changes(version, current):
+    """The logged changes after ``version`` in order, up to the first missing one
+
+    None when the log cannot help: more than MAX_REPLAY behind, or a version
+    counter that went backwards (it was evicted and seeded again).
+    """
+    if not 0 < current - version <= MAX_REPLAY:
+        return None
+    keys = [CHANGE_KEY % number for number in range(version + 1, current + 1)]
+    found = cache.get_many(keys)
+    changes = []
+    for key in keys:
+        if key not in found:
+            break
+        changes.append(found[key])
+    return changes
+
+
+location_index = LocationIndex()
@@ -0,0 +1,54 @@
+"""Small in-process thread pools for work that must stay off the request path
+
+With BACKGROUND_TASKS_EAGER the task runs inline instead, which keeps tests
+and management commands deterministic.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections
+
+
+logger = logging.getLogger(__name__)
+
+# Pool name -> setting holding its worker count. Photo uploads get a pool of
+# their own so they run side by side and never queue behind geocoding.
+POOL_SIZES = {
+    'default': 'BACKGROUND_WORKERS',
+    'uploads': 'UPLOAD_WORKERS',
+}
+
+_executors = {}
+_lock = threading.Lock()
+
+
+def get_executor(pool='default'):
+    with _lock:
+        if pool not in _executors:
+            _executors[pool] = ThreadPoolExecutor(
+                max_workers=getattr(settings, POOL_SIZES[pool]),
+                thread_name_prefix=f'listings-{pool}',
+            )
+    return _executors[pool]
+
+
+def _run(func, args, kwargs):
+    try:
+        return func(*args, **kwargs)
+    except Exception:
+        logger.exception('Background task %s failed', getattr(func, '__name__', func))
+    finally:
+        # Worker threads open their own connections; don't leave them dangling
+        connections.close_all()
+
+
+def submit(func, *args, **kwargs):
+    return submit_to('default', func, *args, **kwargs)
+
+
+def submit_to(pool, func, *args, **kwargs):
+    if settings.BACKGROUND_TASKS_EAGER:
+        return func(*args, **kwargs)
+    return get_executor(pool).submit(_run, func, args, kwargs)
@@ -0,0 +1,75 @@
+"""Maintenance of the CampusDistance table
+
+Rows exist only for listing/campus pairs within CAMPUS_DISTANCE_CUTOFF_MILES,
+so "near my school" searches read a short index range instead of computing
+distances against every listing.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from .geo import cells_query, covering_cells, distance_miles, radius_bbox
+from .models import Campus, CampusDistance, Listing, ListingSearchDocument
+
+
+def within_cutoff(queryset, latitude, longitude, geohash_field=None):
+    """Filter rows with latitude/longitude columns to those within the cutoff, annotated with miles"""
+    cutoff = settings.CAMPUS_DISTANCE_CUTOFF_MILES
+    south, west, north, east = bbox = radius_bbox(latitude, longitude, cutoff)
+    query = Q(latitude__range=(south, north), longitude__range=(west, east))
+    if geohash_field:
+        query &= cells_query(covering_cells(*bbox), geohash_field)
+    return queryset.filter(query).annotate(
+        miles=distance_miles(latitude, longitude)
+    ).filter(miles__lte=cutoff)
+
+
+@transaction.atomic
+def refresh_listing(listing):
+    """Recompute the distances for one listing after its coordinates change"""
+    CampusDistance.objects.filter(listing=listing).delete()
+    if listing.latitude is None or listing.longitude is None:
+        return 0
+
+    campuses = within_cutoff(
+        Campus.objects.filter(latitude__isnull=False, longitude__isnull=False),
+        listing.latitude, listing.longitude,
+    )
+    rows = CampusDistance.objects.bulk_create([
+        CampusDistance(listing=listing, campus_id=campus.pk, miles=campus.miles)
+        for campus in campuses
+    ])
+    return len(rows)
+
+
+@transaction.atomic
+def refresh_campus(campus):
+    """Recompute the distances for one campus against every geocoded listing"""
+    CampusDistance.objects.filter(campus=campus).delete()
+    if campus.latitude is None or campus.longitude is None:
+        return 0
+
+    # The search index carries the geohash, so the candidate scan is an index range
+    documents = within_cutoff(
+        ListingSearchDocument.objects.all(),
+        campus.latitude, campus.longitude,
+        geohash_field='geohash',
+    )
+    rows = CampusDistance.objects.bulk_create([
+        CampusDistance(listing_id=listing_id, campus=campus, miles=miles)
+        for listing_id, miles in documents.values_list('listing_id', 'miles')
+    ], batch_size=500)
+    return len(rows)
+
+
+def refresh_listing_ids(listing_ids):
+    """Background entry point: reload the listings so the task sees committed coordinates"""
+    return sum(refresh_listing(listing) for listing in Listing.objects.filter(pk__in=listing_ids))
+
+
+def refresh_campus_ids(campus_ids):
+    return sum(refresh_campus(campus) for campus in Campus.objects.filter(pk__in=campus_ids))
+
+
+def refresh_all():
+    return sum(refresh_campus(campus) for campus in Campus.objects.all())
@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+
+PROCESS_LOCAL_CACHES = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """Counters in the cache (search generation, autocomplete version, unread badges) must be shared"""
+    backend = settings.CACHES.get('default', {}).get('BACKEND')
+    if settings.ALLOW_PROCESS_LOCAL_CACHE or backend not in PROCESS_LOCAL_CACHES:
+        return []
+    return [Error(
+        f'The default cache ({backend}) is private to each process.',
+        hint=(
+            'Each web worker and the celery worker would keep their own search-cache generation, '
+            'autocomplete version and unread-message counters. Set REDIS_URL or use a shared backend '
+            'such as DatabaseCache.'
+        ),
+        id='listings.E001',
+    )]
@@ -0,0 +1,16 @@
+from django.utils.functional import SimpleLazyObject
+
+from .unread import get_unread_count
+
+
+def unread_messages(request):
+    """unread_message_count for the nav badge, from the per-user cached counter"""
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return {}
+
+    def count():
+        return get_unread_count(user.pk)
+
+    # Lazy, like the auth processor's user: pages that don't show the badge never touch the cache
+    return {'unread_message_count': SimpleLazyObject(count)}
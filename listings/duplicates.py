@@ -0,0 +1,102 @@
+"""Exact and near-duplicate listing photos
+
+Every photo is fingerprinted at ingest (listings.image_ingest.fingerprint).
+Identical bytes are caught by content_hash and reuse the stored original.
+Near duplicates (the same photo resized, recompressed or lightly edited)
+have difference hashes a few bits apart. The hash is split into four
+indexed 16-bit bands: two hashes at most three bits apart must agree on at
+least one band, so an OR of four indexed equality lookups finds every
+candidate and the exact bit distance is checked in Python.
+"""
+from collections import defaultdict
+
+from django.db.models import Q
+
+from .image_derivatives import read_original
+from .image_ingest import HASH_BANDS, hash_bands
+from .models import ListingImage
+
+
+# The largest distance the band lookup is guaranteed to find
+MAX_DISTANCE = HASH_BANDS - 1
+BAND_FIELDS = [f'hash_band_{band}' for band in range(HASH_BANDS)]
+
+
+def distance(first, second):
+    """Differing bits between two hex difference hashes"""
+    return (int(first, 16) ^ int(second, 16)).bit_count()
+
+
+def band_query(perceptual_hash):
+    bands = hash_bands(int(perceptual_hash, 16))
+    query = Q()
+    for field, value in zip(BAND_FIELDS, bands):
+        query |= Q(**{field: value})
+    return query
+
+
+def similar_images(listing_image, max_distance=MAX_DISTANCE, other_listings=True):
+    """[(image, distance)] of photos that look like ``listing_image``, closest first"""
+    if not listing_image.perceptual_hash:
+        return []
+    candidates = ListingImage.objects.filter(band_query(listing_image.perceptual_hash)).exclude(pk=listing_image.pk)
+    if other_listings:
+        candidates = candidates.exclude(listing_id=listing_image.listing_id)
+    matches = []
+    for candidate in candidates.select_related('listing'):
+        bits = distance(listing_image.perceptual_hash, candidate.perceptual_hash)
+        if bits <= max_distance:
+            matches.append((candidate, bits))
+    return sorted(matches, key=lambda match: match[1])
+
+
+def duplicate_pairs(max_distance=MAX_DISTANCE, cross_owner=False):
+    """Yield (image, image, distance, exact) for look-alike photos on different listings
+
+    One pass over the fingerprints, bucketed by each band in memory, so
+    only photos sharing a band are ever compared.
+    """
+    fields = ['pk', 'listing_id', 'listing__owner_id', 'content_hash', 'perceptual_hash', *BAND_FIELDS]
+    rows = list(ListingImage.objects.exclude(perceptual_hash='').order_by('pk').values(*fields))
+    buckets = defaultdict(list)
+    for row in rows:
+        for field in BAND_FIELDS:
+            buckets[field, row[field]].append(row)
+
+    seen = set()
+    for bucket in buckets.values():
+        for i, first in enumerate(bucket):
+            for second in bucket[i + 1:]:
+                pair = (first['pk'], second['pk'])
+                if pair in seen or first['listing_id'] == second['listing_id']:
+                    continue
+                if cross_owner and first['listing__owner_id'] == second['listing__owner_id']:
+                    continue
+                seen.add(pair)
+                bits = distance(first['perceptual_hash'], second['perceptual_hash'])
+                if bits <= max_distance:
+                    yield first, second, bits, first['content_hash'] == second['content_hash']
+
+
+def fingerprint_images(batch_size=100):
+    """Fingerprint photos uploaded before ingest hashing; returns how many were done"""
+    pending = ListingImage.objects.filter(
+        Q(image__isnull=False) | ~Q(original=''), content_hash='', upload_status='ready',
+    )
+    done = 0
+    last_pk = 0
+    while True:
+        batch = list(pending.filter(pk__gt=last_pk).order_by('pk')[:batch_size])
+        if not batch:
+            return done
+        last_pk = batch[-1].pk
+        fingerprinted = []
+        for listing_image in batch:
+            try:
+                listing_image.set_fingerprint(read_original(listing_image))
+            except (OSError, ValueError):
+                # Original unreachable right now; the next run tries again
+                continue
+            fingerprinted.append(listing_image)
+        ListingImage.objects.bulk_update(fingerprinted, ['content_hash', 'perceptual_hash', *BAND_FIELDS])
+        done += len(fingerprinted)
@@ -0,0 +1,54 @@
+"""Option counts for the search sidebar
+
+Every count comes from one aggregate query: each option is a
+COUNT(...) FILTER (WHERE ...) over the current result set with that
+facet's own filter left out, so a count says how many results choosing
+the option would give.
+"""
+from django.db.models import Count, Q
+
+from .location_search import get_backend
+from .models import DURATION_CHOICES, LISTING_TYPE_CHOICES
+from .search import SearchFilters, base_documents
+from .search_cache import cached
+
+
+FACETS = {
+    'duration': [value for value, label in DURATION_CHOICES],
+    'listing_type': [value for value, label in LISTING_TYPE_CHOICES],
+    'beds': ['0', '1', '2', '3'],
+    'max_price': ['500', '1000', '1500', '2000', '2500'],
+}
+
+
+def option_query(facet, value):
+    """The Q SearchFilters would apply if only this option were chosen"""
+    return SearchFilters({facet: value}).queries()[facet]
+
+
+def compute_facets(filters):
+    documents = base_documents()
+    if filters.location:
+        documents = get_backend().filter(documents, filters.location)
+
+    queries = filters.queries()
+    options = []
+    aggregates = {}
+    for facet, values in FACETS.items():
+        others = Q(*(query for name, query in queries.items() if name != facet))
+        for value in values:
+            # Positional aliases; option values aren't all valid SQL aliases
+            alias = f'option_{len(options)}'
+            options.append((facet, value, alias))
+            aggregates[alias] = Count('listing_id', filter=others & option_query(facet, value))
+
+    counts = documents.aggregate(**aggregates)
+    facets = {facet: {} for facet in FACETS}
+    for facet, value, alias in options:
+        facets[facet][value] = counts[alias]
+    return facets
+
+
+def facet_counts(filters):
+    """{facet: {option value: count}}, cached with the result pages"""
+    return cached('facets', filters.cache_key(), lambda: compute_facets(filters))
@@ -0,0 +1,94 @@
+"""Geohash cells and SQL distance expressions for map and radius search"""
+import math
+
+from django.db.models import F, FloatField, Q, Value
+from django.db.models.functions import ASin, Cos, Power, Radians, Sin, Sqrt
+
+
+EARTH_RADIUS_MILES = 3958.8
+MILES_PER_DEGREE_LAT = 69.0
+GEOHASH_PRECISION = 9
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < precision:
+        value, bounds = (longitude, lng_range) if even else (latitude, lat_range)
+        middle = (bounds[0] + bounds[1]) / 2
+        bits <<= 1
+        if value >= middle:
+            bits |= 1
+            bounds[0] = middle
+        else:
+            bounds[1] = middle
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(GEOHASH_ALPHABET[bits])
+            bits = 0
+            bit_count = 0
+    return ''.join(chars)
+
+
+def cell_size(precision):
+    """(height, width) in degrees of a geohash cell"""
+    total_bits = precision * 5
+    lng_bits = (total_bits + 1) // 2
+    lat_bits = total_bits // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lng_bits)
+
+
+def covering_cells(south, west, north, east, max_cells=16):
+    """Smallest set of equal-size geohash cells covering a bounding box"""
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        height, width = cell_size(precision)
+        rows = range(math.floor((south + 90) / height), math.floor((north + 90) / height) + 1)
+        columns = range(math.floor((west + 180) / width), math.floor((east + 180) / width) + 1)
+        if len(rows) * len(columns) <= max_cells:
+            return sorted({
+                encode_geohash(
+                    min(row * height - 90 + height / 2, 90.0),
+                    min(column * width - 180 + width / 2, 180.0),
+                    precision,
+                )
+                for row in rows for column in columns
+            })
+    return ['']
+
+
+def cells_query(cells, field='geohash'):
+    """Prefix match on each cell, written as a range so a plain b-tree index serves it"""
+    query = Q()
+    for cell in cells:
+        query |= Q(**{f'{field}__gte': cell, f'{field}__lt': cell + '~'})
+    return query
+
+
+def radius_bbox(latitude, longitude, miles):
+    """(south, west, north, east) box that contains a circle of ``miles``"""
+    lat_delta = miles / MILES_PER_DEGREE_LAT
+    lng_delta = miles / (MILES_PER_DEGREE_LAT * max(math.cos(math.radians(latitude)), 0.01))
+    return (
+        max(latitude - lat_delta, -90.0),
+        max(longitude - lng_delta, -180.0),
+        min(latitude + lat_delta, 90.0),
+        min(longitude + lng_delta, 180.0),
+    )
+
+
+def distance_miles(latitude, longitude, lat_field='latitude', lng_field='longitude'):
+    """Haversine distance from a point as a database expression"""
+    half_dlat = Radians(F(lat_field) - Value(latitude)) / Value(2.0)
+    half_dlng = Radians(F(lng_field) - Value(longitude)) / Value(2.0)
+    a = (
+        Power(Sin(half_dlat), 2) +
+        Value(math.cos(math.radians(latitude))) * Cos(Radians(F(lat_field))) * Power(Sin(half_dlng), 2)
+    )
+    return Value(2 * EARTH_RADIUS_MILES, output_field=FloatField()) * ASin(Sqrt(a))
+
@@ -0,0 +1,216 @@
+"""Batch geocoding of listing and campus addresses
+
+Addresses are reduced to a building-level key (unit numbers and spelling
+variants removed) and every geocoder answer is stored in GeocodeCache under
+that key, so listings in the same building share one lookup. "Not found"
+answers expire after GEOCODE_MISS_TTL_DAYS, so a transient miss doesn't
+blank an address for good. The geocoder itself is chosen by GEOCODER_BACKEND.
+"""
+import json
+import logging
+import re
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
+from django.utils.module_loading import import_string
+
+from .campus_distances import refresh_listing
+from .location_search import state_abbreviation
+from .models import Campus, GeocodeCache, Listing
+from .search import sync_listings
+
+
+logger = logging.getLogger(__name__)
+
+UNIT_PATTERN = re.compile(r'\s(?:apt|apartment|unit|suite|ste|fl|floor|rm|room|#)\s*\S*$')
+STREET_ABBREVIATIONS = {
+    'street': 'st', 'avenue': 'ave', 'road': 'rd', 'boulevard': 'blvd', 'drive': 'dr',
+    'lane': 'ln', 'place': 'pl', 'court': 'ct', 'terrace': 'ter', 'square': 'sq',
+    'parkway': 'pkwy', 'highway': 'hwy', 'north': 'n', 'south': 's', 'east': 'e', 'west': 'w',
+}
+
+
+class GeocoderUnavailable(Exception):
+    """The geocoder could not answer; nothing is cached so the address is retried"""
+
+
+def normalize_street(address):
+    street = re.sub(r'[^\w\s#]', ' ', (address or '').lower())
+    street = ' '.join(STREET_ABBREVIATIONS.get(word, word) for word in street.split())
+    # Repeat for "Apt 4, Floor 2" style suffixes
+    while True:
+        shorter = UNIT_PATTERN.sub('', ' ' + street).strip()
+        if shorter == street:
+            return street
+        street = shorter
+
+
+def address_key(address, city, state, zip_code=''):
+    parts = [
+        normalize_street(address),
+        ' '.join((city or '').lower().split()),
+        f'{state_abbreviation(state)} {(zip_code or "").strip()[:5]}'.strip(),
+    ]
+    return ', '.join(part for part in parts if part)
+
+
+def listing_address_key(listing):
+    return address_key(listing.address, listing.city, listing.state, listing.zip_code)
+
+
+def campus_address_key(campus):
+    return address_key(campus.school_name, campus.city, campus.state)
+
+
+def needs_geocoding(listing):
+    """Hand-entered coordinates are kept until the address itself changes"""
+    if not listing.geocoded_address:
+        return listing.latitude is None or listing.longitude is None
+    return listing.geocoded_address != listing_address_key(listing)
+
+
+# Geocoders
+
+class NominatimGeocoder:
+    """OpenStreetMap Nominatim via geopy, throttled to its one-request-per-second policy"""
+
+    def __init__(self):
+        from geopy.extra.rate_limiter import RateLimiter
+        from geopy.geocoders import Nominatim
+
+        nominatim = Nominatim(user_agent=settings.GEOCODER_USER_AGENT, timeout=10)
+        self._geocode = RateLimiter(nominatim.geocode, min_delay_seconds=1, swallow_exceptions=False)
+
+    def geocode(self, query):
+        from geopy.exc import GeopyError
+
+        try:
+            location = self._geocode(query, country_codes='us')
+        except GeopyError as e:
+            raise GeocoderUnavailable(str(e))
+        if location is None:
+            return None
+        return location.latitude, location.longitude
+
+
+class FileGeocoder:
+    """Offline stand-in that reads {address_key: [latitude, longitude]} from GEOCODER_FILE"""
+
+    def __init__(self, path=None):
+        try:
+            with open(path or settings.GEOCODER_FILE) as f:
+                self.coordinates = json.load(f)
+        except FileNotFoundError:
+            self.coordinates = {}
+
+    def geocode(self, query):
+        point = self.coordinates.get(query)
+        return tuple(point) if point else None
+
+
+def get_geocoder():
+    return import_string(settings.GEOCODER_BACKEND)()
+
+
+geocoder = SimpleLazyObject(get_geocoder)
+
+
+# Batches
+
+def geocode_keys(keys):
+    """Coordinates (or None) for each address key, asking the geocoder only for uncached keys"""
+    keys = set(keys)
+    expired_miss = Q(latitude__isnull=True, created_at__lt=timezone.now() - timedelta(days=settings.GEOCODE_MISS_TTL_DAYS))
+    results = {
+        entry.address_key: (entry.latitude, entry.longitude) if entry.latitude is not None else None
+        for entry in GeocodeCache.objects.filter(address_key__in=keys).exclude(expired_miss)
+    }
+    new_entries = []
+    for key in sorted(keys - results.keys()):
+        try:
+            point = geocoder.geocode(key)
+        except GeocoderUnavailable as e:
+            logger.warning('Geocoding %r failed: %s', key, e)
+            continue
+        results[key] = point
+        latitude, longitude = point or (None, None)
+        new_entries.append(GeocodeCache(address_key=key, latitude=latitude, longitude=longitude))
+    # Expired misses already have a row; overwrite it (created_at too, restarting the TTL)
+    GeocodeCache.objects.bulk_create(
+        new_entries, update_conflicts=True, unique_fields=['address_key'],
+        update_fields=['latitude', 'longitude', 'created_at'],
+    )
+    return results
+
+
+def geocode_listings(listings):
+    """Geocode a batch of listings in place and save them
+
+    Returns the ids of listings whose coordinates changed. Listings whose
+    lookup failed are left untouched and picked up by the next run.
+    """
+    keys = {listing.pk: listing_address_key(listing) for listing in listings}
+    results = geocode_keys(keys.values())
+
+    updated = []
+    moved = []
+    for listing in listings:
+        key = keys[listing.pk]
+        if key not in results:
+            continue
+        latitude, longitude = results[key] or (None, None)
+        if (latitude, longitude) != (listing.latitude, listing.longitude):
+            moved.append(listing)
+        listing.latitude = latitude
+        listing.longitude = longitude
+        listing.geocoded_address = key
+        updated.append(listing)
+
+    # bulk_update skips post_save, so refresh what the signals would have
+    Listing.objects.bulk_update(updated, ['latitude', 'longitude', 'geocoded_address'])
+    if moved:
+        sync_listings([listing.pk for listing in moved])
+        for listing in moved:
+            listing.mark_coordinates_synced()
+            refresh_listing(listing)
+    return [listing.pk for listing in moved]
+
+
+def pending_listings(force=False, batch_size=100):
+    """Yield lists of listings whose coordinates are missing or out of date
+
+    Listings whose address was not found are included again: geocode_keys
+    answers them from the cache until the miss expires.
+    """
+    fields = ['pk', 'address', 'city', 'state', 'zip_code', 'latitude', 'longitude', 'geocoded_address']
+    batch = []
+    for listing in Listing.objects.only(*fields).order_by('pk').iterator(chunk_size=batch_size):
+        if force or needs_geocoding(listing) or listing.latitude is None:
+            batch.append(listing)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def geocode_listing_ids(listing_ids):
+    listings = list(Listing.objects.filter(pk__in=listing_ids))
+    return geocode_listings([listing for listing in listings if needs_geocoding(listing)])
+
+
+def geocode_campuses(force=False):
+    """Fill in missing campus coordinates; saving triggers the distance refresh"""
+    campuses = list(Campus.objects.all() if force else Campus.objects.filter(latitude__isnull=True))
+    results = geocode_keys(campus_address_key(campus) for campus in campuses)
+    count = 0
+    for campus in campuses:
+        point = results.get(campus_address_key(campus))
+        if point:
+            campus.latitude, campus.longitude = point
+            campus.save(update_fields=['latitude', 'longitude'])
+            count += 1
+    return count
@@ -0,0 +1,121 @@
+"""Fixed-width WebP and JPEG copies of listing photos for srcset
+
+Each ListingImage gets a small (card) and a medium (carousel) rendition in
+both formats, written to the default storage next to the other media and
+recorded in ListingImage.derivatives together with the original they were
+made from. Renditions are made after upload on the background pool; an
+image whose recorded source no longer matches its original is stale and
+is regenerated.
+"""
+import logging
+from io import BytesIO
+from urllib.request import urlopen
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .models import ListingImage
+
+
+logger = logging.getLogger(__name__)
+
+# Cards are about 400px wide and the carousel up to about 1100px
+WIDTHS = {'thumb': 480, 'medium': 1200}
+FORMATS = {
+    'webp': ('WEBP', {'quality': 75, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 80, 'optimize': True, 'progressive': True}),
+}
+DOWNLOAD_TIMEOUT = 30
+
+
+def source_name(listing_image):
+    """Identifies the original; changes whenever a new file is uploaded"""
+    return str(listing_image.image) if listing_image.image else listing_image.original
+
+
+def is_current(listing_image):
+    derivatives = listing_image.derivatives or {}
+    return bool(derivatives.get('sizes')) and derivatives.get('source') == source_name(listing_image)
+
+
+def read_original(listing_image):
+    if not listing_image.image:
+        with default_storage.open(listing_image.original, 'rb') as f:
+            return f.read()
+    # CloudinaryField holds a remote resource, not a file
+    with urlopen(listing_image.image.url, timeout=DOWNLOAD_TIMEOUT) as response:
+        return response.read()
+
+
+def render(original, width, image_format, options):
+    output = BytesIO()
+    resized = original.resize((width, round(original.height * width / original.width)), Image.LANCZOS)
+    resized.save(output, image_format, **options)
+    return resized.height, output.getvalue()
+
+
+def derivative_name(listing_image, width, extension):
+    return f'listing_images/{listing_image.listing_id}/{listing_image.pk}/{width}w.{extension}'
+
+
+def delete_files(derivatives):
+    for size in (derivatives or {}).get('sizes', []):
+        for extension in FORMATS:
+            if size.get(extension):
+                default_storage.delete(size[extension])
+
+
+def generate(listing_image):
+    """Write the renditions of one image and record them; False if the original can't be read"""
+    source = source_name(listing_image)
+    try:
+        original = Image.open(BytesIO(read_original(listing_image)))
+        original = ImageOps.exif_transpose(original).convert('RGB')
+    except (OSError, ValueError, UnidentifiedImageError) as e:
+        logger.warning('Could not read image %s for derivatives: %s', listing_image.pk, e)
+        return False
+
+    sizes = []
+    # Never upscale: a small original gets one rendition at its own width
+    widths = sorted({min(width, original.width) for width in WIDTHS.values()})
+    for width in widths:
+        size = {'width': width}
+        for extension, (image_format, options) in FORMATS.items():
+            size['height'], data = render(original, width, image_format, options)
+            name = derivative_name(listing_image, width, extension)
+            # Storages pick a new name for an existing file, so clear it first
+            default_storage.delete(name)
+            size[extension] = default_storage.save(name, ContentFile(data))
+        sizes.append(size)
+
+    old = listing_image.derivatives
+    listing_image.derivatives = {'source': source, 'sizes': sizes}
+    # update() rather than save(): no signals, no primary-image reshuffle
+    ListingImage.objects.filter(pk=listing_image.pk).update(derivatives=listing_image.derivatives)
+    delete_files({'sizes': [
+        size for size in (old or {}).get('sizes', [])
+        if size.get('width') not in widths
+    ]})
+    return True
+
+
+def generate_for_ids(image_ids):
+    count = 0
+    for listing_image in ListingImage.objects.filter(pk__in=image_ids):
+        if not is_current(listing_image):
+            count += generate(listing_image)
+    return count
+
+
+def pending_images(force=False, batch_size=100):
+    """Yield lists of images without up-to-date derivatives"""
+    batch = []
+    for listing_image in ListingImage.objects.order_by('pk').iterator(chunk_size=batch_size):
+        if listing_image.is_ready() and (force or not is_current(listing_image)):
+            batch.append(listing_image)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
@@ -0,0 +1,145 @@
+"""Normalize uploaded photos before they are stored
+
+Phone photos arrive sideways-by-EXIF, many megapixels large and carrying
+GPS and camera metadata. Every listing photo and avatar is turned upright,
+capped in size, stripped of metadata and re-encoded at the highest
+quality that fits its byte budget. Opaque images become JPEG; images with
+transparency become WebP. The sizes before and after are returned so
+callers can record the savings.
+
+fingerprint() hashes the stored bytes (exact duplicates) and the picture
+itself (a 64-bit difference hash that survives resizing and recompression,
+for near duplicates; see listings.duplicates).
+"""
+import hashlib
+import os
+from io import BytesIO
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+
+# (longest side in pixels, byte budget)
+LISTING_PHOTO = (2560, 800 * 1024)
+AVATAR = (512, 100 * 1024)
+
+QUALITIES = [85, 78, 70, 62]
+# Past the lowest quality the image shrinks by this factor, down to MIN_DIMENSION
+SHRINK_FACTOR = 0.8
+MIN_DIMENSION = 320
+
+METADATA_KEYS = ('exif', 'xmp', 'XML:com.adobe.xmp', 'photoshop', 'comment')
+KEPT_FORMATS = {'JPEG', 'WEBP'}
+# CMYK and other modes render wrongly or not at all in some browsers
+KEPT_MODES = {'RGB', 'RGBA', 'L'}
+
+# The 64-bit difference hash is indexed as HASH_BANDS columns of BAND_BITS each
+HASH_BANDS = 4
+BAND_BITS = 16
+
+
+def has_alpha(image):
+    return image.mode in ('RGBA', 'LA', 'PA') or (image.mode == 'P' and 'transparency' in image.info)
+
+
+def encode(image, image_format, quality, icc_profile):
+    output = BytesIO()
+    options = {'quality': quality}
+    if image_format == 'JPEG':
+        options.update(optimize=True, progressive=True)
+    else:
+        options['method'] = 4
+    if icc_profile:
+        # Colour profile only; EXIF and XMP are dropped by not passing them on
+        options['icc_profile'] = icc_profile
+    image.save(output, image_format, **options)
+    return output.getvalue()
+
+
+def is_clean(original, data, max_dimension, max_bytes):
+    """Already upright, small and metadata-free: re-encoding could only lose quality"""
+    return (
+        original.format in KEPT_FORMATS
+        and original.mode in KEPT_MODES
+        and max(original.size) <= max_dimension
+        and len(data) <= max_bytes
+        and not any(key in original.info for key in METADATA_KEYS)
+        and not original.getexif()
+    )
+
+
+def normalize(data, max_dimension, max_bytes):
+    """(bytes, extension) of the normalized image; the input if it is already clean"""
+    original = Image.open(BytesIO(data))
+    if is_clean(original, data, max_dimension, max_bytes):
+        return data, original.format.lower().replace('jpeg', 'jpg')
+
+    icc_profile = original.info.get('icc_profile')
+    # JPEG can decode at 1/2, 1/4 or 1/8 scale, much faster than full size
+    original.draft('RGB', (max_dimension, max_dimension))
+    image = ImageOps.exif_transpose(original)
+    transparent = has_alpha(image)
+    image = image.convert('RGBA' if transparent else 'RGB')
+    image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+    image_format, extension = ('WEBP', 'webp') if transparent else ('JPEG', 'jpg')
+
+    while True:
+        for quality in QUALITIES:
+            encoded = encode(image, image_format, quality, icc_profile)
+            if len(encoded) <= max_bytes:
+                return encoded, extension
+        if max(image.size) * SHRINK_FACTOR < MIN_DIMENSION:
+            return encoded, extension
+        image = image.resize(
+            (round(image.width * SHRINK_FACTOR), round(image.height * SHRINK_FACTOR)), Image.LANCZOS,
+        )
+
+
+def ingest(uploaded, profile):
+    """Normalize an uploaded file for ``profile``
+
+    Returns (file to store, original bytes, stored bytes). Files Pillow
+    can't read are passed through untouched for the storage to judge.
+    """
+    uploaded.seek(0)
+    data = uploaded.read()
+    try:
+        normalized, extension = normalize(data, *profile)
+    except (UnidentifiedImageError, OSError, ValueError):
+        uploaded.seek(0)
+        return uploaded, len(data), len(data)
+    name = f'{os.path.splitext(os.path.basename(uploaded.name))[0]}.{extension}'
+    content_type = 'image/webp' if extension == 'webp' else 'image/jpeg'
+    return SimpleUploadedFile(name, normalized, content_type), len(data), len(normalized)
+
+
+# Fingerprints
+
+def dhash(image):
+    """64-bit difference hash: does each pixel of a 9x8 grayscale thumbnail beat its right neighbour"""
+    pixels = image.convert('L').resize((9, 8), Image.LANCZOS).tobytes()
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            bits = bits << 1 | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return bits
+
+
+def hash_bands(perceptual_hash):
+    mask = (1 << BAND_BITS) - 1
+    return [
+        (perceptual_hash >> (BAND_BITS * (HASH_BANDS - 1 - band))) & mask
+        for band in range(HASH_BANDS)
+    ]
+
+
+def fingerprint(data):
+    """(sha256 hex digest, difference hash or None if Pillow can't read it) of encoded image bytes"""
+    content_hash = hashlib.sha256(data).hexdigest()
+    try:
+        image = Image.open(BytesIO(data))
+        # Only a 9x8 thumbnail is needed, so let JPEG decode at reduced scale
+        image.draft('L', (64, 64))
+        return content_hash, dhash(ImageOps.exif_transpose(image))
+    except (UnidentifiedImageError, OSError, ValueError):
+        return content_hash, None
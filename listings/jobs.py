@@ -0,0 +1,205 @@
+"""Scheduled maintenance sweeps
+
+Each job walks the matching rows in primary-key chunks, so no statement
+touches more than ``chunk_size`` rows and a long sweep never holds locks
+for long. Sweeps report what they touched (or would touch, with dry_run)
+and how long it took. They are run by celery beat (listings.tasks) or
+locally with the run_scheduler and run_job commands.
+"""
+import logging
+import os
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import Listing, Message, User
+from .search import sync_listings
+from .unread import cached_unread_counts, set_unread_counts
+from .uploads import retry_uploads, stuck_uploads, upload_image
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 500
+STALE_AFTER = timedelta(days=7)
+RANK_FIELDS = ['pk', 'is_boosted', 'boosted_until', 'last_bumped', 'created_at', 'rank_score']
+# save() scores a new listing a moment before auto_now_add stamps created_at
+RANK_SCORE_TOLERANCE = 1.0
+
+
+class JobResult:
+
+    def __init__(self, name, dry_run=False):
+        self.name = name
+        self.dry_run = dry_run
+        self.rows = 0
+        self.chunks = 0
+        self.duration = 0.0
+
+    def as_dict(self):
+        return {
+            'name': self.name,
+            'dry_run': self.dry_run,
+            'rows': self.rows,
+            'chunks': self.chunks,
+            'duration': round(self.duration, 3),
+        }
+
+    def __str__(self):
+        verb = 'would touch' if self.dry_run else 'touched'
+        return f'{self.name}: {verb} {self.rows} rows in {self.chunks} chunks ({self.duration:.2f}s)'
+
+
+def chunks(queryset, chunk_size):
+    """Lists of matching primary keys, each fetched with a bounded range query"""
+    last = 0
+    while True:
+        ids = list(queryset.filter(pk__gt=last).order_by('pk').values_list('pk', flat=True)[:chunk_size])
+        if not ids:
+            return
+        yield ids
+        last = ids[-1]
+
+
+def sweep(name, querysets, apply, chunk_size=DEFAULT_CHUNK_SIZE, dry_run=False):
+    """Call ``apply(queryset)`` with each chunk of each queryset, narrowed to the chunk's ids
+
+    ``apply`` returns the ids it actually changed; those are re-synced to
+    the search index and counted.
+    """
+    result = JobResult(name, dry_run)
+    started = time.monotonic()
+    for queryset in querysets:
+        for ids in chunks(queryset, chunk_size):
+            if not dry_run:
+                with transaction.atomic():
+                    # Re-apply the sweep's filter in case rows changed since they were listed
+                    ids = apply(queryset.filter(pk__in=ids))
+                # update()/bulk_update() skip post_save, so refresh the search index explicitly
+                sync_listings(ids)
+            result.rows += len(ids)
+            result.chunks += 1
+    result.duration = time.monotonic() - started
+    logger.info('%s', result)
+    return result
+
+
+# Sweeps
+
+def expire_boosts(chunk_size=DEFAULT_CHUNK_SIZE, dry_run=False):
+    """Clear boosts whose boosted_until has passed and drop their rank bonus"""
+    now = timezone.now()
+
+    def apply(queryset):
+        listings = list(queryset.only(*RANK_FIELDS))
+        for listing in listings:
+            listing.is_boosted = False
+            listing.rank_score = listing.compute_rank_score(now)
+        Listing.objects.bulk_update(listings, ['is_boosted', 'rank_score'])
+        return [listing.pk for listing in listings]
+
+    expired = Listing.objects.filter(is_boosted=True, boosted_until__lte=now)
+    return sweep('expire_boosts', [expired], apply, chunk_size, dry_run)
+
+
+def auto_pause_listings(chunk_size=DEFAULT_CHUNK_SIZE, dry_run=False):
+    """Pause active listings that have not been bumped in STALE_AFTER"""
+    cutoff = timezone.now() - STALE_AFTER
+
+    def apply(queryset):
+        ids = list(queryset.values_list('pk', flat=True))
+        Listing.objects.filter(pk__in=ids).update(status='pending')
+        return ids
+
+    # Two index range scans instead of one OR that can't use either index
+    stale = [
+        Listing.objects.filter(status='active', last_bumped__lt=cutoff),
+        Listing.objects.filter(status='active', last_bumped__isnull=True, created_at__lt=cutoff),
+    ]
+    return sweep('auto_pause_listings', stale, apply, chunk_size, dry_run)
+
+
+def refresh_rank_scores(chunk_size=DEFAULT_CHUNK_SIZE, dry_run=False):
+    """Recompute every rank_score and fix the ones written around Listing.save()"""
+    result = JobResult('refresh_rank_scores', dry_run)
+    started = time.monotonic()
+    now = timezone.now()
+    for ids in chunks(Listing.objects.all(), chunk_size):
+        changed = []
+        for listing in Listing.objects.filter(pk__in=ids).only(*RANK_FIELDS):
+            score = listing.compute_rank_score(now)
+            if abs(score - listing.rank_score) >= RANK_SCORE_TOLERANCE:
+                listing.rank_score = score
+                changed.append(listing)
+        if changed and not dry_run:
+            Listing.objects.bulk_update(changed, ['rank_score'])
+            sync_listings([listing.pk for listing in changed])
+        result.rows += len(changed)
+        result.chunks += 1
+    result.duration = time.monotonic() - started
+    logger.info('%s', result)
+    return result
+
+
+def reconcile_unread_counts(chunk_size=DEFAULT_CHUNK_SIZE, dry_run=False):
+    """Reset cached unread-message counters that no longer match the database"""
+    result = JobResult('reconcile_unread_counts', dry_run)
+    started = time.monotonic()
+    for ids in chunks(User.objects.all(), chunk_size):
+        result.chunks += 1
+        # Only users with a counter; the rest are counted afresh when they next load a page
+        cached = cached_unread_counts(ids)
+        if not cached:
+            continue
+        actual = dict(
+            Message.objects.filter(recipient_id__in=list(cached), is_read=False)
+            .values_list('recipient_id').annotate(count=Count('pk')).order_by()
+        )
+        drifted = {
+            user_id: actual.get(user_id, 0)
+            for user_id, count in cached.items()
+            if count != actual.get(user_id, 0)
+        }
+        if drifted and not dry_run:
+            set_unread_counts(drifted)
+        result.rows += len(drifted)
+    result.duration = time.monotonic() - started
+    logger.info('%s', result)
+    return result
+
+
+def retry_lost_uploads(chunk_size=DEFAULT_CHUNK_SIZE, dry_run=False):
+    """Upload listing photos whose background upload was lost, from their spool files
+
+    The uploads run in this process, which therefore needs UPLOAD_SPOOL_DIR.
+    On a host without it nothing is touched: retry_uploads would otherwise
+    mark every stuck image failed for want of its spool file.
+    """
+    result = JobResult('retry_lost_uploads', dry_run)
+    started = time.monotonic()
+    if not os.path.isdir(settings.UPLOAD_SPOOL_DIR):
+        logger.warning('UPLOAD_SPOOL_DIR %s is not available here; lost uploads not retried', settings.UPLOAD_SPOOL_DIR)
+    elif dry_run:
+        result.rows = stuck_uploads().count()
+    else:
+        queued, abandoned = retry_uploads()
+        for image_id in queued:
+            upload_image(image_id)
+        result.rows = len(queued) + len(abandoned)
+    result.chunks = 1
+    result.duration = time.monotonic() - started
+    logger.info('%s', result)
+    return result
+
+
+JOBS = {
+    'expire_boosts': expire_boosts,
+    'auto_pause_listings': auto_pause_listings,
+    'refresh_rank_scores': refresh_rank_scores,
+    'reconcile_unread_counts': reconcile_unread_counts,
+    'retry_lost_uploads': retry_lost_uploads,
+}
@@ -0,0 +1,144 @@
+"""Full-text location search
+
+Each search document carries a ``location_tokens`` string (city, state name
+and abbreviation, zip code and prefix, nearby campus names). The backend for
+the active database indexes those tokens: an FTS5 side table on SQLite, a
+GIN tsvector expression index on PostgreSQL, and a plain substring match
+anywhere else.
+"""
+import re
+
+from django.db import connection
+from django.db.models import BooleanField
+from django.db.models.expressions import RawSQL
+
+
+US_STATES = {
+    'al': 'alabama', 'ak': 'alaska', 'az': 'arizona', 'ar': 'arkansas', 'ca': 'california',
+    'co': 'colorado', 'ct': 'connecticut', 'de': 'delaware', 'dc': 'district of columbia',
+    'fl': 'florida', 'ga': 'georgia', 'hi': 'hawaii', 'id': 'idaho', 'il': 'illinois',
+    'in': 'indiana', 'ia': 'iowa', 'ks': 'kansas', 'ky': 'kentucky', 'la': 'louisiana',
+    'me': 'maine', 'md': 'maryland', 'ma': 'massachusetts', 'mi': 'michigan', 'mn': 'minnesota',
+    'ms': 'mississippi', 'mo': 'missouri', 'mt': 'montana', 'ne': 'nebraska', 'nv': 'nevada',
+    'nh': 'new hampshire', 'nj': 'new jersey', 'nm': 'new mexico', 'ny': 'new york',
+    'nc': 'north carolina', 'nd': 'north dakota', 'oh': 'ohio', 'ok': 'oklahoma', 'or': 'oregon',
+    'pa': 'pennsylvania', 'ri': 'rhode island', 'sc': 'south carolina', 'sd': 'south dakota',
+    'tn': 'tennessee', 'tx': 'texas', 'ut': 'utah', 'vt': 'vermont', 'va': 'virginia',
+    'wa': 'washington', 'wv': 'west virginia', 'wi': 'wisconsin', 'wy': 'wyoming',
+}
+STATE_ABBREVIATIONS = {name: abbr for abbr, name in US_STATES.items()}
+
+FTS_TABLE = 'listings_location_fts'
+
+WORD_RE = re.compile(r'[a-z0-9]+')
+
+
+def words(value):
+    return WORD_RE.findall((value or '').lower())
+
+
+def state_abbreviation(state):
+    """Return the two-letter abbreviation for a state name or abbreviation"""
+    state = ' '.join(words(state))
+    if state in US_STATES:
+        return state
+    return STATE_ABBREVIATIONS.get(state, state)
+
+
+def location_tokens(city, state, zip_code, campus_names=()):
+    """Build the space-separated token string indexed for a listing"""
+    tokens = words(city)
+
+    abbreviation = state_abbreviation(state)
+    if abbreviation:
+        tokens.append(abbreviation)
+        tokens.extend(words(US_STATES.get(abbreviation, '')))
+
+    zip_digits = ''.join(words(zip_code))[:5]
+    if zip_digits:
+        tokens.append(zip_digits)
+        if len(zip_digits) > 3:
+            tokens.append(zip_digits[:3])
+
+    for name in campus_names:
+        tokens.extend(words(name))
+
+    # De-duplicate but keep the order stable for diffing in check_search_index
+    return ' '.join(dict.fromkeys(tokens))
+
+
+class LocationSearchBackend:
+    """Substring match on location_tokens; works on every database"""
+
+    def filter(self, documents, query):
+        for term in words(query):
+            documents = documents.filter(location_tokens__contains=term)
+        return documents
+
+    def index(self, listing_id, tokens):
+        pass
+
+    def remove(self, listing_id):
+        pass
+
+    def rebuild(self, rows):
+        pass
+
+
+class SQLiteFTSBackend(LocationSearchBackend):
+    """FTS5 side table keyed by listing id (rowid)"""
+
+    def filter(self, documents, query):
+        terms = words(query)
+        if not terms:
+            return documents
+        # Every term must match; the last one is a prefix so partial input still matches
+        match = ' '.join(f'"{term}"' for term in terms) + '*'
+        return documents.filter(listing_id__in=RawSQL(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [match]
+        ))
+
+    def index(self, listing_id, tokens):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [listing_id])
+            cursor.execute(f'INSERT INTO {FTS_TABLE} (rowid, tokens) VALUES (%s, %s)', [listing_id, tokens])
+
+    def remove(self, listing_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [listing_id])
+
+    def rebuild(self, rows):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            cursor.executemany(f'INSERT INTO {FTS_TABLE} (rowid, tokens) VALUES (%s, %s)', list(rows))
+
+
+class PostgresFTSBackend(LocationSearchBackend):
+    """tsvector match served by the GIN expression index created in migration 0005"""
+
+    def filter(self, documents, query):
+        terms = words(query)
+        if not terms:
+            return documents
+        tsquery = ' & '.join(terms) + ':*'
+        return documents.filter(RawSQL(
+            "to_tsvector('simple', location_tokens) @@ to_tsquery('simple', %s)",
+            [tsquery],
+            output_field=BooleanField(),
+        ))
+
+
+_backend = None
+
+
+def get_backend():
+    """Pick the backend for the active database vendor"""
+    global _backend
+    if _backend is None:
+        if connection.vendor == 'postgresql':
+            _backend = PostgresFTSBackend()
+        elif connection.vendor == 'sqlite' and FTS_TABLE in connection.introspection.table_names():
+            _backend = SQLiteFTSBackend()
+        else:
+            _backend = LocationSearchBackend()
+    return _backend
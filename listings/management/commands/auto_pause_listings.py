@@ -1,27 +1,18 @@
 from django.core.management.base import BaseCommand
-from django.utils import timezone
-from datetime import timedelta
-from listings.models import Listing
+from listings.jobs import DEFAULT_CHUNK_SIZE, auto_pause_listings
 
 class Command(BaseCommand):
     help = 'Auto-pause listings that have not been bumped in 7 days'
 
-    def handle(self, *args, **kwargs):
-        seven_days_ago = timezone.now() - timedelta(days=7)
-        
-        # Find active listings that haven't been bumped in 7 days
-        stale_listings = Listing.objects.filter(
-            status='active',
-            last_bumped__lt=seven_days_ago
-        ) | Listing.objects.filter(
-            status='active',
-            last_bumped__isnull=True,
-            created_at__lt=seven_days_ago
-        )
-        
-        count = stale_listings.count()
-        stale_listings.update(status='pending')
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+        parser.add_argument('--dry-run', action='store_true', help='Count stale listings without pausing them')
+
+    def handle(self, *args, **options):
+        # Chunked, index-backed sweep; also scheduled through celery beat (listings.tasks)
+        result = auto_pause_listings(chunk_size=options['chunk_size'], dry_run=options['dry_run'])
         
+        verb = 'found' if result.dry_run else 'paused'
         self.stdout.write(
-            self.style.SUCCESS(f'Successfully paused {count} stale listings')
+            self.style.SUCCESS(f'Successfully {verb} {result.rows} stale listings')
         )
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from listings.models import Listing
+from listings.search import sync_listings
+
+class Command(BaseCommand):
+    help = 'Recompute Listing.amenity_mask from the amenity booleans for existing rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        updated = 0
+        batch = []
+
+        for listing in Listing.objects.order_by('pk').iterator(chunk_size=batch_size):
+            mask = listing.compute_amenity_mask()
+            if listing.amenity_mask != mask:
+                listing.amenity_mask = mask
+                batch.append(listing)
+            if len(batch) >= batch_size:
+                updated += self.flush(batch)
+                batch = []
+        if batch:
+            updated += self.flush(batch)
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully updated {updated} amenity masks')
+        )
+
+    def flush(self, batch):
+        # bulk_update skips save() and post_save, so re-sync the search index here
+        Listing.objects.bulk_update(batch, ['amenity_mask'])
+        sync_listings(listing.pk for listing in batch)
+        return len(batch)
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from listings.search import check_index, sync_listings
+
+class Command(BaseCommand):
+    help = 'Report listings whose search document is missing or out of date'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='Re-sync the listings that are out of date')
+
+    def handle(self, *args, **options):
+        missing, stale = check_index()
+
+        if not missing and not stale:
+            self.stdout.write(self.style.SUCCESS('Search index is consistent'))
+            return
+
+        self.stdout.write(self.style.WARNING(
+            f'{len(missing)} missing and {len(stale)} stale search documents'
+        ))
+        for pk in missing:
+            self.stdout.write(f'  missing: listing {pk}')
+        for pk in stale:
+            self.stdout.write(f'  stale: listing {pk}')
+
+        if options['fix']:
+            sync_listings(missing + stale)
+            self.stdout.write(
+                self.style.SUCCESS(f'Successfully re-synced {len(missing) + len(stale)} listings')
+            )
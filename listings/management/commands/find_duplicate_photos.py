@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from listings.duplicates import MAX_DISTANCE, duplicate_pairs, fingerprint_images
+
+class Command(BaseCommand):
+    help = 'Report listing photos that are identical or near-identical across listings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--backfill', action='store_true', help='Fingerprint photos uploaded before hashing first')
+        parser.add_argument('--max-distance', type=int, default=MAX_DISTANCE, help='Differing hash bits still counted as a duplicate')
+        parser.add_argument('--cross-owner', action='store_true', help='Only report photos shared by different owners')
+
+    def handle(self, *args, **options):
+        if options['backfill']:
+            count = fingerprint_images()
+            self.stdout.write(f'Fingerprinted {count} images')
+
+        pairs = 0
+        for first, second, distance, exact in duplicate_pairs(options['max_distance'], options['cross_owner']):
+            pairs += 1
+            kind = 'identical' if exact else f'{distance} bits apart'
+            self.stdout.write(
+                f"Image {first['pk']} (listing {first['listing_id']}) and "
+                f"image {second['pk']} (listing {second['listing_id']}): {kind}"
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully scanned for duplicates: {pairs} pairs found')
+        )
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from listings.image_derivatives import generate, pending_images
+
+class Command(BaseCommand):
+    help = 'Generate missing or stale srcset renditions for listing images'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--all', action='store_true', help='Regenerate every image, not just pending ones')
+
+    def handle(self, *args, **options):
+        checked = 0
+        generated = 0
+        for batch in pending_images(force=options['all'], batch_size=options['batch_size']):
+            checked += len(batch)
+            generated += sum(generate(listing_image) for listing_image in batch)
+            self.stdout.write(f'Processed {checked} images...')
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully generated derivatives for {generated} of {checked} images')
+        )
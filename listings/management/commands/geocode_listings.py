@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from listings.geocoding import geocode_campuses, geocode_listings, pending_listings
+
+class Command(BaseCommand):
+    help = 'Geocode listings with missing or out-of-date coordinates, in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--all', action='store_true', help='Re-geocode every listing, not just pending ones')
+        parser.add_argument('--campuses', action='store_true', help='Also geocode campuses without coordinates')
+
+    def handle(self, *args, **options):
+        checked = 0
+        moved = 0
+        for batch in pending_listings(force=options['all'], batch_size=options['batch_size']):
+            checked += len(batch)
+            moved += len(geocode_listings(batch))
+            self.stdout.write(f'Geocoded {checked} listings...')
+
+        if options['campuses']:
+            count = geocode_campuses(force=options['all'])
+            self.stdout.write(f'Geocoded {count} campuses')
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully geocoded {checked} listings ({moved} moved)')
+        )
@@ -0,0 +1,38 @@
+from django.apps import apps
+from django.core.files.storage import storages
+from django.core.management.base import BaseCommand, CommandError
+from django.db import models
+from listings.models import ListingImage
+from listings.storage import ContentAddressedStorage
+
+class Command(BaseCommand):
+    help = 'Delete content-addressed media files that no model refers to any more'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-age', type=int, default=86400, help='Keep files younger than this many seconds')
+        parser.add_argument('--dry-run', action='store_true', help='List what would be deleted without deleting it')
+
+    def referenced_names(self):
+        names = set()
+        for model in apps.get_models():
+            for field in model._meta.concrete_fields:
+                if isinstance(field, models.FileField):
+                    names.update(model._default_manager.exclude(**{field.name: ''}).values_list(field.name, flat=True))
+        names.update(ListingImage.objects.exclude(original='').values_list('original', flat=True))
+        for derivatives in ListingImage.objects.exclude(derivatives={}).values_list('derivatives', flat=True).iterator():
+            for size in derivatives.get('sizes', []):
+                names.update(size.get(extension) for extension in ('webp', 'jpeg'))
+        return names
+
+    def handle(self, *args, **options):
+        if not isinstance(storages['default'], ContentAddressedStorage):
+            raise CommandError('The default storage is not ContentAddressedStorage')
+
+        removed = storages['default'].prune(self.referenced_names(), options['min_age'], options['dry_run'])
+        for name in removed:
+            self.stdout.write(name)
+
+        action = 'would delete' if options['dry_run'] else 'deleted'
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully pruned media: {action} {len(removed)} unreferenced files')
+        )
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from listings.search import rebuild_index
+
+class Command(BaseCommand):
+    help = 'Rebuild the listing search index from the Listing table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        count = rebuild_index(batch_size=options['batch_size'])
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully indexed {count} listings')
+        )
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from listings.campus_distances import refresh_all, refresh_campus
+from listings.models import Campus
+
+class Command(BaseCommand):
+    help = 'Recompute the listing-to-campus distance table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--campus', type=int, help='Only refresh this campus id')
+
+    def handle(self, *args, **options):
+        if options['campus']:
+            count = refresh_campus(Campus.objects.get(pk=options['campus']))
+        else:
+            count = refresh_all()
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully stored {count} campus distances')
+        )
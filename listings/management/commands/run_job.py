@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from listings.jobs import DEFAULT_CHUNK_SIZE, JOBS
+
+class Command(BaseCommand):
+    help = 'Run one scheduled maintenance job now'
+
+    def add_arguments(self, parser):
+        parser.add_argument('job', choices=sorted(JOBS))
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+        parser.add_argument('--dry-run', action='store_true', help='Report matching rows without changing them')
+
+    def handle(self, *args, **options):
+        result = JOBS[options['job']](chunk_size=options['chunk_size'], dry_run=options['dry_run'])
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully ran {result}')
+        )
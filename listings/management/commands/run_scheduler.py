@@ -0,0 +1,32 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+class Command(BaseCommand):
+    help = 'Run CELERY_BEAT_SCHEDULE in this process (for development, instead of celery beat)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Run every job once and exit')
+        parser.add_argument('--dry-run', action='store_true', help='Report matching rows without changing them')
+
+    def handle(self, *args, **options):
+        schedule = settings.CELERY_BEAT_SCHEDULE
+        next_run = {name: 0 for name in schedule}
+
+        while True:
+            for name, entry in schedule.items():
+                if time.monotonic() < next_run[name]:
+                    continue
+                # Calling a task object runs it inline
+                result = import_string(entry['task'])(dry_run=options['dry_run'])
+                self.stdout.write(f"{name}: {result['rows']} rows in {result['chunks']} chunks ({result['duration']}s)")
+                next_run[name] = time.monotonic() + entry['schedule']
+
+            if options['once']:
+                break
+            time.sleep(max(1, min(next_run.values()) - time.monotonic()))
+
+        self.stdout.write(
+            self.style.SUCCESS('Successfully ran scheduled jobs')
+        )
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from listings.search_cache import cache_stats, get_generation, reset_stats
+
+class Command(BaseCommand):
+    help = 'Show hit/miss counts for the search count and page caches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Zero the counters after printing them')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'Listings generation: {get_generation()}')
+        for namespace, stats in cache_stats().items():
+            self.stdout.write(
+                f"{namespace}: {stats['hits']} hits, {stats['misses']} misses "
+                f"({stats['hit_rate']:.1%} hit rate)"
+            )
+
+        if options['reset']:
+            reset_stats()
+            self.stdout.write(self.style.SUCCESS('Successfully reset search cache stats'))
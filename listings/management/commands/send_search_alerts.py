@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from listings.saved_searches import send_all_alerts
+
+class Command(BaseCommand):
+    help = 'Email users a digest of new listings matching their saved searches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Matches sent per batch')
+
+    def handle(self, *args, **options):
+        total, failed = send_all_alerts(batch_size=options['batch_size'])
+        if failed:
+            self.stdout.write(self.style.WARNING(f'Alerts for {failed} users failed and stay pending'))
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully sent {total} search alert emails')
+        )
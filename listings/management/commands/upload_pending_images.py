@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from listings.uploads import retry_uploads, upload_image
+
+class Command(BaseCommand):
+    help = 'Retry listing photo uploads that were lost or failed, from their spool files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--failed', action='store_true', help='Also retry uploads that failed, not just lost ones')
+
+    def handle(self, *args, **options):
+        queued, abandoned = retry_uploads(include_failed=options['failed'])
+        uploaded = sum(upload_image(image_id) for image_id in queued)
+        if abandoned:
+            self.stdout.write(f'{len(abandoned)} images have no spool file left and were marked failed')
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully uploaded {uploaded} of {len(queued)} pending images')
+        )
@@ -0,0 +1,113 @@
+"""Server-side grid clustering of search results for the map
+
+The world is cut into square cells whose size halves with every zoom
+level; the database groups matching documents by cell, so the response
+size depends on the viewport, not on how many listings match. Cells are
+anchored at 0,0 rather than at the viewport, so a cluster stays put (and
+its cached entry stays valid) while the map is panned.
+"""
+import hashlib
+import math
+
+from django.db.models import Avg, Count, F, Max, Min, Value
+from django.db.models.functions import Floor
+
+from .models import Listing
+from .search import SearchFilters, base_documents, parse_bbox
+from .search_cache import cached
+
+
+# Cluster cells per 256px map tile, i.e. roughly one cluster per 64px square
+CELLS_PER_TILE = 4
+MAX_ZOOM = 20
+COORDINATE_DIGITS = 5
+
+
+def parse_zoom(value):
+    try:
+        return min(max(int(value), 0), MAX_ZOOM)
+    except (TypeError, ValueError):
+        return None
+
+
+def cell_degrees(zoom):
+    return 360.0 / ((1 << zoom) * CELLS_PER_TILE)
+
+
+def snap_viewport(viewport, size):
+    """Grow the viewport to whole cells so nearby viewports share a cache entry"""
+    south, west, north, east = viewport
+    return (
+        max(math.floor(south / size) * size, -90.0),
+        max(math.floor(west / size) * size, -180.0),
+        min(math.ceil(north / size) * size, 90.0),
+        min(math.ceil(east / size) * size, 180.0),
+    )
+
+
+class MapRequest:
+    """Search filters plus the map's viewport= (south,west,north,east) and zoom="""
+
+    def __init__(self, params):
+        self.filters = SearchFilters(params)
+        self.zoom = parse_zoom(params.get('zoom'))
+        viewport = parse_bbox(params.get('viewport', ''))
+        if self.zoom is None or viewport is None:
+            # No map yet: cluster the whole result set coarsely and report its bounds
+            self.zoom = 2
+            viewport = None
+        self.cell = cell_degrees(self.zoom)
+        self.viewport = snap_viewport(viewport, self.cell) if viewport else None
+
+    def cache_key(self):
+        viewport = '%.6f,%.6f,%.6f,%.6f' % self.viewport if self.viewport else ''
+        parts = [self.filters.cache_key(), str(self.zoom), viewport]
+        return hashlib.md5(':'.join(parts).encode()).hexdigest()
+
+    def markers(self):
+        return cached('map', self.cache_key(), self.compute)
+
+    def compute(self):
+        documents = self.filters.apply(base_documents()).filter(
+            latitude__isnull=False, longitude__isnull=False,
+        )
+        if self.viewport:
+            documents = documents.filter(SearchFilters.box_query(self.viewport))
+
+        cells = documents.order_by().annotate(
+            row=Floor(F('latitude') / Value(self.cell)),
+            column=Floor(F('longitude') / Value(self.cell)),
+        ).values('row', 'column').annotate(
+            count=Count('listing_id'),
+            latitude=Avg('latitude'),
+            longitude=Avg('longitude'),
+            min_rent=Min('rent'),
+            listing_id=Max('listing_id'),
+        )
+
+        # Compact rows: clusters are [lat, lng, count, min_rent],
+        # single listings are [lat, lng, listing_id, rent, title]
+        clusters = []
+        points = {}
+        for cell in cells:
+            latitude = round(cell['latitude'], COORDINATE_DIGITS)
+            longitude = round(cell['longitude'], COORDINATE_DIGITS)
+            if cell['count'] == 1:
+                points[cell['listing_id']] = [latitude, longitude, cell['listing_id'], float(cell['min_rent'])]
+            else:
+                clusters.append([latitude, longitude, cell['count'], float(cell['min_rent'])])
+
+        for listing_id, title in Listing.objects.filter(pk__in=points).values_list('pk', 'title'):
+            points[listing_id].append(title)
+
+        data = {
+            'zoom': self.zoom,
+            'clusters': clusters,
+            'points': sorted(points.values(), key=lambda point: point[2]),
+        }
+        if not self.viewport:
+            bounds = documents.aggregate(
+                south=Min('latitude'), west=Min('longitude'), north=Max('latitude'), east=Max('longitude'),
+            )
+            data['bounds'] = [bounds['south'], bounds['west'], bounds['north'], bounds['east']] if clusters or points else None
+        return data
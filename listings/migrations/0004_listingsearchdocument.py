@@ -0,0 +1,67 @@
+# Generated by Django 5.2.10 on 2026-10-18 10:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_search_documents(apps, schema_editor):
+    Listing = apps.get_model('listings', 'Listing')
+    ListingSearchDocument = apps.get_model('listings', 'ListingSearchDocument')
+
+    def normalize(value):
+        return ' '.join((value or '').lower().split())
+
+    ListingSearchDocument.objects.bulk_create([
+        ListingSearchDocument(
+            listing=listing,
+            status=listing.status,
+            posting_type=listing.posting_type,
+            listing_type=listing.listing_type,
+            duration_type=listing.duration_type,
+            rent=listing.rent,
+            beds=listing.beds,
+            lease_start=listing.lease_start,
+            lease_end=listing.lease_end,
+            city=normalize(listing.city),
+            state=normalize(listing.state),
+            zip_code=normalize(listing.zip_code),
+            is_boosted=listing.is_boosted,
+            last_bumped=listing.last_bumped,
+            created_at=listing.created_at,
+        )
+        for listing in Listing.objects.all()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0003_alter_contactmessage_listing_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ListingSearchDocument',
+            fields=[
+                ('listing', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='listings.listing')),
+                ('status', models.CharField(max_length=20)),
+                ('posting_type', models.CharField(max_length=20)),
+                ('listing_type', models.CharField(max_length=10)),
+                ('duration_type', models.CharField(max_length=20)),
+                ('rent', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('beds', models.IntegerField()),
+                ('lease_start', models.DateField()),
+                ('lease_end', models.DateField()),
+                ('city', models.CharField(max_length=100)),
+                ('state', models.CharField(max_length=50)),
+                ('zip_code', models.CharField(max_length=10)),
+                ('is_boosted', models.BooleanField(default=False)),
+                ('last_bumped', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'posting_type', 'created_at'], name='search_newest_idx'), models.Index(fields=['status', 'posting_type', 'rent'], name='search_rent_idx'), models.Index(fields=['status', 'posting_type', 'city'], name='search_city_idx'), models.Index(fields=['status', 'posting_type', 'duration_type', 'beds'], name='search_duration_beds_idx'), models.Index(fields=['status', 'posting_type', 'lease_start', 'lease_end'], name='search_lease_idx')],
+            },
+        ),
+        migrations.RunPython(build_search_documents, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,120 @@
+# Generated by Django 5.2.10 on 2026-10-18 10:59
+
+import re
+
+from django.db import migrations, models
+
+
+# Frozen copy of listings.location_search as of this migration, so later changes
+# to the tokenizer can't change what this migration does
+FTS_TABLE = 'listings_location_fts'
+
+US_STATES = {
+    'al': 'alabama', 'ak': 'alaska', 'az': 'arizona', 'ar': 'arkansas', 'ca': 'california',
+    'co': 'colorado', 'ct': 'connecticut', 'de': 'delaware', 'dc': 'district of columbia',
+    'fl': 'florida', 'ga': 'georgia', 'hi': 'hawaii', 'id': 'idaho', 'il': 'illinois',
+    'in': 'indiana', 'ia': 'iowa', 'ks': 'kansas', 'ky': 'kentucky', 'la': 'louisiana',
+    'me': 'maine', 'md': 'maryland', 'ma': 'massachusetts', 'mi': 'michigan', 'mn': 'minnesota',
+    'ms': 'mississippi', 'mo': 'missouri', 'mt': 'montana', 'ne': 'nebraska', 'nv': 'nevada',
+    'nh': 'new hampshire', 'nj': 'new jersey', 'nm': 'new mexico', 'ny': 'new york',
+    'nc': 'north carolina', 'nd': 'north dakota', 'oh': 'ohio', 'ok': 'oklahoma', 'or': 'oregon',
+    'pa': 'pennsylvania', 'ri': 'rhode island', 'sc': 'south carolina', 'sd': 'south dakota',
+    'tn': 'tennessee', 'tx': 'texas', 'ut': 'utah', 'vt': 'vermont', 'va': 'virginia',
+    'wa': 'washington', 'wv': 'west virginia', 'wi': 'wisconsin', 'wy': 'wyoming',
+}
+STATE_ABBREVIATIONS = {name: abbr for abbr, name in US_STATES.items()}
+
+WORD_RE = re.compile(r'[a-z0-9]+')
+
+
+def words(value):
+    return WORD_RE.findall((value or '').lower())
+
+
+def state_abbreviation(state):
+    state = ' '.join(words(state))
+    if state in US_STATES:
+        return state
+    return STATE_ABBREVIATIONS.get(state, state)
+
+
+def location_tokens(city, state, zip_code, campus_names=()):
+    tokens = words(city)
+
+    abbreviation = state_abbreviation(state)
+    if abbreviation:
+        tokens.append(abbreviation)
+        tokens.extend(words(US_STATES.get(abbreviation, '')))
+
+    zip_digits = ''.join(words(zip_code))[:5]
+    if zip_digits:
+        tokens.append(zip_digits)
+        if len(zip_digits) > 3:
+            tokens.append(zip_digits[:3])
+
+    for name in campus_names:
+        tokens.extend(words(name))
+
+    return ' '.join(dict.fromkeys(tokens))
+
+
+def create_location_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(tokens)')
+    elif vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS search_location_fts_idx ON listings_listingsearchdocument '
+            "USING gin (to_tsvector('simple', location_tokens))"
+        )
+
+
+def drop_location_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+    elif vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS search_location_fts_idx')
+
+
+def populate_location_tokens(apps, schema_editor):
+    Campus = apps.get_model('listings', 'Campus')
+    ListingSearchDocument = apps.get_model('listings', 'ListingSearchDocument')
+
+    campus_names = {}
+    for campus in Campus.objects.all():
+        key = (' '.join(campus.city.lower().split()), state_abbreviation(campus.state))
+        campus_names.setdefault(key, []).append(campus.school_name)
+
+    documents = list(ListingSearchDocument.objects.select_related('listing'))
+    for document in documents:
+        listing = document.listing
+        key = (' '.join(listing.city.lower().split()), state_abbreviation(listing.state))
+        document.location_tokens = location_tokens(
+            listing.city, listing.state, listing.zip_code, campus_names.get(key, [])
+        )
+    ListingSearchDocument.objects.bulk_update(documents, ['location_tokens'], batch_size=500)
+
+    if schema_editor.connection.vendor == 'sqlite':
+        with schema_editor.connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (rowid, tokens) VALUES (%s, %s)',
+                [(document.pk, document.location_tokens) for document in documents],
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0004_listingsearchdocument'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listingsearchdocument',
+            name='location_tokens',
+            field=models.TextField(blank=True),
+        ),
+        migrations.RunPython(create_location_index, drop_location_index),
+        migrations.RunPython(populate_location_tokens, migrations.RunPython.noop),
+    ]
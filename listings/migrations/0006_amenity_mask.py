@@ -0,0 +1,52 @@
+# Generated by Django 5.2.10 on 2026-10-18 11:03
+
+from django.db import migrations, models
+
+
+# Bit positions as of this migration, frozen so later changes to the model can't alter it
+AMENITY_FIELDS = [
+    'furnished', 'pets_allowed', 'washer_dryer_in_unit', 'dishwasher', 'air_conditioning',
+    'heating', 'balcony', 'gym', 'pool', 'parking', 'doorman', 'elevator', 'laundry_in_building',
+    'bike_storage', 'electricity_included', 'water_included', 'gas_included', 'internet_included',
+    'cable_included',
+]
+
+
+def populate_amenity_masks(apps, schema_editor):
+    Listing = apps.get_model('listings', 'Listing')
+    ListingSearchDocument = apps.get_model('listings', 'ListingSearchDocument')
+    listings = []
+    for listing in Listing.objects.only('pk', *AMENITY_FIELDS).iterator():
+        listing.amenity_mask = sum(1 << bit for bit, name in enumerate(AMENITY_FIELDS) if getattr(listing, name))
+        listings.append(listing)
+    Listing.objects.bulk_update(listings, ['amenity_mask'], batch_size=500)
+    masks = {listing.pk: listing.amenity_mask for listing in listings}
+    documents = list(ListingSearchDocument.objects.only('pk', 'listing_id'))
+    for document in documents:
+        document.amenity_mask = masks.get(document.listing_id, 0)
+    ListingSearchDocument.objects.bulk_update(documents, ['amenity_mask'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0005_location_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listing',
+            name='amenity_mask',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='listingsearchdocument',
+            name='amenity_mask',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='listingsearchdocument',
+            index=models.Index(fields=['status', 'posting_type', 'amenity_mask'], name='search_amenity_idx'),
+        ),
+        migrations.RunPython(populate_amenity_masks, migrations.RunPython.noop),
+    ]
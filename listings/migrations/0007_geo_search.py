@@ -0,0 +1,77 @@
+# Generated by Django 5.2.10 on 2026-10-18 11:04
+
+from django.db import migrations, models
+
+
+# Frozen copy of listings.geo.encode_geohash as of this migration
+GEOHASH_PRECISION = 9
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < precision:
+        value, bounds = (longitude, lng_range) if even else (latitude, lat_range)
+        middle = (bounds[0] + bounds[1]) / 2
+        bits <<= 1
+        if value >= middle:
+            bits |= 1
+            bounds[0] = middle
+        else:
+            bounds[1] = middle
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(GEOHASH_ALPHABET[bits])
+            bits = 0
+            bit_count = 0
+    return ''.join(chars)
+
+
+def populate_coordinates(apps, schema_editor):
+    ListingSearchDocument = apps.get_model('listings', 'ListingSearchDocument')
+
+    documents = list(ListingSearchDocument.objects.select_related('listing').filter(
+        listing__latitude__isnull=False,
+        listing__longitude__isnull=False,
+    ))
+    for document in documents:
+        document.latitude = document.listing.latitude
+        document.longitude = document.listing.longitude
+        document.geohash = encode_geohash(document.latitude, document.longitude)
+    ListingSearchDocument.objects.bulk_update(documents, ['latitude', 'longitude', 'geohash'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0006_amenity_mask'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listingsearchdocument',
+            name='geohash',
+            field=models.CharField(blank=True, max_length=12),
+        ),
+        migrations.AddField(
+            model_name='listingsearchdocument',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='listingsearchdocument',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='listingsearchdocument',
+            index=models.Index(fields=['status', 'posting_type', 'geohash'], name='search_geohash_idx'),
+        ),
+        migrations.RunPython(populate_coordinates, migrations.RunPython.noop),
+    ]
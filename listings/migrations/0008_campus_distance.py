@@ -0,0 +1,37 @@
+# Generated by Django 5.2.10 on 2026-10-18 11:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0007_geo_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='campus',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='campus',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='CampusDistance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('miles', models.FloatField()),
+                ('campus', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='listing_distances', to='listings.campus')),
+                ('listing', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='campus_distances', to='listings.listing')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['campus', 'miles'], name='campus_distance_idx')],
+                'unique_together': {('listing', 'campus')},
+            },
+        ),
+    ]
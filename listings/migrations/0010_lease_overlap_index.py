@@ -0,0 +1,17 @@
+# Generated by Django 5.2.10 on 2026-10-18 11:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0009_geocoding'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='listingsearchdocument',
+            index=models.Index(fields=['status', 'posting_type', 'lease_end', 'lease_start'], name='search_lease_end_idx'),
+        ),
+    ]
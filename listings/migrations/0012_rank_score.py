@@ -0,0 +1,68 @@
+# Generated by Django 5.2.10 on 2026-10-18 11:15
+
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+# Frozen copy of listings.models.rank_score as of this migration
+BOOST_RANK_BONUS = timedelta(days=3650).total_seconds()
+
+
+def rank_score(is_boosted, boosted_until, last_bumped, created_at, now):
+    score = (last_bumped or created_at or now).timestamp()
+    if is_boosted and (boosted_until is None or boosted_until > now):
+        score += BOOST_RANK_BONUS
+    return score
+
+
+def populate_rank_scores(apps, schema_editor):
+    Listing = apps.get_model('listings', 'Listing')
+    ListingSearchDocument = apps.get_model('listings', 'ListingSearchDocument')
+
+    now = timezone.now()
+    listings = list(Listing.objects.all())
+    for listing in listings:
+        # Boosts that already ran out are cleared here rather than on the first job run
+        if listing.is_boosted and listing.boosted_until and listing.boosted_until <= now:
+            listing.is_boosted = False
+        listing.rank_score = rank_score(
+            listing.is_boosted, listing.boosted_until, listing.last_bumped, listing.created_at, now,
+        )
+    Listing.objects.bulk_update(listings, ['is_boosted', 'rank_score'], batch_size=500)
+
+    scores = {listing.pk: (listing.is_boosted, listing.rank_score) for listing in listings}
+    documents = list(ListingSearchDocument.objects.all())
+    for document in documents:
+        document.is_boosted, document.rank_score = scores[document.listing_id]
+    ListingSearchDocument.objects.bulk_update(documents, ['is_boosted', 'rank_score'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0011_saved_searches'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='listing',
+            options={'ordering': ['-rank_score', '-created_at']},
+        ),
+        migrations.AddField(
+            model_name='listing',
+            name='rank_score',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='listingsearchdocument',
+            name='rank_score',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='listingsearchdocument',
+            index=models.Index(fields=['status', 'posting_type', 'rank_score', 'listing'], name='search_rank_idx'),
+        ),
+        migrations.RunPython(populate_rank_scores, migrations.RunPython.noop),
+    ]
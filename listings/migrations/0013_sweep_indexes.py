@@ -0,0 +1,27 @@
+# Generated by Django 5.2.10 on 2026-10-18 11:17
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0012_rank_score'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(fields=['is_boosted', 'boosted_until'], name='listing_boost_expiry_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(fields=['status', 'last_bumped'], name='listing_status_bumped_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(fields=['status', 'created_at'], name='listing_status_created_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.10 on 2026-10-18 11:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0013_sweep_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listingimage',
+            name='derivatives',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
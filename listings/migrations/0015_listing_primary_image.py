@@ -0,0 +1,27 @@
+# Generated by Django 5.2.10 on 2026-10-18 11:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def populate_primary_images(apps, schema_editor):
+    Listing = apps.get_model('listings', 'Listing')
+    ListingImage = apps.get_model('listings', 'ListingImage')
+    first_image = ListingImage.objects.filter(listing=models.OuterRef('pk')).order_by('-is_primary', 'order', 'pk')
+    Listing.objects.update(primary_image=models.Subquery(first_image.values('pk')[:1]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0014_listingimage_derivatives'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listing',
+            name='primary_image',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='listings.listingimage'),
+        ),
+        migrations.RunPython(populate_primary_images, migrations.RunPython.noop),
+    ]
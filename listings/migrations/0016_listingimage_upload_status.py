@@ -0,0 +1,33 @@
+# Generated by Django 5.2.10 on 2026-10-18 11:22
+
+import cloudinary.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0015_listing_primary_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listingimage',
+            name='spool_path',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='listingimage',
+            name='upload_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('uploading', 'Uploading'), ('ready', 'Ready'), ('failed', 'Failed')], default='ready', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='listingimage',
+            name='image',
+            field=cloudinary.models.CloudinaryField(blank=True, max_length=255, null=True, verbose_name='image'),
+        ),
+        migrations.AddIndex(
+            model_name='listingimage',
+            index=models.Index(fields=['upload_status', 'uploaded_at'], name='image_upload_status_idx'),
+        ),
+    ]
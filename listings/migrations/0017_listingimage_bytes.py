@@ -0,0 +1,23 @@
+# Generated by Django 5.2.10 on 2026-10-18 11:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0016_listingimage_upload_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listingimage',
+            name='original_bytes',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='listingimage',
+            name='stored_bytes',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.10 on 2026-10-18 11:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0017_listingimage_bytes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listingimage',
+            name='content_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='listingimage',
+            name='hash_band_0',
+            field=models.IntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='listingimage',
+            name='hash_band_1',
+            field=models.IntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='listingimage',
+            name='hash_band_2',
+            field=models.IntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='listingimage',
+            name='hash_band_3',
+            field=models.IntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='listingimage',
+            name='perceptual_hash',
+            field=models.CharField(blank=True, editable=False, max_length=16),
+        ),
+        migrations.AddIndex(
+            model_name='listingimage',
+            index=models.Index(fields=['content_hash'], name='image_content_hash_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='listingimage',
+            index=models.Index(fields=['hash_band_0'], name='image_hash_band_0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='listingimage',
+            index=models.Index(fields=['hash_band_1'], name='image_hash_band_1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='listingimage',
+            index=models.Index(fields=['hash_band_2'], name='image_hash_band_2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='listingimage',
+            index=models.Index(fields=['hash_band_3'], name='image_hash_band_3_idx'),
+        ),
+    ]
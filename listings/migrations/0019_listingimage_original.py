@@ -0,0 +1,18 @@
+# Generated by Django 5.2.10 on 2026-10-18 11:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0018_listingimage_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listingimage',
+            name='original',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+    ]
@@ -0,0 +1,90 @@
+# Generated by Django 5.2.10 on 2026-10-18 11:32
+
+import django.db.models.deletion
+import django.db.models.functions.comparison
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.utils.text import Truncator
+
+
+def populate_conversations(apps, schema_editor):
+    """Group existing messages by listing and pair of users, oldest first"""
+    Conversation = apps.get_model('listings', 'Conversation')
+    Message = apps.get_model('listings', 'Message')
+    conversations = {}
+    messages = []
+    for message in Message.objects.order_by('created_at', 'pk').iterator():
+        key = (message.listing_id, *sorted((message.sender_id, message.recipient_id)))
+        conversation = conversations.get(key)
+        if conversation is None:
+            conversation = conversations[key] = Conversation.objects.create(
+                listing_id=message.listing_id,
+                initiator_id=message.sender_id,
+                recipient_id=message.recipient_id,
+                subject=message.subject,
+            )
+        conversation.last_message_at = message.created_at
+        conversation.snippet = Truncator(message.body).chars(140)
+        if not message.is_read:
+            if message.recipient_id == conversation.initiator_id:
+                conversation.initiator_unread += 1
+            else:
+                conversation.recipient_unread += 1
+        message.conversation = conversation
+        messages.append(message)
+    Conversation.objects.bulk_update(
+        conversations.values(), ['last_message_at', 'snippet', 'initiator_unread', 'recipient_unread'], batch_size=500,
+    )
+    Message.objects.bulk_update(messages, ['conversation'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0019_listingimage_original'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Conversation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject', models.CharField(max_length=200)),
+                ('last_message_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('snippet', models.CharField(blank=True, max_length=140)),
+                ('initiator_unread', models.PositiveIntegerField(default=0)),
+                ('recipient_unread', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('initiator', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='started_conversations', to=settings.AUTH_USER_MODEL)),
+                ('listing', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='conversations', to='listings.listing')),
+                ('recipient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='received_conversations', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-last_message_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='conversation',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='messages', to='listings.conversation'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['conversation', 'created_at'], name='message_conversation_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='conversation',
+            index=models.Index(fields=['initiator', '-last_message_at'], name='conversation_initiator_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='conversation',
+            index=models.Index(fields=['recipient', '-last_message_at'], name='conversation_recipient_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='conversation',
+            constraint=models.UniqueConstraint(models.F('listing'), django.db.models.functions.comparison.Least('initiator', 'recipient'), django.db.models.functions.comparison.Greatest('initiator', 'recipient'), name='conversation_participants_uniq'),
+        ),
+        migrations.RunPython(populate_conversations, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,17 @@
-from django.db import models
+from django.conf import settings
+from django.db import IntegrityError, models, transaction
+from django.db.models.functions import Greatest, Least
 from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import UploadedFile
 from django.utils import timezone
+from django.utils.text import Truncator
 from datetime import timedelta
 from cloudinary.models import CloudinaryField
+from .geo import encode_geohash
+from .image_ingest import HASH_BANDS, LISTING_PHOTO, fingerprint, hash_bands, ingest
+from .location_search import get_backend, location_tokens, state_abbreviation
+from .unread import decrement_unread, increment_unread
 
 User = get_user_model()
 
@@ -43,16 +52,88 @@ STATUS_CHOICES = [
     ('rented', 'Rented'),
 ]
 
+UPLOAD_STATUS_CHOICES = [
+    ('pending', 'Pending'),
+    ('uploading', 'Uploading'),
+    ('ready', 'Ready'),
+    ('failed', 'Failed'),
+]
+
+# AMENITY BITMASK (bit positions are stored in the database; only append)
+AMENITY_CHOICES = [
+    ('furnished', 'Furnished'),
+    ('pets_allowed', 'Pets Allowed'),
+    ('washer_dryer_in_unit', 'In-Unit Washer/Dryer'),
+    ('dishwasher', 'Dishwasher'),
+    ('air_conditioning', 'Air Conditioning'),
+    ('heating', 'Heating'),
+    ('balcony', 'Balcony'),
+    ('gym', 'Gym'),
+    ('pool', 'Pool'),
+    ('parking', 'Parking'),
+    ('doorman', 'Doorman'),
+    ('elevator', 'Elevator'),
+    ('laundry_in_building', 'Laundry in Building'),
+    ('bike_storage', 'Bike Storage'),
+    ('electricity_included', 'Electricity Included'),
+    ('water_included', 'Water Included'),
+    ('gas_included', 'Gas Included'),
+    ('internet_included', 'Internet Included'),
+    ('cable_included', 'Cable Included'),
+]
+AMENITY_BITS = {name: 1 << bit for bit, (name, label) in enumerate(AMENITY_CHOICES)}
+
+# A live boost ranks a listing as if it had been bumped this much later,
+# which puts boosted listings ahead of everything else, as ordering did
+BOOST_RANK_BONUS = timedelta(days=3650).total_seconds()
+
+def rank_score(is_boosted, boosted_until, last_bumped, created_at, now=None):
+    """Sort key for the default order: latest activity, plus a bonus while boosted"""
+    now = now or timezone.now()
+    score = (last_bumped or created_at or now).timestamp()
+    if is_boosted and (boosted_until is None or boosted_until > now):
+        score += BOOST_RANK_BONUS
+    return score
+
+def amenity_mask(names):
+    mask = 0
+    for name in names:
+        mask |= AMENITY_BITS.get(name, 0)
+    return mask
+
 class Campus(models.Model):
     school_name = models.CharField(max_length=200)
     city = models.CharField(max_length=100)
     state = models.CharField(max_length=50)
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
     
     class Meta:
         verbose_name_plural = "Campuses"
     
     def __str__(self):
         return f"{self.school_name} - {self.city}, {self.state}"
+    
+    @staticmethod
+    def location_key(city, state):
+        return (normalize_location(city), state_abbreviation(state))
+    
+    @classmethod
+    def names_by_location(cls):
+        """Map (city, state abbreviation) to the campus names located there"""
+        names = {}
+        for campus in cls.objects.all():
+            names.setdefault(cls.location_key(campus.city, campus.state), []).append(campus.school_name)
+        return names
+    
+    @classmethod
+    def names_near(cls, city, state):
+        key = cls.location_key(city, state)
+        return [
+            campus.school_name
+            for campus in cls.objects.filter(city__iexact=city.strip())
+            if cls.location_key(campus.city, campus.state) == key
+        ]
 
 class Listing(models.Model):
     # Basic Info
@@ -80,6 +161,8 @@ class Listing(models.Model):
     zip_code = models.CharField(max_length=10)
     latitude = models.FloatField(null=True, blank=True)
     longitude = models.FloatField(null=True, blank=True)
+    # Normalized address the coordinates were last geocoded from
+    geocoded_address = models.CharField(max_length=255, blank=True, editable=False)
     
     # APARTMENT AMENITIES
     furnished = models.BooleanField(default=False)
@@ -107,6 +190,9 @@ class Listing(models.Model):
     internet_included = models.BooleanField(default=False)
     cable_included = models.BooleanField(default=False)
     
+    # Packed copy of the amenity booleans above, maintained in save()
+    amenity_mask = models.IntegerField(default=0, editable=False)
+    
     # ROOMMATE INFO (for rooms)
     has_roommates = models.BooleanField(default=False)
     number_of_roommates = models.IntegerField(null=True, blank=True)
@@ -129,12 +215,68 @@ class Listing(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     last_bumped = models.DateTimeField(null=True, blank=True)
     
+    # Boost state, bump time and age in one column, maintained in save()
+    rank_score = models.FloatField(default=0, editable=False)
+    
+    # First image in display order, maintained by ListingImage so cards need no extra query
+    primary_image = models.ForeignKey(
+        'ListingImage', on_delete=models.SET_NULL, null=True, blank=True, editable=False, related_name='+'
+    )
+    
     class Meta:
-        ordering = ['-is_boosted', '-last_bumped', '-created_at']
+        ordering = ['-rank_score', '-created_at']
+        indexes = [
+            # Scheduled sweeps in jobs.py
+            models.Index(fields=['is_boosted', 'boosted_until'], name='listing_boost_expiry_idx'),
+            models.Index(fields=['status', 'last_bumped'], name='listing_status_bumped_idx'),
+            models.Index(fields=['status', 'created_at'], name='listing_status_created_idx'),
+        ]
     
     def __str__(self):
         return self.title
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.mark_coordinates_synced()
+        instance.mark_search_state_synced()
+        return instance
+    
+    def is_searchable(self):
+        """Active offerings are the only listings search_results returns"""
+        return self.__dict__.get('status') == 'active' and self.__dict__.get('posting_type') == 'offering'
+    
+    def mark_search_state_synced(self):
+        self._was_searchable = self.is_searchable()
+    
+    def became_searchable(self):
+        """True for a save that newly made the listing appear in search (created or reactivated)"""
+        return self.is_searchable() and not getattr(self, '_was_searchable', False)
+    
+    def mark_coordinates_synced(self):
+        self._synced_coordinates = (self.__dict__.get('latitude'), self.__dict__.get('longitude'))
+    
+    def coordinates_changed(self):
+        """True if latitude/longitude differ from what was loaded (or last synced)"""
+        return getattr(self, '_synced_coordinates', (None, None)) != (self.latitude, self.longitude)
+    
+    def save(self, *args, **kwargs):
+        self.amenity_mask = self.compute_amenity_mask()
+        self.rank_score = self.compute_rank_score()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'amenity_mask', 'rank_score'}
+        super().save(*args, **kwargs)
+    
+    def compute_amenity_mask(self):
+        return amenity_mask(name for name in AMENITY_BITS if getattr(self, name))
+    
+    def compute_rank_score(self, now=None):
+        return rank_score(self.is_boosted, self.boosted_until, self.last_bumped, self.created_at, now)
+    
+    def boost_active(self):
+        return self.is_boosted and (self.boosted_until is None or self.boosted_until > timezone.now())
+    
     def get_price_color(self):
         # Price affordability indicator
         if self.rent < 1000:
@@ -148,20 +290,338 @@ class Listing(models.Model):
         self.last_bumped = timezone.now()
         self.save()
 
+class ListingSearchDocument(models.Model):
+    """Narrow, indexed copy of the searchable Listing columns used by search_results"""
+    listing = models.OneToOneField(Listing, on_delete=models.CASCADE, primary_key=True, related_name='search_document')
+
+    # Filters
+    status = models.CharField(max_length=20)
+    posting_type = models.CharField(max_length=20)
+    listing_type = models.CharField(max_length=10)
+    duration_type = models.CharField(max_length=20)
+    rent = models.DecimalField(max_digits=10, decimal_places=2)
+    beds = models.IntegerField()
+    lease_start = models.DateField()
+    lease_end = models.DateField()
+    amenity_mask = models.IntegerField(default=0)
+
+    # Normalized (lowercased, trimmed) location
+    city = models.CharField(max_length=100)
+    state = models.CharField(max_length=50)
+    zip_code = models.CharField(max_length=10)
+    location_tokens = models.TextField(blank=True)
+
+    # Coordinates; geohash is '' until the listing is geocoded
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    geohash = models.CharField(max_length=12, blank=True)
+
+    # Ranking
+    is_boosted = models.BooleanField(default=False)
+    last_bumped = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField()
+    rank_score = models.FloatField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'posting_type', 'created_at'], name='search_newest_idx'),
+            # listing_id is the keyset tie-breaker, so the whole ORDER BY comes from the index
+            models.Index(fields=['status', 'posting_type', 'rank_score', 'listing'], name='search_rank_idx'),
+            models.Index(fields=['status', 'posting_type', 'rent'], name='search_rent_idx'),
+            models.Index(fields=['status', 'posting_type', 'city'], name='search_city_idx'),
+            models.Index(fields=['status', 'posting_type', 'duration_type', 'beds'], name='search_duration_beds_idx'),
+            models.Index(fields=['status', 'posting_type', 'lease_start', 'lease_end'], name='search_lease_idx'),
+            # Overlap search bounds lease_end from below; this lets that side drive the scan
+            models.Index(fields=['status', 'posting_type', 'lease_end', 'lease_start'], name='search_lease_end_idx'),
+            models.Index(fields=['status', 'posting_type', 'amenity_mask'], name='search_amenity_idx'),
+            models.Index(fields=['status', 'posting_type', 'geohash'], name='search_geohash_idx'),
+        ]
+
+    def __str__(self):
+        return f"Search document for listing {self.listing_id}"
+
+    # Columns copied from Listing; everything else is derived in values_for()
+    SYNCED_FIELDS = [
+        'status', 'posting_type', 'listing_type', 'duration_type', 'rent', 'beds',
+        'lease_start', 'lease_end', 'amenity_mask', 'latitude', 'longitude',
+        'is_boosted', 'last_bumped', 'created_at', 'rank_score',
+    ]
+
+    @classmethod
+    def values_for(cls, listing, campus_names=None):
+        """Document column values for a listing
+
+        campus_names maps Campus.location_key() to school names; pass
+        Campus.names_by_location() when syncing many listings at once.
+        """
+        if campus_names is None:
+            nearby = Campus.names_near(listing.city, listing.state)
+        else:
+            nearby = campus_names.get(Campus.location_key(listing.city, listing.state), [])
+
+        values = {field: getattr(listing, field) for field in cls.SYNCED_FIELDS}
+        # From the booleans, so check_index notices a Listing.amenity_mask that was never filled in
+        values['amenity_mask'] = listing.compute_amenity_mask()
+        values['city'] = normalize_location(listing.city)
+        values['state'] = normalize_location(listing.state)
+        values['zip_code'] = normalize_location(listing.zip_code)
+        values['location_tokens'] = location_tokens(listing.city, listing.state, listing.zip_code, nearby)
+        if listing.latitude is not None and listing.longitude is not None:
+            values['geohash'] = encode_geohash(listing.latitude, listing.longitude)
+        else:
+            values['geohash'] = ''
+        return values
+
+    @classmethod
+    def sync(cls, listing, campus_names=None):
+        """Create or refresh the document for a saved listing"""
+        values = cls.values_for(listing, campus_names)
+        cls.objects.update_or_create(listing=listing, defaults=values)
+        get_backend().index(listing.pk, values['location_tokens'])
+
+    def is_stale(self, listing, campus_names=None):
+        expected = self.values_for(listing, campus_names)
+        return any(getattr(self, field) != value for field, value in expected.items())
+
+def normalize_location(value):
+    return ' '.join((value or '').lower().split())
+
+class CampusDistance(models.Model):
+    """Precomputed distance from a geocoded listing to each campus within the cutoff"""
+    listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name='campus_distances')
+    campus = models.ForeignKey(Campus, on_delete=models.CASCADE, related_name='listing_distances')
+    miles = models.FloatField()
+    
+    class Meta:
+        unique_together = ('listing', 'campus')
+        indexes = [
+            models.Index(fields=['campus', 'miles'], name='campus_distance_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.listing_id} to {self.campus_id}: {self.miles:.1f} mi"
+
+class SavedSearch(models.Model):
+    """A user's search_results filters, re-checked against each new or reactivated listing"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='saved_searches')
+    name = models.CharField(max_length=200)
+    # SearchFilters.canonical() of the saved query
+    filters = models.JSONField(default=dict)
+    
+    # Copied out of filters for the inverted index; '' matches anything
+    location_prefix = models.CharField(max_length=3, blank=True)
+    duration_type = models.CharField(max_length=20, blank=True)
+    listing_type = models.CharField(max_length=10, blank=True)
+    beds = models.CharField(max_length=2, blank=True)
+    
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(
+                fields=['is_active', 'location_prefix', 'duration_type', 'listing_type', 'beds'],
+                name='saved_search_match_idx',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username}: {self.name}"
+
+class SavedSearchMatch(models.Model):
+    """A listing that matched a saved search, waiting for (or already in) an alert"""
+    saved_search = models.ForeignKey(SavedSearch, on_delete=models.CASCADE, related_name='matches')
+    listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name='saved_search_matches')
+    created_at = models.DateTimeField(auto_now_add=True)
+    notified_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        unique_together = ('saved_search', 'listing')
+        indexes = [
+            models.Index(fields=['notified_at', 'saved_search'], name='saved_search_pending_idx'),
+        ]
+
+class GeocodeCache(models.Model):
+    """Geocoder result per normalized address; null coordinates record a miss"""
+    address_key = models.CharField(max_length=255, unique=True)
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name_plural = "Geocode cache"
+    
+    def __str__(self):
+        return self.address_key
+
 class ListingImage(models.Model):
     listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name='images')
-    image = CloudinaryField('image')
+    # Empty until a spooled upload has been pushed; see listings.uploads
+    image = CloudinaryField('image', null=True, blank=True)
+    # Storage name of the original when Cloudinary isn't configured (USE_CLOUDINARY)
+    original = models.CharField(max_length=255, blank=True, editable=False)
     is_primary = models.BooleanField(default=False)
     order = models.IntegerField(default=0)
     uploaded_at = models.DateTimeField(auto_now_add=True)
+    upload_status = models.CharField(max_length=20, choices=UPLOAD_STATUS_CHOICES, default='ready')
+    spool_path = models.CharField(max_length=255, blank=True, editable=False)
+    # {'source': original it was made from, 'sizes': [{'width', 'height', 'webp', 'jpeg'}]}
+    derivatives = models.JSONField(default=dict, blank=True, editable=False)
+    # Upload size before and after normalization in listings.image_ingest
+    original_bytes = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    stored_bytes = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    # sha256 of the stored bytes, and the 64-bit difference hash in hex plus
+    # its four 16-bit bands for near-duplicate lookups (listings.duplicates)
+    content_hash = models.CharField(max_length=64, blank=True, editable=False)
+    perceptual_hash = models.CharField(max_length=16, blank=True, editable=False)
+    hash_band_0 = models.IntegerField(null=True, blank=True, editable=False)
+    hash_band_1 = models.IntegerField(null=True, blank=True, editable=False)
+    hash_band_2 = models.IntegerField(null=True, blank=True, editable=False)
+    hash_band_3 = models.IntegerField(null=True, blank=True, editable=False)
+    
+    INGEST_FIELDS = [
+        'original', 'original_bytes', 'stored_bytes', 'content_hash', 'perceptual_hash',
+        'hash_band_0', 'hash_band_1', 'hash_band_2', 'hash_band_3',
+    ]
+    POSITION_FIELDS = ['order', 'is_primary']
     
     class Meta:
         ordering = ['-is_primary', 'order']
+        indexes = [
+            models.Index(fields=['upload_status', 'uploaded_at'], name='image_upload_status_idx'),
+            models.Index(fields=['content_hash'], name='image_content_hash_idx'),
+            models.Index(fields=['hash_band_0'], name='image_hash_band_0_idx'),
+            models.Index(fields=['hash_band_1'], name='image_hash_band_1_idx'),
+            models.Index(fields=['hash_band_2'], name='image_hash_band_2_idx'),
+            models.Index(fields=['hash_band_3'], name='image_hash_band_3_idx'),
+        ]
     
     def save(self, *args, **kwargs):
-        if self.is_primary:
-            ListingImage.objects.filter(listing=self.listing, is_primary=True).update(is_primary=False)
+        if isinstance(self.image, UploadedFile):
+            # A new file is about to be pushed; store the normalized version instead
+            self.image, self.original_bytes, self.stored_bytes = ingest(self.image, LISTING_PHOTO)
+            self.set_fingerprint(self.image.read())
+            self.image.seek(0)
+            stored = models.Q(image__isnull=False) if settings.USE_CLOUDINARY else ~models.Q(original='')
+            duplicate = ListingImage.objects.filter(
+                stored, content_hash=self.content_hash, upload_status='ready',
+            ).exclude(pk=self.pk).first()
+            if duplicate:
+                # The same bytes are already stored; point at them instead of uploading a copy
+                self.image, self.original = duplicate.image, duplicate.original
+            elif not settings.USE_CLOUDINARY:
+                self.original = default_storage.save(f'listing_images/{self.listing_id}/{self.image.name}', self.image)
+                self.image = None
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, *self.INGEST_FIELDS}
+        # Uploads and other saves that leave order and primary alone skip the bookkeeping
+        update_fields = kwargs.get('update_fields')
+        moved = self.position_changed() and (update_fields is None or not set(self.POSITION_FIELDS).isdisjoint(update_fields))
+        if moved and self.is_primary:
+            ListingImage.objects.filter(listing_id=self.listing_id, is_primary=True).exclude(pk=self.pk).update(is_primary=False)
         super().save(*args, **kwargs)
+        if moved:
+            self.mark_position_synced()
+            refresh_primary_images(Listing.objects.filter(pk=self.listing_id))
+            if ListingImage.listing.is_cached(self):
+                # Keep the caller's listing current so a later full save doesn't write back a stale value
+                self.listing.refresh_from_db(fields=['primary_image'])
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.mark_position_synced()
+        return instance
+    
+    def mark_position_synced(self):
+        self._synced_position = (self.__dict__.get('order'), self.__dict__.get('is_primary'))
+    
+    def position_changed(self):
+        """True for new images and when order or is_primary differ from what was loaded"""
+        return getattr(self, '_synced_position', None) != (self.order, self.is_primary)
+    
+    def is_ready(self):
+        return self.upload_status == 'ready' and bool(self.image or self.original)
+    
+    def original_url(self):
+        if self.image:
+            return self.image.url
+        return default_storage.url(self.original) if self.original else ''
+    
+    def set_fingerprint(self, data):
+        self.content_hash, perceptual_hash = fingerprint(data)
+        bands = hash_bands(perceptual_hash) if perceptual_hash is not None else [None] * HASH_BANDS
+        self.perceptual_hash = f'{perceptual_hash:016x}' if perceptual_hash is not None else ''
+        self.hash_band_0, self.hash_band_1, self.hash_band_2, self.hash_band_3 = bands
+    
+    def derivative_sizes(self):
+        return (self.derivatives or {}).get('sizes', [])
+    
+    def srcset(self, extension):
+        return ', '.join(
+            f"{default_storage.url(size[extension])} {size['width']}w" for size in self.derivative_sizes()
+        )
+    
+    @property
+    def webp_srcset(self):
+        return self.srcset('webp')
+    
+    @property
+    def jpeg_srcset(self):
+        return self.srcset('jpeg')
+    
+    @property
+    def thumbnail_url(self):
+        """Smallest JPEG rendition, or the original until renditions exist"""
+        sizes = self.derivative_sizes()
+        return default_storage.url(sizes[0]['jpeg']) if sizes else self.original_url()
+    
+    @property
+    def medium_url(self):
+        sizes = self.derivative_sizes()
+        return default_storage.url(sizes[-1]['jpeg']) if sizes else self.original_url()
+
+def primary_image_subquery(outer_ref='pk'):
+    """The first image of the listing at ``outer_ref``, in ListingImage display order"""
+    return models.Subquery(
+        ListingImage.objects.filter(listing=models.OuterRef(outer_ref))
+        .order_by('-is_primary', 'order', 'pk').values('pk')[:1]
+    )
+
+def refresh_primary_images(listings):
+    """Recompute primary_image for a Listing queryset in one UPDATE"""
+    return listings.update(primary_image=primary_image_subquery())
+
+def assign_positions(images, primary_id=None):
+    """Number ``images`` in list order and mark one primary: ``primary_id``, else the first"""
+    if primary_id not in {image.pk for image in images}:
+        primary_id = images[0].pk if images else None
+    for position, image in enumerate(images):
+        image.order = position
+        image.is_primary = image.pk == primary_id if primary_id is not None else position == 0
+
+def arrange_images(listing, image_ids, primary_id=None):
+    """Set the display order and primary photo of all of a listing's images at once
+
+    ``image_ids`` gives the new order; images it leaves out follow in their
+    current order. Changed rows are written with a single bulk UPDATE.
+    """
+    with transaction.atomic():
+        images = {
+            image.pk: image
+            for image in ListingImage.objects.select_for_update().filter(listing=listing).only('pk', 'listing_id', 'order', 'is_primary')
+        }
+        ordered = [images.pop(pk) for pk in dict.fromkeys(image_ids) if pk in images]
+        ordered += sorted(images.values(), key=lambda image: (image.order, image.pk))
+        assign_positions(ordered, primary_id)
+        changed = [image for image in ordered if image.position_changed()]
+        ListingImage.objects.bulk_update(changed, ListingImage.POSITION_FIELDS)
+        for image in changed:
+            image.mark_position_synced()
+        refresh_primary_images(Listing.objects.filter(pk=listing.pk))
+    return ordered
 
 class SavedListing(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='saved_listings')
@@ -183,8 +643,110 @@ class ContactMessage(models.Model):
     class Meta:
         ordering = ['-created_at']
 
+class Conversation(models.Model):
+    """The messages two users exchange about a listing, with the inbox summary kept on the row
+
+    Message.save() stamps last_message_at and snippet and bumps the
+    recipient's unread count; mark_read() brings it back down. The inbox is
+    then one indexed query over conversations, with no per-message work.
+    """
+    SNIPPET_LENGTH = 140
+    
+    listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name='conversations')
+    initiator = models.ForeignKey(User, on_delete=models.CASCADE, related_name='started_conversations')
+    recipient = models.ForeignKey(User, on_delete=models.CASCADE, related_name='received_conversations')
+    subject = models.CharField(max_length=200)
+    
+    # Summary of the latest message
+    last_message_at = models.DateTimeField(default=timezone.now)
+    snippet = models.CharField(max_length=SNIPPET_LENGTH, blank=True)
+    
+    # Messages each participant has received here and not yet read
+    initiator_unread = models.PositiveIntegerField(default=0)
+    recipient_unread = models.PositiveIntegerField(default=0)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-last_message_at']
+        constraints = [
+            # One conversation per listing and pair of users, whoever wrote first
+            models.UniqueConstraint(
+                'listing', Least('initiator', 'recipient'), Greatest('initiator', 'recipient'),
+                name='conversation_participants_uniq',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['initiator', '-last_message_at'], name='conversation_initiator_idx'),
+            models.Index(fields=['recipient', '-last_message_at'], name='conversation_recipient_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.initiator.username} and {self.recipient.username} - {self.subject[:30]}"
+    
+    @classmethod
+    def between(cls, listing_id, sender_id, recipient_id, subject=''):
+        """The conversation about a listing between two users, started by the sender if there is none yet"""
+        participants = (
+            models.Q(initiator_id=sender_id, recipient_id=recipient_id)
+            | models.Q(initiator_id=recipient_id, recipient_id=sender_id)
+        )
+        conversation = cls.objects.filter(participants, listing_id=listing_id).first()
+        if conversation is None:
+            try:
+                with transaction.atomic():
+                    conversation = cls.objects.create(
+                        listing_id=listing_id, initiator_id=sender_id, recipient_id=recipient_id, subject=subject,
+                    )
+            except IntegrityError:
+                # Both users wrote first at the same moment
+                conversation = cls.objects.get(participants, listing_id=listing_id)
+        return conversation
+    
+    @classmethod
+    def for_user(cls, user):
+        return cls.objects.filter(models.Q(initiator=user) | models.Q(recipient=user))
+    
+    def has_participant(self, user):
+        return user.pk in (self.initiator_id, self.recipient_id)
+    
+    def other_participant(self, user):
+        return self.recipient if user.pk == self.initiator_id else self.initiator
+    
+    def unread_field(self, user_id):
+        return 'initiator_unread' if user_id == self.initiator_id else 'recipient_unread'
+    
+    def unread_for(self, user):
+        return getattr(self, self.unread_field(user.pk))
+    
+    def record(self, message):
+        """Summarize a newly sent message on the row and count it as unread for its recipient"""
+        field = self.unread_field(message.recipient_id)
+        self.last_message_at = message.created_at
+        self.snippet = Truncator(message.body).chars(self.SNIPPET_LENGTH)
+        # F() so concurrent sends and reads don't overwrite each other's counts
+        Conversation.objects.filter(pk=self.pk).update(
+            last_message_at=self.last_message_at, snippet=self.snippet, **{field: models.F(field) + 1},
+        )
+        setattr(self, field, getattr(self, field) + 1)
+    
+    def mark_read(self, user):
+        """Mark every message ``user`` received here as read; returns how many were unread"""
+        field = self.unread_field(user.pk)
+        with transaction.atomic():
+            count = self.messages.filter(recipient=user, is_read=False).update(is_read=True)
+            if count:
+                # Take off only what was marked, so a message arriving meanwhile stays counted
+                Conversation.objects.filter(pk=self.pk).update(
+                    **{field: Greatest(models.F(field) - count, models.Value(0))},
+                )
+                transaction.on_commit(lambda: decrement_unread(user.pk, count))
+        setattr(self, field, max(getattr(self, field) - count, 0))
+        return count
+
 class Message(models.Model):
     """Message between users about a listing"""
+    conversation = models.ForeignKey(Conversation, null=True, blank=True, on_delete=models.CASCADE, related_name='messages')
     listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name='messages')
     sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sent_messages')
     recipient = models.ForeignKey(User, on_delete=models.CASCADE, related_name='received_messages')
@@ -196,6 +758,19 @@ class Message(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['conversation', 'created_at'], name='message_conversation_idx'),
+        ]
     
     def __str__(self):
         return f"{self.sender.username} to {self.recipient.username} - {self.subject[:30]}"
+    
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        with transaction.atomic():
+            if adding and self.conversation_id is None:
+                self.conversation = Conversation.between(self.listing_id, self.sender_id, self.recipient_id, self.subject)
+            super().save(*args, **kwargs)
+            if adding:
+                self.conversation.record(self)
+                transaction.on_commit(lambda: increment_unread(self.recipient_id))
@@ -0,0 +1,210 @@
+"""Keyset (cursor) pagination for search results
+
+Pages are addressed by the sort key of the row just outside them instead of
+an OFFSET, so every page costs one index range scan however deep it is.
+Cursors are opaque URL-safe tokens that also carry the page number and the
+total count from the first page, so later pages never re-count.
+"""
+import base64
+import binascii
+import datetime
+import json
+import math
+
+from django.core.paginator import Paginator
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    # DjangoJSONEncoder drops microseconds, which would break keyset equality
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(payload):
+    data = json.dumps(payload, cls=CursorEncoder, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, binascii.Error) as e:
+        raise InvalidCursor(str(e))
+    if not isinstance(payload, dict) or payload.get('d') not in ('next', 'prev'):
+        raise InvalidCursor('Malformed cursor')
+    return payload
+
+
+class CountedPaginator(Paginator):
+    """OFFSET paginator that takes its total from a callable (e.g. a cache) instead of COUNT(*)"""
+
+    def __init__(self, object_list, per_page, count, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self._count = count
+
+    @cached_property
+    def count(self):
+        return self._count()
+
+
+class ResultPage:
+    """One page of results plus the query parameters that reach its neighbours
+
+    Plain data only, so a page can be cached with as_dict() and rebuilt with
+    ResultPage(**data).
+    """
+
+    def __init__(self, object_list, number, count, per_page, next_params=None, previous_params=None):
+        self.object_list = object_list
+        self.number = number
+        self.count = count
+        self.per_page = per_page
+        self.next_params = next_params
+        self.previous_params = previous_params
+
+    @classmethod
+    def from_page(cls, page):
+        """Wrap a django.core.paginator.Page"""
+        return cls(
+            list(page.object_list),
+            page.number,
+            page.paginator.count,
+            page.paginator.per_page,
+            {'page': page.next_page_number()} if page.has_next() else None,
+            {'page': page.previous_page_number()} if page.has_previous() else None,
+        )
+
+    def as_dict(self):
+        return {
+            'object_list': list(self.object_list),
+            'number': self.number,
+            'count': self.count,
+            'per_page': self.per_page,
+            'next_params': self.next_params,
+            'previous_params': self.previous_params,
+        }
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def num_pages(self):
+        if self.count is None:
+            return None
+        return max(1, math.ceil(self.count / self.per_page))
+
+    def has_next(self):
+        return self.next_params is not None
+
+    def has_previous(self):
+        return self.previous_params is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """Paginate a queryset ordered by ``ordering`` (which must end in a unique column)
+
+    ``count`` is a callable; it runs only for the first page and its result
+    is then carried forward inside the cursors.
+    """
+
+    def __init__(self, queryset, ordering, per_page, count=None):
+        self.queryset = queryset
+        self.ordering = [(name.lstrip('-'), name.startswith('-')) for name in ordering]
+        self.per_page = per_page
+        self.count = count
+        # Stored in each cursor so a token from another sort is rejected
+        self.signature = ','.join(ordering)
+
+    def _to_python(self, name, value):
+        # Sort columns are never NULL, and None cannot be compared in a filter
+        if value is None:
+            raise InvalidCursor(f'Bad value for {name}')
+        try:
+            field = self.queryset.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            # Annotations (city_rank, distance) are numbers
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+                raise InvalidCursor(f'Bad value for {name}')
+            return value
+        try:
+            return field.to_python(value)
+        except (TypeError, ValidationError):
+            raise InvalidCursor(f'Bad value for {name}')
+
+    def _after(self, values, reverse):
+        """Rows strictly after ``values`` in sort order (before, when reverse)"""
+        condition = Q()
+        equal = Q()
+        for (name, descending), value in zip(self.ordering, values):
+            lookup = 'lt' if descending != reverse else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def _payload(self, row, direction, number, count):
+        keys = [row[name] for name, _ in self.ordering]
+        return {'o': self.signature, 'k': keys, 'd': direction, 'p': number, 'n': count}
+
+    def page(self, token=None):
+        names = [name for name, _ in self.ordering]
+        queryset = self.queryset
+
+        if token:
+            payload = decode_cursor(token)
+            values = payload.get('k')
+            if payload.get('o') != self.signature or not isinstance(values, list) or len(values) != len(names):
+                raise InvalidCursor('Cursor does not match the sort order')
+            values = [self._to_python(name, value) for name, value in zip(names, values)]
+            reverse = payload['d'] == 'prev'
+            number = payload.get('p', 1)
+            count = payload.get('n')
+            if not isinstance(number, int) or not isinstance(count, (int, type(None))):
+                raise InvalidCursor('Malformed cursor')
+            queryset = queryset.filter(self._after(values, reverse))
+        else:
+            reverse = False
+            number = 1
+            count = self.count() if self.count else None
+
+        order = [f'-{name}' if descending != reverse else name for name, descending in self.ordering]
+        rows = list(queryset.order_by(*order)[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if reverse:
+            rows.reverse()
+
+        next_params = previous_params = None
+        if rows:
+            if has_more or reverse:
+                next_params = {'cursor': encode_cursor(self._payload(rows[-1], 'next', number + 1, count))}
+            if (has_more if reverse else token) and number > 1:
+                previous_params = {'cursor': encode_cursor(self._payload(rows[0], 'prev', number - 1, count))}
+
+        return ResultPage(rows, number, count, self.per_page, next_params, previous_params)
+
+
+def page_url(params, **changes):
+    """Query string for another page of the same search"""
+    query = params.copy()
+    for key in ('page', 'cursor'):
+        query.pop(key, None)
+    for key, value in changes.items():
+        query[key] = value
+    return '?' + query.urlencode()
@@ -0,0 +1,185 @@
+"""Saved searches and their new-listing alerts
+
+When a listing becomes searchable it is checked against saved searches in
+two steps. An inverted index on the most selective filters (location
+prefix, duration, listing type, beds) picks the few candidate searches;
+then a single aggregate query over the listing's search document confirms
+the full filter set of every candidate at once. Matches are queued as
+SavedSearchMatch rows and sent as one digest per user by send_search_alerts.
+"""
+import logging
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.mail import send_mail
+from django.db.models import Count, Q
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import urlencode
+
+from .location_search import get_backend, words
+from .models import ListingSearchDocument, SavedSearch, SavedSearchMatch
+from .search import SearchFilters, base_documents
+
+
+logger = logging.getLogger(__name__)
+
+PREFIX_LENGTH = 3
+VERIFY_BATCH_SIZE = 100
+BEDS_LABELS = {'0': 'Studio', '1': '1 bd', '2': '2 bd', '3': '3+ bd'}
+
+
+def location_prefix(location):
+    """Index key for a saved location: the start of its first word"""
+    location_words = words(location)
+    return location_words[0][:PREFIX_LENGTH] if location_words else ''
+
+
+def beds_key(beds):
+    # The beds filter's '3' option means three or more
+    return str(min(beds, 3))
+
+
+def save_search(user, params, name=''):
+    filters = SearchFilters(params)
+    values = filters.canonical()
+    return SavedSearch.objects.create(
+        user=user,
+        name=name or describe(values),
+        filters=values,
+        location_prefix=location_prefix(values.get('location', '')),
+        duration_type=values.get('duration', ''),
+        listing_type=values.get('listing_type', ''),
+        beds=values.get('beds', ''),
+    )
+
+
+def describe(values):
+    parts = [values.get('location', '').title() or 'Anywhere']
+    if values.get('beds'):
+        parts.append(BEDS_LABELS.get(values['beds'], values['beds']))
+    if values.get('duration'):
+        parts.append(values['duration'].replace('_', ' ').title())
+    return ' · '.join(parts)
+
+
+def query_string(saved_search):
+    """Query string that re-runs the saved search on search_results"""
+    return urlencode(saved_search.filters)
+
+
+def candidate_searches(document):
+    """Saved searches whose indexed filters allow this document"""
+    prefixes = {''}
+    for token in document.location_tokens.split():
+        prefixes.update(token[:length] for length in range(1, PREFIX_LENGTH + 1))
+    return SavedSearch.objects.filter(
+        is_active=True,
+        location_prefix__in=prefixes,
+        duration_type__in=['', document.duration_type],
+        listing_type__in=['', document.listing_type],
+        beds__in=['', beds_key(document.beds)],
+    )
+
+
+def search_query(filters):
+    """Every filter of a saved search as one Q, location included"""
+    query = Q(*filters.queries().values())
+    if filters.location:
+        matching = get_backend().filter(base_documents(), filters.location)
+        query &= Q(listing_id__in=matching.values('listing_id'))
+    return query
+
+
+def verify(document, searches):
+    """The searches among ``searches`` whose full filters match the document"""
+    matched = []
+    documents = ListingSearchDocument.objects.filter(pk=document.pk)
+    for start in range(0, len(searches), VERIFY_BATCH_SIZE):
+        batch = searches[start:start + VERIFY_BATCH_SIZE]
+        counts = documents.aggregate(**{
+            f'search_{index}': Count('listing_id', filter=search_query(SearchFilters(search.filters)))
+            for index, search in enumerate(batch)
+        })
+        matched.extend(search for index, search in enumerate(batch) if counts[f'search_{index}'])
+    return matched
+
+
+def match_listing(listing_id):
+    """Queue alerts for a listing that was just created or reactivated"""
+    document = base_documents().select_related('listing').filter(pk=listing_id).first()
+    if document is None:
+        return 0
+    searches = list(candidate_searches(document).exclude(user_id=document.listing.owner_id))
+    matches = [
+        SavedSearchMatch(saved_search=search, listing_id=listing_id)
+        for search in verify(document, searches)
+    ]
+    SavedSearchMatch.objects.bulk_create(matches, ignore_conflicts=True)
+    return len(matches)
+
+
+def send_alerts(batch_size=500, skip_users=None):
+    """Email each user one digest of their unsent matches
+
+    Returns (emails sent, matches handled); matches whose email failed stay
+    pending for the next run. Their user is added to ``skip_users``, so
+    later batches in the same run move on to everyone else.
+    """
+    skip_users = set() if skip_users is None else skip_users
+    pending = list(
+        SavedSearchMatch.objects.filter(notified_at__isnull=True, listing__status='active')
+        .exclude(saved_search__user_id__in=skip_users)
+        .select_related('saved_search__user', 'listing')
+        .order_by('saved_search__user_id', 'saved_search_id', '-created_at')[:batch_size]
+    )
+    by_user = defaultdict(list)
+    for match in pending:
+        by_user[match.saved_search.user].append(match)
+
+    sent = 0
+    done = []
+    for user, matches in by_user.items():
+        if user.email:
+            try:
+                send_mail(
+                    subject=f'{len(matches)} new sublet{"s" if len(matches) != 1 else ""} for your saved searches',
+                    message='\n'.join(
+                        f'{match.listing.title}: {settings.SITE_URL}{reverse("listing_detail", args=[match.listing_id])}'
+                        for match in matches
+                    ),
+                    from_email=settings.DEFAULT_FROM_EMAIL,
+                    recipient_list=[user.email],
+                    html_message=render_to_string('emails/search_alert.html', {
+                        'user': user,
+                        'matches': matches,
+                        'site_url': settings.SITE_URL,
+                    }),
+                )
+            except Exception:
+                # Left pending, so the next run retries this user
+                logger.warning('Search alert email failed for %s', user.username, exc_info=True)
+                skip_users.add(user.pk)
+                continue
+            sent += 1
+        done.extend(match.pk for match in matches)
+
+    SavedSearchMatch.objects.filter(pk__in=done).update(notified_at=timezone.now())
+    return sent, len(done)
+
+
+def send_all_alerts(batch_size=500):
+    """Send batches until nothing is left but users whose email failed
+
+    Returns (emails sent, users whose email failed).
+    """
+    total = 0
+    failed = set()
+    while True:
+        skipped = len(failed)
+        sent, handled = send_alerts(batch_size, failed)
+        total += sent
+        # A batch of nothing but failures still narrows the next one
+        if not handled and len(failed) == skipped:
+            return total, len(failed)
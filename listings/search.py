@@ -0,0 +1,391 @@
+"""Search over the denormalized ListingSearchDocument table"""
+import hashlib
+import json
+import math
+from datetime import date, datetime, timedelta
+
+from django.conf import settings
+from django.db.models import Case, DurationField, ExpressionWrapper, F, IntegerField, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Greatest, Least
+from django.db.models.lookups import Exact, GreaterThanOrEqual, LessThanOrEqual
+
+from .autocomplete import listing_suggestions, location_index
+from .geo import cells_query, covering_cells, distance_miles, radius_bbox
+from .location_search import get_backend
+from .models import (
+    AMENITY_BITS, Campus, CampusDistance, Listing, ListingSearchDocument, amenity_mask, normalize_location,
+)
+from .pagination import CountedPaginator, InvalidCursor, KeysetPaginator, ResultPage
+from .search_cache import bump_generation, cached, cached_count
+
+
+SORT_ORDERS = {
+    'recommended': ('-rank_score', '-listing_id'),
+    'newest': ('-created_at', '-listing_id'),
+    'price_low': ('rent', 'listing_id'),
+    'price_high': ('-rent', '-listing_id'),
+    'distance': ('distance', 'listing_id'),  # only with near= or campus=
+}
+DEFAULT_SORT = 'recommended'
+RESULTS_PER_PAGE = 12
+
+# contain: the lease covers the whole requested range; overlap: any part of it
+DATE_MODES = ['contain', 'overlap']
+MAX_OVERLAP_DAYS = 3650
+
+# Larger numbers are ignored rather than overflowing an integer column
+MAX_FILTER_INT = 2 ** 31 - 1
+MAX_ID = 2 ** 63 - 1  # BigAutoField
+
+DEFAULT_RADIUS_MILES = 5
+MAX_RADIUS_MILES = 100
+
+
+def parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        return None
+
+
+def shift_date(day, delta):
+    """day + delta, stopping at the first or last representable date"""
+    try:
+        return day + delta
+    except OverflowError:
+        return date.max if delta > timedelta() else date.min
+
+
+def parse_int(value, maximum, clamp=False):
+    """A non-negative integer up to ``maximum``; larger numbers give None, or ``maximum`` with clamp
+
+    str.isdigit() alone also accepts digits such as '²' that int() rejects.
+    """
+    if not (value.isascii() and value.isdigit()):
+        return None
+    # Compare lengths first: int() refuses strings of thousands of digits
+    digits = value.lstrip('0') or '0'
+    if len(digits) > len(str(maximum)) or int(digits) > maximum:
+        return maximum if clamp else None
+    return int(digits)
+
+
+def parse_floats(value, count):
+    """'1.5,-2' -> (1.5, -2.0); None unless exactly ``count`` numbers"""
+    try:
+        numbers = tuple(float(part) for part in value.split(','))
+    except (AttributeError, ValueError):
+        return None
+    if len(numbers) != count or not all(math.isfinite(number) for number in numbers):
+        return None
+    return numbers
+
+
+def parse_point(value):
+    point = parse_floats(value, 2)
+    if point and -90 <= point[0] <= 90 and -180 <= point[1] <= 180:
+        return point
+    return None
+
+
+def parse_bbox(value):
+    """south,west,north,east; boxes crossing the antimeridian are not supported"""
+    bbox = parse_floats(value, 4)
+    if bbox and parse_point(f'{bbox[0]},{bbox[1]}') and parse_point(f'{bbox[2]},{bbox[3]}'):
+        south, west, north, east = bbox
+        if south <= north and west <= east:
+            return bbox
+    return None
+
+
+class SearchFilters:
+    """Filters for search_results, parsed from query parameters"""
+
+    PARAMS = [
+        'location', 'start_date', 'end_date', 'date_mode', 'min_overlap_days',
+        'duration', 'beds', 'max_price', 'listing_type', 'near', 'radius', 'bbox', 'campus', 'max_miles',
+    ]
+
+    def __init__(self, params):
+        # Raw values are echoed back into the filter form
+        self.raw = {name: params.get(name, '') for name in self.PARAMS}
+
+        self.location = normalize_location(self.raw['location'])
+        self.start_date = parse_date(self.raw['start_date'])
+        self.end_date = parse_date(self.raw['end_date'])
+        self.date_mode = self.raw['date_mode'] if self.raw['date_mode'] in DATE_MODES else DATE_MODES[0]
+        min_overlap = parse_int(self.raw['min_overlap_days'], MAX_OVERLAP_DAYS, clamp=True)
+        self.min_overlap_days = self.clamp_overlap(min_overlap) if self.date_mode == 'overlap' and min_overlap else 0
+        self.duration = self.raw['duration']
+        beds = parse_int(self.raw['beds'], MAX_FILTER_INT)
+        self.beds = str(beds) if beds is not None else ''
+        max_price = parse_int(self.raw['max_price'], MAX_FILTER_INT)
+        self.max_price = str(max_price) if max_price is not None else ''
+        self.listing_type = self.raw['listing_type']
+
+        # amenities=gym,pool or repeated amenities=gym&amenities=pool (checkboxes)
+        values = params.getlist('amenities') if hasattr(params, 'getlist') else params.get('amenities', [])
+        if isinstance(values, str):
+            values = [values]
+        names = {name.strip() for value in values for name in value.split(',')}
+        self.amenities = sorted(names & AMENITY_BITS.keys())
+        self.raw['amenities'] = self.amenities
+        self.amenity_mask = amenity_mask(self.amenities)
+
+        # Geo: near=lat,lng with radius= miles, and/or bbox=south,west,north,east
+        self.near = parse_point(self.raw['near'])
+        radius = parse_floats(self.raw['radius'], 1)
+        self.radius = min(max(radius[0], 0.1), MAX_RADIUS_MILES) if radius else DEFAULT_RADIUS_MILES
+        self.bbox = parse_bbox(self.raw['bbox'])
+
+        # campus=<id>&max_miles= reads the precomputed CampusDistance table
+        self.campus = parse_int(self.raw['campus'], MAX_ID) or None
+        cutoff = settings.CAMPUS_DISTANCE_CUTOFF_MILES
+        max_miles = parse_floats(self.raw['max_miles'], 1)
+        self.max_miles = min(max(max_miles[0], 0.1), cutoff) if max_miles else cutoff
+
+    def clamp_overlap(self, days):
+        """No lease can overlap more days than the requested range has"""
+        if self.start_date and self.end_date:
+            days = min(days, max((self.end_date - self.start_date).days + 1, 1))
+        return days
+
+    def canonical(self):
+        """Normalized, non-empty filter values; equal searches give equal dicts"""
+        values = {
+            'location': self.location,
+            'start_date': self.start_date.isoformat() if self.start_date else '',
+            'end_date': self.end_date.isoformat() if self.end_date else '',
+            'date_mode': self.date_mode if self.start_date or self.end_date else '',
+            'min_overlap_days': str(self.min_overlap_days) if self.min_overlap_days > 1 else '',
+            'duration': self.duration,
+            'beds': self.beds,
+            'max_price': self.max_price,
+            'listing_type': self.listing_type,
+            'amenities': ','.join(self.amenities),
+            'near': '%.5f,%.5f' % self.near if self.near else '',
+            'radius': '%g' % self.radius if self.near else '',
+            'bbox': '%.5f,%.5f,%.5f,%.5f' % self.bbox if self.bbox else '',
+            'campus': str(self.campus) if self.campus else '',
+            'max_miles': '%g' % self.max_miles if self.campus else '',
+        }
+        return {name: value for name, value in values.items() if value}
+
+    def cache_key(self):
+        data = json.dumps(self.canonical(), sort_keys=True, separators=(',', ':'))
+        return hashlib.md5(data.encode()).hexdigest()
+
+    def queries(self):
+        """Map each active filter to the Q object it applies"""
+        queries = {}
+
+        # location goes through the full-text backend in apply()
+        if self.date_mode == 'overlap':
+            queries.update(self.overlap_queries())
+        else:
+            if self.start_date:
+                queries['start_date'] = Q(lease_start__lte=self.start_date)
+
+            if self.end_date:
+                queries['end_date'] = Q(lease_end__gte=self.end_date)
+
+        if self.duration:
+            queries['duration'] = Q(duration_type=self.duration)
+
+        if self.beds:
+            if self.beds == '3':
+                queries['beds'] = Q(beds__gte=3)
+            else:
+                queries['beds'] = Q(beds=int(self.beds))
+
+        if self.max_price:
+            if self.max_price == '2500':  # Over $2,000
+                queries['max_price'] = Q(rent__gt=2000)
+            else:
+                queries['max_price'] = Q(rent__lte=int(self.max_price))
+
+        if self.listing_type:
+            queries['listing_type'] = Q(listing_type=self.listing_type)
+
+        # One bitwise predicate: every requested amenity bit must be set
+        if self.amenity_mask:
+            queries['amenities'] = Q(Exact(F('amenity_mask').bitand(self.amenity_mask), self.amenity_mask))
+
+        # Geohash cell ranges narrow the scan, the box and distance make it exact
+        if self.near:
+            queries['near'] = self.box_query(radius_bbox(*self.near, self.radius)) & Q(
+                LessThanOrEqual(distance_miles(*self.near), self.radius)
+            )
+
+        if self.bbox:
+            queries['bbox'] = self.box_query(self.bbox)
+
+        if self.campus:
+            queries['campus'] = Q(listing_id__in=self.campus_distances().values('listing_id'))
+
+        return queries
+
+    def overlap_queries(self):
+        """Leases sharing at least min_overlap_days with the requested range
+
+        The two plain range conditions are already tightened by the minimum
+        overlap, so an index on either lease column narrows the scan before
+        the exact day count is checked.
+        """
+        queries = {}
+        slack = timedelta(days=max(self.min_overlap_days - 1, 0))
+        if self.start_date:
+            queries['start_date'] = Q(lease_end__gte=shift_date(self.start_date, slack))
+
+        if self.end_date:
+            queries['end_date'] = Q(lease_start__lte=shift_date(self.end_date, -slack))
+
+        if slack:
+            first = Greatest(F('lease_start'), Value(self.start_date)) if self.start_date else F('lease_start')
+            last = Least(F('lease_end'), Value(self.end_date)) if self.end_date else F('lease_end')
+            overlap = ExpressionWrapper(last - first, output_field=DurationField())
+            queries['min_overlap_days'] = Q(GreaterThanOrEqual(overlap, slack))
+        return queries
+
+    def campus_distances(self):
+        return CampusDistance.objects.filter(campus_id=self.campus, miles__lte=self.max_miles)
+
+    @staticmethod
+    def box_query(bbox):
+        south, west, north, east = bbox
+        return cells_query(covering_cells(*bbox)) & Q(
+            latitude__range=(south, north),
+            longitude__range=(west, east),
+        )
+
+    def apply(self, documents):
+        if self.location:
+            documents = get_backend().filter(documents, self.location)
+        for query in self.queries().values():
+            documents = documents.filter(query)
+        return documents
+
+
+def base_documents():
+    """Only people offering sublets (not seeking) are searchable"""
+    return ListingSearchDocument.objects.filter(status='active', posting_type='offering')
+
+
+def search_ordering(filters, sort_by):
+    """Sort key for the results; the last column is unique so it works as a keyset"""
+    if sort_by == 'distance' and not (filters.near or filters.campus):
+        sort_by = DEFAULT_SORT
+    order = SORT_ORDERS.get(sort_by, SORT_ORDERS[DEFAULT_SORT])
+    if filters.location:
+        order = ('city_rank',) + order
+    return order
+
+
+def search_documents(filters, sort_by):
+    documents = filters.apply(base_documents())
+
+    # Exact city matches rank ahead of state, zip and campus matches
+    if filters.location:
+        documents = documents.annotate(city_rank=Case(
+            When(city=filters.location, then=Value(0)),
+            default=Value(1),
+            output_field=IntegerField(),
+        ))
+
+    # Distances are computed by the database for the whole result set at once
+    if filters.near:
+        documents = documents.annotate(distance=distance_miles(*filters.near))
+    elif filters.campus:
+        documents = documents.annotate(distance=Subquery(
+            filters.campus_distances().filter(listing_id=OuterRef('listing_id')).values('miles')[:1]
+        ))
+
+    return documents.order_by(*search_ordering(filters, sort_by))
+
+
+def paginate(filters, sort_by, page=None, cursor=None):
+    """One page of listing ids: keyset cursors by default, OFFSET only for old ?page= links"""
+    documents = search_documents(filters, sort_by)
+
+    def count():
+        return cached_count(filters, documents.count)
+
+    if page:
+        paginator = CountedPaginator(documents.values_list('listing_id', flat=True), RESULTS_PER_PAGE, count=count)
+        return ResultPage.from_page(paginator.get_page(page))
+
+    ordering = search_ordering(filters, sort_by)
+    keys = [name.lstrip('-') for name in ordering]
+    paginator = KeysetPaginator(documents.values(*keys), ordering, RESULTS_PER_PAGE, count=count)
+    try:
+        result = paginator.page(cursor)
+    except InvalidCursor:
+        result = paginator.page()
+    result.object_list = [row['listing_id'] for row in result]
+    return result
+
+
+def search_page(filters, sort_by, page=None, cursor=None):
+    """Cached listing ids and navigation for one results page"""
+    parts = [filters.cache_key(), sort_by, page or '', cursor or '']
+    key = hashlib.md5(':'.join(parts).encode()).hexdigest()
+    data = cached('page', key, lambda: paginate(filters, sort_by, page, cursor).as_dict())
+    return ResultPage(**data)
+
+
+def hydrate(listing_ids):
+    """Load full Listing rows for a page of ids in a single query, keeping id order"""
+    listings = Listing.objects.select_related('primary_image').in_bulk(listing_ids)
+    return [listings[pk] for pk in listing_ids if pk in listings]
+
+
+# ============ INDEX MAINTENANCE ============
+
+def rebuild_index(batch_size=500):
+    """Recreate every search document from the Listing table"""
+    ListingSearchDocument.objects.all().delete()
+    campus_names = Campus.names_by_location()
+
+    created = 0
+    batch = []
+    for listing in Listing.objects.order_by('pk').iterator(chunk_size=batch_size):
+        values = ListingSearchDocument.values_for(listing, campus_names)
+        batch.append(ListingSearchDocument(listing=listing, **values))
+        if len(batch) >= batch_size:
+            created += len(ListingSearchDocument.objects.bulk_create(batch))
+            batch = []
+    if batch:
+        created += len(ListingSearchDocument.objects.bulk_create(batch))
+
+    get_backend().rebuild(ListingSearchDocument.objects.values_list('listing_id', 'location_tokens'))
+    bump_generation()
+    return created
+
+
+def sync_listings(listing_ids):
+    """Refresh documents after bulk updates that bypass Listing.save()"""
+    campus_names = Campus.names_by_location()
+    for listing in Listing.objects.filter(pk__in=list(listing_ids)):
+        ListingSearchDocument.sync(listing, campus_names)
+        location_index.update(('listing', listing.pk), listing_suggestions(listing))
+    bump_generation()
+
+
+def check_index(batch_size=500):
+    """Compare search documents with listings
+
+    Returns (missing, stale) lists of listing ids.
+    """
+    missing = []
+    stale = []
+    campus_names = Campus.names_by_location()
+    listings = Listing.objects.select_related('search_document').order_by('pk')
+    for listing in listings.iterator(chunk_size=batch_size):
+        try:
+            document = listing.search_document
+        except ListingSearchDocument.DoesNotExist:
+            missing.append(listing.pk)
+            continue
+        if document.is_stale(listing, campus_names):
+            stale.append(listing.pk)
+    return missing, stale
@@ -0,0 +1,83 @@
+"""Versioned cache for search results
+
+Every key embeds the current "listings generation". Any change to search
+input data bumps the generation, so old entries are simply never read again
+and expire on their own; nothing has to be deleted.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+GENERATION_KEY = 'listings:generation'
+STATS_NAMESPACES = ['count', 'page', 'facets', 'map']
+
+
+def _initial_generation():
+    # Seeded from the clock so a lost counter never reuses an old generation
+    return int(time.time())
+
+
+def get_generation():
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        cache.add(GENERATION_KEY, _initial_generation(), timeout=None)
+        generation = cache.get(GENERATION_KEY)
+    return generation
+
+
+def bump_generation():
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.add(GENERATION_KEY, _initial_generation(), timeout=None)
+
+
+def record(namespace, hit):
+    key = f'search:stats:{namespace}:{"hits" if hit else "misses"}'
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, timeout=None)
+
+
+def cache_stats():
+    """Hit/miss counters per namespace, for tuning SEARCH_CACHE_TIMEOUT"""
+    stats = {}
+    for namespace in STATS_NAMESPACES:
+        hits = cache.get(f'search:stats:{namespace}:hits', 0)
+        misses = cache.get(f'search:stats:{namespace}:misses', 0)
+        total = hits + misses
+        stats[namespace] = {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / total if total else 0.0,
+        }
+    return stats
+
+
+def reset_stats():
+    cache.delete_many([
+        f'search:stats:{namespace}:{kind}'
+        for namespace in STATS_NAMESPACES
+        for kind in ('hits', 'misses')
+    ])
+
+
+def cached(namespace, key, compute):
+    """Return the cached value for key in the current generation, computing it on a miss"""
+    full_key = f'search:{namespace}:{get_generation()}:{key}'
+    value = cache.get(full_key)
+    hit = value is not None
+    if not hit:
+        value = compute()
+        cache.set(full_key, value, settings.SEARCH_CACHE_TIMEOUT)
+    if settings.SEARCH_CACHE_STATS:
+        record(namespace, hit)
+    return value
+
+
+def cached_count(filters, count):
+    """Result count for a filter set, running ``count()`` only on a miss"""
+    return cached('count', filters.cache_key(), count)
@@ -0,0 +1,131 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .autocomplete import campus_suggestions, listing_suggestions, location_index
+from .background import submit
+from .campus_distances import refresh_campus_ids, refresh_listing_ids
+from .geocoding import geocode_listing_ids, needs_geocoding
+from .image_derivatives import delete_files, generate_for_ids, is_current
+from .saved_searches import match_listing
+from .location_search import get_backend
+from .models import Campus, Listing, ListingImage, ListingSearchDocument, refresh_primary_images
+from .search import sync_listings
+from .search_cache import bump_generation
+
+
+@receiver(post_save, sender=Listing)
+def sync_search_document(sender, instance, raw=False, **kwargs):
+    """Keep the search document in step with every Listing save"""
+    if raw:
+        return
+    ListingSearchDocument.sync(instance)
+
+
+@receiver(post_save, sender=Listing)
+@receiver(post_delete, sender=Listing)
+@receiver(post_save, sender=ListingImage)
+@receiver(post_delete, sender=ListingImage)
+def invalidate_search_cache(sender, instance, raw=False, **kwargs):
+    """Cached counts and pages are keyed by generation; bump it once the change is visible"""
+    if raw:
+        return
+    transaction.on_commit(bump_generation)
+
+
+@receiver(post_save, sender=Listing)
+def refresh_campus_distances(sender, instance, raw=False, **kwargs):
+    """Only listings whose coordinates moved need their campus distances recomputed"""
+    if raw or not instance.coordinates_changed():
+        return
+    instance.mark_coordinates_synced()
+    listing_id = instance.pk
+    transaction.on_commit(lambda: submit(refresh_listing_ids, [listing_id]))
+
+
+@receiver(post_save, sender=Listing)
+def geocode_listing(sender, instance, raw=False, **kwargs):
+    """Look up coordinates for new or moved listings without holding up the request"""
+    if raw or not settings.GEOCODE_ON_SAVE or not needs_geocoding(instance):
+        return
+    listing_id = instance.pk
+    transaction.on_commit(lambda: submit(geocode_listing_ids, [listing_id]))
+
+
+@receiver(post_delete, sender=ListingSearchDocument)
+def remove_location_index_entry(sender, instance, **kwargs):
+    get_backend().remove(instance.listing_id)
+
+
+@receiver(post_save, sender=Campus)
+@receiver(post_delete, sender=Campus)
+def reindex_campus_city(sender, instance, raw=False, **kwargs):
+    """Campus names are location tokens for every listing in the same city"""
+    if raw:
+        return
+    sync_listings(Listing.objects.filter(city__iexact=instance.city.strip()).values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Campus)
+def refresh_distances_for_campus(sender, instance, raw=False, **kwargs):
+    """A campus is compared against every listing, so this never runs in the request"""
+    if raw:
+        return
+    campus_id = instance.pk
+    transaction.on_commit(lambda: submit(refresh_campus_ids, [campus_id]))
+
+
+@receiver(post_save, sender=Listing)
+@receiver(post_delete, sender=Listing)
+def update_location_autocomplete(sender, instance, raw=False, created=None, **kwargs):
+    if raw:
+        return
+    # post_delete sends no ``created``; a deleted listing contributes nothing
+    suggestions = listing_suggestions(instance) if created is not None else frozenset()
+    owner = ('listing', instance.pk)
+    transaction.on_commit(lambda: location_index.update(owner, suggestions))
+
+
+@receiver(post_save, sender=Campus)
+@receiver(post_delete, sender=Campus)
+def update_campus_autocomplete(sender, instance, raw=False, created=None, **kwargs):
+    if raw:
+        return
+    suggestions = campus_suggestions(instance) if created is not None else frozenset()
+    owner = ('campus', instance.pk)
+    transaction.on_commit(lambda: location_index.update(owner, suggestions))
+
+
+@receiver(post_save, sender=Listing)
+def match_saved_searches(sender, instance, raw=False, **kwargs):
+    """Queue saved-search alerts when a listing is created or reactivated"""
+    if raw:
+        return
+    became_searchable = instance.became_searchable()
+    instance.mark_search_state_synced()
+    if not became_searchable:
+        return
+    listing_id = instance.pk
+    transaction.on_commit(lambda: submit(match_listing, listing_id))
+
+
+@receiver(post_save, sender=ListingImage)
+def generate_image_derivatives(sender, instance, raw=False, **kwargs):
+    """Render srcset sizes for new or replaced photos off the request path"""
+    if raw or not instance.is_ready() or is_current(instance):
+        return
+    image_id = instance.pk
+    transaction.on_commit(lambda: submit(generate_for_ids, [image_id]))
+
+
+@receiver(post_delete, sender=ListingImage)
+def refresh_primary_image(sender, instance, **kwargs):
+    """Covers queryset and cascade deletes, which skip ListingImage.delete()"""
+    refresh_primary_images(Listing.objects.filter(pk=instance.listing_id))
+
+
+@receiver(post_delete, sender=ListingImage)
+def delete_image_derivatives(sender, instance, **kwargs):
+    derivatives = instance.derivatives
+    transaction.on_commit(lambda: submit(delete_files, derivatives))
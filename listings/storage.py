@@ -0,0 +1,87 @@
+"""Local media storage addressed by content, standing in for Cloudinary
+
+A saved file is named after the SHA-256 of its bytes (``ab/abcd...ef.jpg``)
+whatever name it was saved under, so identical uploads are stored once and
+a name never points at different content. That makes every URL safe to
+cache forever: serve_media sends far-future immutable headers and the hash
+as ETag. Because a file may be shared, delete() leaves it in place;
+prune_media removes files nothing refers to any more.
+"""
+import hashlib
+import os
+import re
+import tempfile
+import time
+
+from django.core.files.storage import FileSystemStorage
+
+
+HASHED_NAME = re.compile(r'^[0-9a-f]{2}/([0-9a-f]{64})(\.\w+)?$')
+# A year, the longest lifetime caches are asked to honour
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+
+def content_hash(name):
+    """The hash a content-addressed name was derived from, else None"""
+    match = HASHED_NAME.match(name)
+    return match.group(1) if match else None
+
+
+class ContentAddressedStorage(FileSystemStorage):
+
+    def _save(self, name, content):
+        # Hash while writing a temporary file, then move it into place: the
+        # rename is atomic, and a concurrent save of the same bytes is harmless
+        os.makedirs(self.location, exist_ok=True)
+        hasher = hashlib.sha256()
+        with tempfile.NamedTemporaryFile(dir=self.location, prefix='.upload-', delete=False) as f:
+            for chunk in content.chunks():
+                if isinstance(chunk, str):
+                    chunk = chunk.encode()
+                hasher.update(chunk)
+                f.write(chunk)
+        digest = hasher.hexdigest()
+        hashed_name = f'{digest[:2]}/{digest}{os.path.splitext(name)[1].lower()}'
+        full_path = self.path(hashed_name)
+        if os.path.exists(full_path):
+            # Restart the file's age: the new reference may not be committed
+            # yet, and prune() only spares files saved recently
+            os.utime(full_path)
+            os.remove(f.name)
+        else:
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            if self.file_permissions_mode is not None:
+                os.chmod(f.name, self.file_permissions_mode)
+            os.replace(f.name, full_path)
+        return hashed_name
+
+    def get_available_name(self, name, max_length=None):
+        # The final name comes from the content in _save, so there is nothing to avoid
+        return name
+
+    def delete(self, name):
+        """Shared by every reference to the same bytes; see prune()"""
+
+    def hashed_names(self):
+        for prefix in self.listdir('')[0]:
+            if len(prefix) == 2:
+                for filename in self.listdir(prefix)[1]:
+                    name = f'{prefix}/{filename}'
+                    if content_hash(name):
+                        yield name
+
+    def prune(self, referenced, older_than=86400, dry_run=False):
+        """Remove stored files not in ``referenced``; returns their names
+
+        Files saved (or saved again) within ``older_than`` seconds are kept,
+        since a save may have written one whose reference isn't committed yet.
+        """
+        cutoff = time.time() - older_than
+        removed = []
+        for name in self.hashed_names():
+            if name in referenced or os.path.getmtime(self.path(name)) > cutoff:
+                continue
+            if not dry_run:
+                super().delete(name)
+            removed.append(name)
+        return removed
@@ -0,0 +1,28 @@
+from celery import shared_task
+
+from . import jobs
+
+
+@shared_task
+def expire_boosts(dry_run=False):
+    return jobs.expire_boosts(dry_run=dry_run).as_dict()
+
+
+@shared_task
+def auto_pause_listings(dry_run=False):
+    return jobs.auto_pause_listings(dry_run=dry_run).as_dict()
+
+
+@shared_task
+def refresh_rank_scores(dry_run=False):
+    return jobs.refresh_rank_scores(dry_run=dry_run).as_dict()
+
+
+@shared_task
+def reconcile_unread_counts(dry_run=False):
+    return jobs.reconcile_unread_counts(dry_run=dry_run).as_dict()
+
+
+@shared_task
+def retry_lost_uploads(dry_run=False):
+    return jobs.retry_lost_uploads(dry_run=dry_run).as_dict()
@@ -0,0 +1,49 @@
+"""Fixtures shared by the listings test modules"""
+import datetime
+import shutil
+import tempfile
+from decimal import Decimal
+from io import BytesIO
+
+from django.conf import settings
+from django.test import override_settings
+from PIL import Image, ImageDraw
+
+from listings.models import Listing
+
+
+def create_listing(owner, title='Room', **fields):
+    values = {
+        'owner': owner, 'title': title, 'description': title, 'rent': Decimal('1000'), 'beds': 1,
+        'baths': Decimal('1'), 'address': '1 Main St', 'city': 'Ann Arbor', 'state': 'MI',
+        'zip_code': '48104', 'lease_start': datetime.date(2026, 5, 1), 'lease_end': datetime.date(2026, 8, 31),
+    }
+    values.update(fields)
+    return Listing.objects.create(**values)
+
+
+def photo(size=(640, 480), quality=90, seed=0, image_format='JPEG', mode='RGB', **options):
+    """An image with enough structure for resizing and hashing to mean something"""
+    image = Image.new('RGB', (64, 48))
+    draw = ImageDraw.Draw(image)
+    for x in range(64):
+        draw.line([(x, 0), (x, 47)], fill=((x * 4 + seed * 37) % 256, (x * 7 * (seed + 1)) % 256, 128))
+    draw.ellipse([10 + seed * 3, 8, 40, 36], fill=(250, 250, 250))
+    if image_format == 'JPEG':
+        options['quality'] = quality
+    output = BytesIO()
+    image.resize(size).convert(mode).save(output, image_format, **options)
+    return output.getvalue()
+
+
+class TemporaryMediaMixin:
+    """Run each test against an empty local media directory, whatever the environment configures"""
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        storages = {**settings.STORAGES, 'default': {'BACKEND': 'listings.storage.ContentAddressedStorage'}}
+        override = override_settings(MEDIA_ROOT=media_root, STORAGES=storages, USE_CLOUDINARY=False)
+        override.enable()
+        self.addCleanup(override.disable)
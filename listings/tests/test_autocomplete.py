@@ -0,0 +1,145 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from listings.autocomplete import CHANGE_KEY, MAX_REPLAY, LocationIndex, bump_version, get_version, location_index
+from listings.models import Campus, User
+
+from .helpers import create_listing
+
+
+@override_settings(BACKGROUND_TASKS_EAGER=True, GEOCODE_ON_SAVE=False)
+class LocationIndexTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', 'owner@example.com', 'password')
+        create_listing(cls.owner, city='Ann Arbor', state='Michigan', zip_code='48104')
+        create_listing(cls.owner, city='Ann Arbor', state='MI', zip_code='48105')
+        create_listing(cls.owner, city='New York', state='NY', zip_code='10001')
+        create_listing(cls.owner, city='Annapolis', state='MD', zip_code='21401', posting_type='seeking')
+        Campus.objects.create(school_name='University of Michigan', city='Ann Arbor', state='MI')
+
+    def setUp(self):
+        cache.clear()
+        self.index = LocationIndex()
+        self.index.build()
+
+    def labels(self, query, index=None):
+        return [suggestion['label'] for suggestion in (index or self.index).suggest(query)]
+
+    def check_now(self, index=None):
+        # Skip VERSION_CHECK_INTERVAL
+        (index or self.index).checked_at = 0
+
+    def test_prefix_of_any_word(self):
+        self.assertEqual(self.labels('ann'), ['Ann Arbor, MI'])
+        self.assertEqual(self.labels('york'), ['New York, NY', 'New York'])
+        self.assertEqual(self.labels('481'), ['48104', '48105'])
+        self.assertEqual(self.labels('mich'), ['Michigan', 'University of Michigan'])
+        self.assertEqual(self.labels('  '), [])
+
+    def test_more_listings_rank_first(self):
+        create_listing(self.owner, city='Annandale', state='VA', zip_code='22003')
+        self.index.update(('listing', 0), frozenset([('city', 'Annandale, VA')]))
+        self.assertEqual(self.labels('ann'), ['Ann Arbor, MI', 'Annandale, VA'])
+
+    def test_updates_apply_in_place(self):
+        owner = ('listing', 0)
+        self.index.update(owner, frozenset([('city', 'Boston, MA'), ('state', 'Massachusetts')]))
+        self.assertEqual(self.labels('bos'), ['Boston, MA'])
+        self.index.update(owner, frozenset())
+        self.assertEqual(self.labels('bos'), [])
+        self.assertEqual(self.labels('mass'), [])
+
+    def test_saves_reach_the_index_after_commit(self):
+        location_index.build()
+        with self.captureOnCommitCallbacks(execute=True):
+            listing = create_listing(self.owner, city='Boston', state='MA', zip_code='02108')
+        self.assertEqual(self.labels('bos', location_index), ['Boston, MA'])
+        with self.captureOnCommitCallbacks(execute=True):
+            listing.status = 'rented'
+            listing.save()
+        self.assertEqual(self.labels('bos', location_index), [])
+
+    def test_other_processes_replay_changes_without_rebuilding(self):
+        other = LocationIndex()
+        other.build()
+        self.index.update(('listing', 0), frozenset([('city', 'Boston, MA')]))
+        self.index.update(('listing', 1), frozenset([('city', 'Bozeman, MT')]))
+        self.index.update(('listing', 0), frozenset())
+
+        self.check_now(other)
+        with mock.patch.object(other, 'build') as build:
+            self.assertEqual(self.labels('bo', other), ['Bozeman, MT'])
+        build.assert_not_called()
+        self.assertEqual(other.version, self.index.version)
+
+        # The writer is already current and does not replay its own changes
+        self.check_now()
+        with mock.patch('listings.autocomplete.read_changes') as read_changes:
+            self.labels('bo')
+        read_changes.assert_not_called()
+
+    def test_unbuilt_process_still_publishes(self):
+        other = LocationIndex()
+        other.update(('listing', 0), frozenset([('city', 'Boston, MA')]))
+        self.assertIsNone(other.version)
+        self.check_now()
+        self.assertEqual(self.labels('bos'), ['Boston, MA'])
+
+    def test_missing_change_rebuilds_only_if_it_stays_missing(self):
+        other = LocationIndex()
+        other.build()
+        self.index.update(('listing', 0), frozenset([('city', 'Boston, MA')]))
+        # Bumped but not written yet, as between another process's incr and set
+        missing = bump_version()
+
+        self.check_now(other)
+        with mock.patch.object(other, 'build') as build:
+            self.assertEqual(self.labels('bos', other), ['Boston, MA'])
+        build.assert_not_called()
+        self.assertEqual(other.version, missing - 1)
+
+        cache.set(CHANGE_KEY % missing, (('listing', 1), frozenset([('city', 'Bozeman, MT')])))
+        self.check_now(other)
+        with mock.patch.object(other, 'build') as build:
+            self.assertEqual(self.labels('boz', other), ['Bozeman, MT'])
+        build.assert_not_called()
+
+        lost = bump_version()
+        self.check_now(other)
+        other.suggest('bo')
+        self.check_now(other)
+        with mock.patch.object(other, 'build') as build:
+            other.suggest('bo')
+        build.assert_called_once()
+        self.assertEqual(other.version, lost - 1)
+
+    def test_far_behind_rebuilds_in_the_background(self):
+        other = LocationIndex()
+        other.build()
+        cache.set('listings:autocomplete:version', get_version() + MAX_REPLAY + 1, timeout=None)
+        self.check_now(other)
+        with mock.patch('listings.autocomplete.submit') as submit:
+            other.suggest('ann')
+            self.check_now(other)
+            other.suggest('ann')
+        # Scheduled once, off the request path, while the old copy keeps answering
+        submit.assert_called_once_with(other.rebuild)
+        self.assertEqual(self.labels('ann', other), ['Ann Arbor, MI'])
+
+    def test_autocomplete_view(self):
+        location_index.build()
+        response = self.client.get(reverse('location_autocomplete'), {'q': 'ann'}, secure=True)
+        self.assertEqual(response.json(), {'suggestions': [{'label': 'Ann Arbor, MI', 'kind': 'city'}]})
+
+    def test_colliding_versions_get_separate_log_entries(self):
+        # Two processes handed the same number by a non-atomic incr
+        version = get_version()
+        with mock.patch('listings.autocomplete.bump_version', side_effect=[version + 1, version + 1, version + 2]):
+            self.index.update(('listing', 0), frozenset([('city', 'Boston, MA')]))
+            LocationIndex().update(('listing', 1), frozenset([('city', 'Bozeman, MT')]))
+        self.assertEqual(cache.get(CHANGE_KEY % (version + 2)), (('listing', 1), frozenset([('city', 'Bozeman, MT')])))
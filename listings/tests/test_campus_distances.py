@@ -0,0 +1,67 @@
+from django.http import QueryDict
+from django.test import TestCase, override_settings
+
+from listings.models import Campus, CampusDistance, User
+from listings.search import SearchFilters, paginate
+
+from .helpers import create_listing
+
+
+@override_settings(BACKGROUND_TASKS_EAGER=True, GEOCODE_ON_SAVE=False, CAMPUS_DISTANCE_CUTOFF_MILES=25)
+class CampusDistanceTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        owner = User.objects.create_user('owner', 'owner@example.com', 'password')
+        cls.near = create_listing(owner, 'Near', latitude=42.2780, longitude=-83.7382)
+        cls.ypsi = create_listing(owner, 'Ypsilanti', city='Ypsilanti', latitude=42.2411, longitude=-83.6130)
+        cls.far = create_listing(owner, 'Lansing', city='Lansing', latitude=42.7325, longitude=-84.5555)
+        create_listing(owner, 'Not geocoded')
+
+    def create_campus(self, **fields):
+        values = {'school_name': 'University of Michigan', 'city': 'Ann Arbor', 'state': 'MI'}
+        values.update(fields)
+        with self.captureOnCommitCallbacks(execute=True):
+            return Campus.objects.create(**values)
+
+    def distances(self, campus):
+        return dict(CampusDistance.objects.filter(campus=campus).values_list('listing_id', 'miles'))
+
+    def test_saving_a_campus_computes_distances_within_the_cutoff(self):
+        campus = self.create_campus(latitude=42.2780, longitude=-83.7382)
+        distances = self.distances(campus)
+        self.assertCountEqual(distances, [self.near.pk, self.ypsi.pk])
+        self.assertAlmostEqual(distances[self.near.pk], 0, places=3)
+        self.assertGreater(distances[self.ypsi.pk], 5)
+
+    def test_moving_a_campus_replaces_its_distances(self):
+        campus = self.create_campus(latitude=42.2780, longitude=-83.7382)
+        campus.latitude, campus.longitude = 42.7325, -84.5555
+        with self.captureOnCommitCallbacks(execute=True):
+            campus.save()
+        self.assertEqual(list(self.distances(campus)), [self.far.pk])
+
+        campus.latitude = campus.longitude = None
+        with self.captureOnCommitCallbacks(execute=True):
+            campus.save()
+        self.assertEqual(self.distances(campus), {})
+
+    def test_moving_a_listing_refreshes_only_that_listing(self):
+        campus = self.create_campus(latitude=42.2780, longitude=-83.7382)
+        self.far.latitude, self.far.longitude = 42.2800, -83.7400
+        with self.captureOnCommitCallbacks(execute=True):
+            self.far.save()
+        self.assertCountEqual(self.distances(campus), [self.near.pk, self.ypsi.pk, self.far.pk])
+
+    def test_campus_filter(self):
+        campus = self.create_campus(latitude=42.2780, longitude=-83.7382)
+
+        def ids(query):
+            return paginate(SearchFilters(QueryDict(query)), 'distance').object_list
+
+        self.assertEqual(ids(f'campus={campus.pk}'), [self.near.pk, self.ypsi.pk])
+        self.assertEqual(ids(f'campus={campus.pk}&max_miles=1'), [self.near.pk])
+        # Ids that are not plain digits or do not fit a column mean no campus filter
+        for value in ['%C2%B2', '99999999999999999999', '-1', '0']:
+            self.assertIsNone(SearchFilters(QueryDict(f'campus={value}')).campus, value)
+            self.assertEqual(len(ids(f'campus={value}')), 4)
@@ -0,0 +1,64 @@
+from decimal import Decimal
+from unittest import mock
+
+from django.core.cache import cache
+from django.http import QueryDict
+from django.test import TestCase, override_settings
+
+from listings.facets import compute_facets, facet_counts
+from listings.models import User
+from listings.search import SearchFilters
+
+from .helpers import create_listing
+
+
+@override_settings(BACKGROUND_TASKS_EAGER=True, GEOCODE_ON_SAVE=False)
+class FacetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        owner = User.objects.create_user('owner', 'owner@example.com', 'password')
+        create_listing(owner, 'Summer studio', rent=Decimal('450'), beds=0, duration_type='summer')
+        create_listing(owner, 'Summer room', rent=Decimal('800'), beds=1, duration_type='summer', listing_type='room')
+        create_listing(owner, 'Fall house', rent=Decimal('2600'), beds=4, duration_type='fall', city='Ypsilanti')
+        create_listing(owner, 'Seeking', duration_type='summer', posting_type='seeking')
+
+    def setUp(self):
+        cache.clear()
+
+    def facets(self, query=''):
+        return compute_facets(SearchFilters(QueryDict(query)))
+
+    def test_counts_over_all_results(self):
+        facets = self.facets()
+        self.assertEqual(facets['duration']['summer'], 2)
+        self.assertEqual(facets['duration']['fall'], 1)
+        self.assertEqual(facets['duration']['spring'], 0)
+        self.assertEqual(facets['listing_type'], {'full': 2, 'room': 1})
+        self.assertEqual(facets['beds'], {'0': 1, '1': 1, '2': 0, '3': 1})
+        # max_price options are "up to", except 2500 which is "over $2,000"
+        self.assertEqual(facets['max_price'], {'500': 1, '1000': 2, '1500': 2, '2000': 2, '2500': 1})
+
+    def test_a_facet_ignores_its_own_filter(self):
+        facets = self.facets('duration=summer')
+        # Other durations still show what switching to them would give
+        self.assertEqual(facets['duration']['fall'], 1)
+        self.assertEqual(facets['duration']['summer'], 2)
+        # Other facets are narrowed by the chosen duration
+        self.assertEqual(facets['beds'], {'0': 1, '1': 1, '2': 0, '3': 0})
+        self.assertEqual(facets['listing_type'], {'full': 1, 'room': 1})
+
+    def test_location_and_amenities_narrow_every_facet(self):
+        facets = self.facets('location=ypsilanti')
+        self.assertEqual(facets['duration']['fall'], 1)
+        self.assertEqual(facets['duration']['summer'], 0)
+        self.assertEqual(sum(self.facets('amenities=pool')['beds'].values()), 0)
+
+    def test_one_query_and_cached(self):
+        filters = SearchFilters(QueryDict('beds=1'))
+        with self.assertNumQueries(1):
+            compute_facets(filters)
+        facets = facet_counts(filters)
+        with mock.patch('listings.facets.compute_facets') as compute:
+            self.assertEqual(facet_counts(filters), facets)
+        compute.assert_not_called()
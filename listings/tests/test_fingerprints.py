@@ -0,0 +1,40 @@
+from django.test import SimpleTestCase
+
+from listings.duplicates import distance
+from listings.image_ingest import BAND_BITS, HASH_BANDS, fingerprint, hash_bands
+
+from .helpers import photo
+
+
+class FingerprintTests(SimpleTestCase):
+
+    def test_bands_reassemble_the_hash(self):
+        value = 0x0123456789ABCDEF
+        bands = hash_bands(value)
+        self.assertEqual(len(bands), HASH_BANDS)
+        self.assertTrue(all(0 <= band < 1 << BAND_BITS for band in bands))
+        rebuilt = 0
+        for band in bands:
+            rebuilt = rebuilt << BAND_BITS | band
+        self.assertEqual(rebuilt, value)
+
+    def test_close_hashes_share_a_band(self):
+        value = 0xF0F0F0F0F0F0F0F0
+        near = value ^ (1 << 3) ^ (1 << 20) ^ (1 << 40)
+        self.assertTrue(set(enumerate(hash_bands(value))) & set(enumerate(hash_bands(near))))
+
+    def test_resized_copy_is_a_near_duplicate(self):
+        original_hash, original = fingerprint(photo())
+        copy_hash, copy = fingerprint(photo(size=(320, 240), quality=60))
+        self.assertNotEqual(original_hash, copy_hash)
+        self.assertLessEqual(distance(f'{original:016x}', f'{copy:016x}'), 3)
+
+    def test_different_photo_is_far_apart(self):
+        _, first = fingerprint(photo(seed=0))
+        _, second = fingerprint(photo(seed=5))
+        self.assertGreater(distance(f'{first:016x}', f'{second:016x}'), 3)
+
+    def test_unreadable_bytes_get_only_a_content_hash(self):
+        content_hash, perceptual_hash = fingerprint(b'not an image')
+        self.assertEqual(len(content_hash), 64)
+        self.assertIsNone(perceptual_hash)
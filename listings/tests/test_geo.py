@@ -0,0 +1,37 @@
+from django.test import SimpleTestCase
+
+from listings.geo import cell_size, covering_cells, encode_geohash, radius_bbox
+
+
+class GeoTests(SimpleTestCase):
+
+    def test_encode_geohash(self):
+        self.assertEqual(encode_geohash(57.64911, 10.40744), 'u4pruydqq')
+        # A shorter hash is a prefix of the longer one: the cell that contains it
+        self.assertEqual(encode_geohash(42.2808, -83.7430, precision=5), encode_geohash(42.2808, -83.7430)[:5])
+
+    def test_cell_size(self):
+        self.assertEqual(cell_size(1), (45.0, 45.0))
+        self.assertEqual(cell_size(2), (5.625, 11.25))
+
+    def test_covering_cells_cover_the_box(self):
+        bbox = (42.25, -83.78, 42.31, -83.70)
+        cells = covering_cells(*bbox)
+        self.assertLessEqual(len(cells), 16)
+        self.assertEqual(len({len(cell) for cell in cells}), 1)
+        south, west, north, east = bbox
+        steps = 10
+        for i in range(steps + 1):
+            for j in range(steps + 1):
+                point = encode_geohash(south + (north - south) * i / steps, west + (east - west) * j / steps)
+                self.assertTrue(any(point.startswith(cell) for cell in cells), point)
+
+    def test_radius_bbox_contains_the_circle(self):
+        south, west, north, east = radius_bbox(42.28, -83.74, 5)
+        self.assertAlmostEqual(north - 42.28, 5 / 69.0)
+        self.assertAlmostEqual(42.28 - south, 5 / 69.0)
+        # A degree of longitude is shorter away from the equator, so the box is wider
+        self.assertGreater(east - west, north - south)
+
+    def test_radius_bbox_is_clamped(self):
+        self.assertEqual(radius_bbox(89.99, 179.99, 50)[2:], (90.0, 180.0))
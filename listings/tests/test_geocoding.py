@@ -0,0 +1,127 @@
+import json
+import os
+import tempfile
+from datetime import timedelta
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from listings.geocoding import (
+    FileGeocoder, GeocoderUnavailable, address_key, geocode_keys, geocode_listing_ids, needs_geocoding,
+)
+from listings.models import GeocodeCache, Listing, User
+
+from .helpers import create_listing
+
+
+MAIN_ST = '1 main st, ann arbor, mi 48104'
+
+
+class AddressKeyTests(SimpleTestCase):
+
+    def test_units_and_spelling_are_dropped(self):
+        self.assertEqual(address_key('1 Main Street, Apt 4B', 'Ann  Arbor', 'Michigan', '48104-1234'), MAIN_ST)
+        self.assertEqual(address_key('1 Main St. Unit 2 Floor 3', 'ann arbor', 'MI', '48104'), MAIN_ST)
+
+    def test_file_geocoder(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as f:
+            json.dump({MAIN_ST: [42.28, -83.74]}, f)
+        self.addCleanup(os.remove, f.name)
+        geocoder = FileGeocoder(f.name)
+        self.assertEqual(geocoder.geocode(MAIN_ST), (42.28, -83.74))
+        self.assertIsNone(geocoder.geocode('2 main st, ann arbor, mi 48104'))
+        self.assertEqual(FileGeocoder(f.name + '.missing').coordinates, {})
+
+
+class FakeGeocoder:
+
+    def __init__(self, coordinates):
+        self.coordinates = coordinates
+        self.queries = []
+
+    def geocode(self, query):
+        self.queries.append(query)
+        point = self.coordinates.get(query)
+        if isinstance(point, Exception):
+            raise point
+        return point
+
+
+@override_settings(BACKGROUND_TASKS_EAGER=True, GEOCODE_ON_SAVE=False, GEOCODE_MISS_TTL_DAYS=7)
+class GeocodingTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', 'owner@example.com', 'password')
+
+    def use_geocoder(self, coordinates):
+        geocoder = FakeGeocoder(coordinates)
+        patcher = mock.patch('listings.geocoding.geocoder', geocoder)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return geocoder
+
+    def test_listings_in_one_building_share_a_lookup(self):
+        geocoder = self.use_geocoder({MAIN_ST: (42.28, -83.74)})
+        first = create_listing(self.owner, address='1 Main Street Apt 1')
+        second = create_listing(self.owner, address='1 Main St #2')
+        self.assertEqual(sorted(geocode_listing_ids([first.pk, second.pk])), [first.pk, second.pk])
+        self.assertEqual(geocoder.queries, [MAIN_ST])
+
+        first.refresh_from_db()
+        self.assertEqual((first.latitude, first.longitude, first.geocoded_address), (42.28, -83.74, MAIN_ST))
+        self.assertFalse(needs_geocoding(first))
+        self.assertEqual(first.search_document.latitude, 42.28)
+
+        geocode_listing_ids([create_listing(self.owner, address='1 Main St').pk])
+        self.assertEqual(geocoder.queries, [MAIN_ST])
+
+    def test_geocoding_on_save_is_off_by_default(self):
+        geocoder = self.use_geocoder({MAIN_ST: (42.28, -83.74)})
+        with self.captureOnCommitCallbacks(execute=True):
+            listing = create_listing(self.owner)
+        self.assertEqual(geocoder.queries, [])
+        self.assertIsNone(Listing.objects.get(pk=listing.pk).latitude)
+
+    @override_settings(GEOCODE_ON_SAVE=True)
+    def test_geocoding_on_save(self):
+        self.use_geocoder({MAIN_ST: (42.28, -83.74)})
+        with self.captureOnCommitCallbacks(execute=True):
+            listing = create_listing(self.owner)
+        self.assertEqual(Listing.objects.get(pk=listing.pk).latitude, 42.28)
+
+        # Hand-entered coordinates are kept
+        with self.captureOnCommitCallbacks(execute=True):
+            listing = create_listing(self.owner, address='9 Elm St', latitude=1.0, longitude=2.0)
+        self.assertEqual(Listing.objects.get(pk=listing.pk).latitude, 1.0)
+
+    def test_misses_are_cached_until_they_expire(self):
+        geocoder = self.use_geocoder({})
+        self.assertEqual(geocode_keys([MAIN_ST]), {MAIN_ST: None})
+        self.assertEqual(geocode_keys([MAIN_ST]), {MAIN_ST: None})
+        self.assertEqual(geocoder.queries, [MAIN_ST])
+
+        GeocodeCache.objects.update(created_at=timezone.now() - timedelta(days=8))
+        geocoder.coordinates[MAIN_ST] = (42.28, -83.74)
+        self.assertEqual(geocode_keys([MAIN_ST]), {MAIN_ST: (42.28, -83.74)})
+        self.assertEqual(len(geocoder.queries), 2)
+        entry = GeocodeCache.objects.get()
+        self.assertEqual(entry.latitude, 42.28)
+        self.assertGreater(entry.created_at, timezone.now() - timedelta(days=1))
+
+    def test_hits_never_expire(self):
+        geocoder = self.use_geocoder({MAIN_ST: (42.28, -83.74)})
+        geocode_keys([MAIN_ST])
+        GeocodeCache.objects.update(created_at=timezone.now() - timedelta(days=365))
+        self.assertEqual(geocode_keys([MAIN_ST]), {MAIN_ST: (42.28, -83.74)})
+        self.assertEqual(len(geocoder.queries), 1)
+
+    def test_unavailable_geocoder_caches_nothing(self):
+        self.use_geocoder({MAIN_ST: GeocoderUnavailable('timed out')})
+        listing = create_listing(self.owner)
+        with self.assertLogs('listings.geocoding', 'WARNING'):
+            self.assertEqual(geocode_listing_ids([listing.pk]), [])
+        self.assertFalse(GeocodeCache.objects.exists())
+        listing.refresh_from_db()
+        self.assertEqual(listing.geocoded_address, '')
@@ -0,0 +1,74 @@
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from listings.image_derivatives import WIDTHS, generate, generate_for_ids, is_current
+from listings.models import ListingImage, User
+
+from .helpers import TemporaryMediaMixin, create_listing, photo
+
+
+@override_settings(BACKGROUND_TASKS_EAGER=True, GEOCODE_ON_SAVE=False)
+class DerivativeTests(TemporaryMediaMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        owner = User.objects.create_user('owner', 'owner@example.com', 'password')
+        cls.listing = create_listing(owner)
+
+    def store(self, data, name='photo.jpg'):
+        return default_storage.save(f'listing_images/{self.listing.pk}/{name}', ContentFile(data))
+
+    def create_image(self, data):
+        with self.captureOnCommitCallbacks(execute=True):
+            image = ListingImage.objects.create(listing=self.listing, original=self.store(data))
+        image.refresh_from_db()
+        return image
+
+    def open(self, name):
+        with default_storage.open(name, 'rb') as f:
+            image = Image.open(BytesIO(f.read()))
+            image.load()
+        return image
+
+    def test_new_image_gets_webp_and_jpeg_at_each_width(self):
+        image = self.create_image(photo(size=(1600, 1200)))
+        self.assertTrue(is_current(image))
+        sizes = image.derivative_sizes()
+        self.assertEqual([size['width'] for size in sizes], sorted(WIDTHS.values()))
+        for size in sizes:
+            self.assertEqual(size['height'], size['width'] * 3 // 4)
+            for extension, image_format in [('webp', 'WEBP'), ('jpeg', 'JPEG')]:
+                rendition = self.open(size[extension])
+                self.assertEqual(rendition.format, image_format)
+                self.assertEqual(rendition.size, (size['width'], size['height']))
+        # WebP is the point of the exercise: it should be the smaller file
+        medium = sizes[-1]
+        self.assertLess(default_storage.size(medium['webp']), default_storage.size(medium['jpeg']))
+
+    def test_small_originals_are_not_upscaled(self):
+        image = self.create_image(photo(size=(300, 200)))
+        self.assertEqual([(size['width'], size['height']) for size in image.derivative_sizes()], [(300, 200)])
+
+    def test_new_original_makes_the_renditions_stale(self):
+        image = self.create_image(photo(size=(800, 600)))
+        first = image.derivatives
+        image.original = self.store(photo(size=(800, 600), seed=3), 'other.jpg')
+        self.assertFalse(is_current(image))
+        with self.captureOnCommitCallbacks(execute=True):
+            image.save()
+        image.refresh_from_db()
+        self.assertTrue(is_current(image))
+        self.assertNotEqual(image.derivatives['sizes'][0]['jpeg'], first['sizes'][0]['jpeg'])
+        # Up-to-date images are skipped
+        self.assertEqual(generate_for_ids([image.pk]), 0)
+
+    def test_unreadable_original(self):
+        image = ListingImage.objects.create(listing=self.listing, original=self.store(b'not an image'))
+        with self.assertLogs('listings.image_derivatives', 'WARNING'):
+            self.assertFalse(generate(image))
+        image.refresh_from_db()
+        self.assertEqual(image.derivatives, {})
@@ -0,0 +1,106 @@
+import os
+from io import BytesIO
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase
+from PIL import Image
+
+from listings.image_ingest import AVATAR, LISTING_PHOTO, MIN_DIMENSION, ingest, normalize
+
+from .helpers import photo
+
+
+ORIENTATION = 0x0112
+GPS_INFO = 0x8825
+MAKE = 0x010F
+
+
+def exif(**tags):
+    data = Image.Exif()
+    for tag, value in tags.items():
+        data[{'orientation': ORIENTATION, 'make': MAKE}[tag]] = value
+    return data.tobytes()
+
+
+def transparent_png(size=(640, 480)):
+    image = Image.open(BytesIO(photo(size=size, mode='RGBA', image_format='PNG')))
+    alpha = Image.linear_gradient('L').resize(size)
+    image.putalpha(alpha)
+    output = BytesIO()
+    image.save(output, 'PNG')
+    return output.getvalue()
+
+
+def opened(data):
+    image = Image.open(BytesIO(data))
+    image.load()
+    return image
+
+
+class NormalizeTests(SimpleTestCase):
+
+    def test_exif_orientation_is_applied_and_dropped(self):
+        data, extension = normalize(photo(size=(640, 480), exif=exif(orientation=6)), *LISTING_PHOTO)
+        image = opened(data)
+        self.assertEqual((extension, image.format, image.size), ('jpg', 'JPEG', (480, 640)))
+        self.assertFalse(image.getexif())
+
+    def test_metadata_is_stripped(self):
+        data, _ = normalize(photo(exif=exif(make='Phone')), *LISTING_PHOTO)
+        self.assertFalse(opened(data).getexif())
+
+    def test_clean_images_are_kept_byte_for_byte(self):
+        original = photo(size=(800, 600), quality=80)
+        self.assertEqual(normalize(original, *LISTING_PHOTO), (original, 'jpg'))
+        webp = photo(size=(400, 300), image_format='WEBP')
+        self.assertEqual(normalize(webp, *LISTING_PHOTO), (webp, 'webp'))
+
+    def test_opaque_images_become_rgb_jpeg(self):
+        for mode, image_format in [('RGB', 'PNG'), ('L', 'PNG'), ('CMYK', 'JPEG'), ('P', 'GIF')]:
+            data, extension = normalize(photo(mode=mode, image_format=image_format), *LISTING_PHOTO)
+            image = opened(data)
+            self.assertEqual((extension, image.format, image.mode), ('jpg', 'JPEG', 'RGB'), mode)
+
+    def test_transparent_images_become_webp(self):
+        data, extension = normalize(transparent_png(), *LISTING_PHOTO)
+        image = opened(data)
+        self.assertEqual((extension, image.format, image.mode), ('webp', 'WEBP', 'RGBA'))
+        self.assertEqual(image.getextrema()[3][0], 0)
+
+        with_transparency = photo(mode='P', image_format='PNG', transparency=0)
+        self.assertEqual(normalize(with_transparency, *LISTING_PHOTO)[1], 'webp')
+
+    def test_large_images_are_capped(self):
+        data, _ = normalize(photo(size=(4000, 3000)), *LISTING_PHOTO)
+        self.assertEqual(opened(data).size, (2560, 1920))
+        data, _ = normalize(photo(size=(3000, 4000)), *AVATAR)
+        self.assertEqual(opened(data).size, (384, 512))
+
+    def test_byte_budget_shrinks_down_to_the_minimum(self):
+        noise = Image.frombytes('RGB', (1200, 900), os.urandom(1200 * 900 * 3))
+        output = BytesIO()
+        noise.save(output, 'PNG')
+        data, _ = normalize(output.getvalue(), 2560, 120 * 1024)
+        self.assertLessEqual(len(data), 120 * 1024)
+        self.assertLess(max(opened(data).size), 1200)
+
+        # A budget nothing can meet stops at MIN_DIMENSION rather than looping forever
+        data, _ = normalize(output.getvalue(), 2560, 1024)
+        self.assertGreaterEqual(max(opened(data).size) / 0.8, MIN_DIMENSION)
+        self.assertLess(max(opened(data).size), MIN_DIMENSION / 0.8 + 1)
+
+
+class IngestTests(SimpleTestCase):
+
+    def test_returns_a_named_file_and_both_sizes(self):
+        original = transparent_png(size=(1000, 800))
+        stored, original_bytes, stored_bytes = ingest(SimpleUploadedFile('Beach House.PNG', original), LISTING_PHOTO)
+        self.assertEqual((stored.name, stored.content_type), ('Beach House.webp', 'image/webp'))
+        self.assertEqual(original_bytes, len(original))
+        self.assertEqual(stored_bytes, len(stored.read()))
+
+    def test_unreadable_files_pass_through(self):
+        uploaded = SimpleUploadedFile('notes.jpg', b'not an image')
+        uploaded.read()
+        self.assertEqual(ingest(uploaded, LISTING_PHOTO), (uploaded, 12, 12))
+        self.assertEqual(uploaded.read(), b'not an image')
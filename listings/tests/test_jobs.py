@@ -0,0 +1,91 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from listings.jobs import auto_pause_listings, chunks, expire_boosts, refresh_rank_scores
+from listings.models import BOOST_RANK_BONUS, Listing, ListingSearchDocument, User
+
+from .helpers import create_listing
+
+
+@override_settings(BACKGROUND_TASKS_EAGER=True, GEOCODE_ON_SAVE=False)
+class JobTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', 'owner@example.com', 'password')
+
+    def listings(self, count, **fields):
+        return [create_listing(self.owner, f'Listing {number}', **fields) for number in range(count)]
+
+    def test_chunks_are_bounded_and_cover_every_row(self):
+        ids = [listing.pk for listing in self.listings(5)]
+        batches = list(chunks(Listing.objects.all(), 2))
+        self.assertEqual([len(batch) for batch in batches], [2, 2, 1])
+        self.assertEqual(sum(batches, []), ids)
+        self.assertEqual(list(chunks(Listing.objects.none(), 2)), [])
+
+    def test_expire_boosts(self):
+        past = timezone.now() - timedelta(hours=1)
+        expired = self.listings(3, is_boosted=True, boosted_until=past)
+        [current] = self.listings(1, is_boosted=True, boosted_until=timezone.now() + timedelta(days=1))
+        # Saved while the boost was live, so the bonus is in the stored score
+        Listing.objects.filter(pk__in=[listing.pk for listing in expired]).update(rank_score=BOOST_RANK_BONUS * 2)
+
+        result = expire_boosts(chunk_size=2, dry_run=True)
+        self.assertEqual((result.rows, result.chunks, result.dry_run), (3, 2, True))
+        self.assertEqual(Listing.objects.filter(is_boosted=True).count(), 4)
+
+        result = expire_boosts(chunk_size=2)
+        self.assertEqual((result.rows, result.chunks), (3, 2))
+        self.assertEqual(list(Listing.objects.filter(is_boosted=True)), [current])
+        for listing in Listing.objects.filter(pk__in=[listing.pk for listing in expired]):
+            self.assertEqual(listing.rank_score, listing.created_at.timestamp())
+            self.assertEqual(listing.search_document.rank_score, listing.rank_score)
+        self.assertEqual(expire_boosts().rows, 0)
+
+    def test_auto_pause_sweeps_both_passes(self):
+        old = timezone.now() - timedelta(days=30)
+        bumped_long_ago = self.listings(2, last_bumped=old)
+        never_bumped = self.listings(1)
+        Listing.objects.filter(pk=never_bumped[0].pk).update(created_at=old)
+        fresh = self.listings(1, last_bumped=timezone.now())
+        # Bumped recently, even though it was created long ago
+        revived = self.listings(1, last_bumped=timezone.now())
+        Listing.objects.filter(pk=revived[0].pk).update(created_at=old)
+
+        result = auto_pause_listings(chunk_size=1, dry_run=True)
+        self.assertEqual((result.rows, result.chunks), (3, 3))
+        self.assertFalse(Listing.objects.filter(status='pending').exists())
+
+        result = auto_pause_listings(chunk_size=1)
+        self.assertEqual(result.rows, 3)
+        paused = {listing.pk for listing in bumped_long_ago + never_bumped}
+        self.assertEqual(set(Listing.objects.filter(status='pending').values_list('pk', flat=True)), paused)
+        self.assertEqual(
+            set(ListingSearchDocument.objects.filter(status='active').values_list('listing_id', flat=True)),
+            {fresh[0].pk, revived[0].pk},
+        )
+
+    def test_refresh_rank_scores_fixes_only_drifted_rows(self):
+        listings = self.listings(3)
+        Listing.objects.filter(pk=listings[0].pk).update(rank_score=0)
+        result = refresh_rank_scores(chunk_size=2, dry_run=True)
+        self.assertEqual((result.rows, result.chunks), (1, 2))
+        self.assertEqual(Listing.objects.get(pk=listings[0].pk).rank_score, 0)
+
+        self.assertEqual(refresh_rank_scores().rows, 1)
+        listing = Listing.objects.get(pk=listings[0].pk)
+        self.assertEqual(listing.rank_score, listing.created_at.timestamp())
+        self.assertEqual(listing.search_document.rank_score, listing.rank_score)
+
+    def test_run_job_command(self):
+        self.listings(1, is_boosted=True, boosted_until=timezone.now() - timedelta(hours=1))
+        output = StringIO()
+        call_command('run_job', 'expire_boosts', '--dry-run', stdout=output)
+        self.assertIn('expire_boosts: would touch 1 rows in 1 chunks', output.getvalue())
+        call_command('run_job', 'expire_boosts', stdout=output)
+        self.assertFalse(Listing.objects.filter(is_boosted=True).exists())
@@ -0,0 +1,107 @@
+from django.core.cache import cache
+from django.http import QueryDict
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from listings.map_clusters import MAX_ZOOM, MapRequest, parse_zoom, snap_viewport
+from listings.models import User
+from listings.search_cache import bump_generation
+
+from .helpers import create_listing
+
+
+class ViewportTests(SimpleTestCase):
+
+    def test_parse_zoom(self):
+        self.assertEqual(parse_zoom('12'), 12)
+        self.assertEqual(parse_zoom('99'), MAX_ZOOM)
+        self.assertEqual(parse_zoom('-3'), 0)
+        self.assertIsNone(parse_zoom('close'))
+        self.assertIsNone(parse_zoom(None))
+
+    def test_snapped_viewport_covers_the_original(self):
+        south, west, north, east = snap_viewport((42.271, -83.749, 42.289, -83.731), 0.01)
+        self.assertLessEqual(south, 42.271)
+        self.assertLessEqual(west, -83.749)
+        self.assertGreaterEqual(north, 42.289)
+        self.assertGreaterEqual(east, -83.731)
+        self.assertEqual(snap_viewport((-89.99, -179.99, 89.99, 179.99), 22.5), (-90.0, -180.0, 90.0, 180.0))
+
+    def test_panning_within_a_cell_keeps_the_cache_key(self):
+        first = MapRequest(QueryDict('zoom=10&viewport=42.271,-83.749,42.289,-83.731'))
+        panned = MapRequest(QueryDict('zoom=10&viewport=42.272,-83.748,42.290,-83.730'))
+        zoomed = MapRequest(QueryDict('zoom=11&viewport=42.271,-83.749,42.289,-83.731'))
+        self.assertEqual(first.cache_key(), panned.cache_key())
+        self.assertNotEqual(first.cache_key(), zoomed.cache_key())
+
+    def test_missing_or_bad_viewport_clusters_everything(self):
+        for query in ['', 'zoom=12', 'viewport=42,-83,43,-82', 'zoom=12&viewport=43,-83,42,-82']:
+            request = MapRequest(QueryDict(query))
+            self.assertEqual((request.zoom, request.viewport), (2, None), query)
+
+
+@override_settings(BACKGROUND_TASKS_EAGER=True, GEOCODE_ON_SAVE=False)
+class MapMarkerTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        owner = User.objects.create_user('owner', 'owner@example.com', 'password')
+        cls.first = create_listing(owner, 'First', rent=700, latitude=42.2780, longitude=-83.7382)
+        cls.second = create_listing(owner, 'Second', rent=900, latitude=42.2800, longitude=-83.7400)
+        cls.detroit = create_listing(owner, 'Detroit', rent=1200, latitude=42.3314, longitude=-83.0458)
+        create_listing(owner, 'Not geocoded')
+
+    def setUp(self):
+        cache.clear()
+
+    def markers(self, query):
+        return MapRequest(QueryDict(query)).markers()
+
+    def test_whole_result_set_with_bounds(self):
+        data = self.markers('')
+        self.assertEqual(data['zoom'], 2)
+        self.assertEqual(data['points'], [])
+        [[_, _, count, min_rent]] = data['clusters']
+        self.assertEqual((count, min_rent), (3, 700.0))
+        self.assertEqual(data['bounds'], [42.278, -83.74, 42.3314, -83.0458])
+
+    def test_zooming_in_splits_clusters(self):
+        data = self.markers('zoom=10&viewport=42.0,-84.0,42.5,-83.0')
+        [[_, _, count, min_rent]] = data['clusters']
+        self.assertEqual((count, min_rent), (2, 700.0))
+        self.assertEqual(data['points'], [[42.3314, -83.0458, self.detroit.pk, 1200.0, 'Detroit']])
+        self.assertNotIn('bounds', data)
+
+        data = self.markers('zoom=16&viewport=42.27,-83.75,42.29,-83.73')
+        self.assertEqual(data['clusters'], [])
+        self.assertEqual(data['points'], [
+            [42.278, -83.7382, self.first.pk, 700.0, 'First'],
+            [42.28, -83.74, self.second.pk, 900.0, 'Second'],
+        ])
+
+    def test_search_filters_apply(self):
+        data = self.markers('max_price=800&zoom=16&viewport=42.27,-83.75,42.29,-83.73')
+        self.assertEqual([point[2] for point in data['points']], [self.first.pk])
+        self.assertIsNone(self.markers('beds=3')['bounds'])
+
+    def get_map(self, zoom='10', **headers):
+        params = {'zoom': zoom, 'viewport': '42.0,-84.0,42.5,-83.0'}
+        return self.client.get(reverse('search_map'), params, secure=True, headers=headers)
+
+    def test_etag_and_not_modified(self):
+        response = self.get_map()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['points']), 1)
+        self.assertIn('max-age=60', response['Cache-Control'])
+        etag = response['ETag']
+
+        self.assertEqual(self.get_map(if_none_match=etag).status_code, 304)
+        # Another zoom or a new generation is a different ETag
+        self.assertEqual(self.get_map('11', if_none_match=etag).status_code, 200)
+        bump_generation()
+        self.assertEqual(self.get_map(if_none_match=etag).status_code, 200)
+
+    def test_results_page_links_markers_through_the_url_pattern(self):
+        response = self.client.get(reverse('search_results'), secure=True)
+        self.assertContains(response, "'%s'.replace('/0/'" % reverse('listing_detail', args=[0]))
+        self.assertNotContains(response, 'href="/listings/${id}/"')
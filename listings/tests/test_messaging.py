@@ -0,0 +1,69 @@
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from listings.models import Conversation, Message, User
+
+from .helpers import create_listing
+
+
+@override_settings(BACKGROUND_TASKS_EAGER=True, GEOCODE_ON_SAVE=False)
+class ConversationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', 'owner@example.com', 'password')
+        cls.renter = User.objects.create_user('renter', 'renter@example.com', 'password')
+        cls.listing = create_listing(cls.owner)
+
+    def send(self, sender, recipient, body):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Message.objects.create(
+                listing=self.listing, sender=sender, recipient=recipient, subject='Room', body=body,
+            )
+
+    def test_messages_both_ways_share_a_conversation(self):
+        first = self.send(self.renter, self.owner, 'Is it available?')
+        reply = self.send(self.owner, self.renter, 'Yes')
+        self.assertEqual(first.conversation_id, reply.conversation_id)
+        conversation = Conversation.objects.get()
+        self.assertEqual((conversation.initiator, conversation.recipient), (self.renter, self.owner))
+        self.assertEqual(conversation.snippet, 'Yes')
+        self.assertEqual((conversation.initiator_unread, conversation.recipient_unread), (1, 1))
+
+    def test_other_listings_get_their_own_conversation(self):
+        self.send(self.renter, self.owner, 'Is it available?')
+        other = create_listing(self.owner, 'Other room')
+        with self.captureOnCommitCallbacks(execute=True):
+            Message.objects.create(listing=other, sender=self.renter, recipient=self.owner, subject='Other', body='Hi')
+        self.assertEqual(Conversation.objects.count(), 2)
+
+    def test_mark_read_clears_only_the_readers_count(self):
+        self.send(self.renter, self.owner, 'One')
+        self.send(self.renter, self.owner, 'Two')
+        self.send(self.owner, self.renter, 'Reply')
+        conversation = Conversation.objects.get()
+        self.assertEqual(conversation.unread_for(self.owner), 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(conversation.mark_read(self.owner), 2)
+        conversation.refresh_from_db()
+        self.assertEqual((conversation.unread_for(self.owner), conversation.unread_for(self.renter)), (0, 1))
+        self.assertFalse(Message.objects.filter(recipient=self.owner, is_read=False).exists())
+        # Reading again changes nothing
+        self.assertEqual(conversation.mark_read(self.owner), 0)
+
+    def test_inbox_lists_conversations_with_unread_counts(self):
+        self.send(self.renter, self.owner, 'Is it available?')
+        self.client.force_login(self.owner)
+        response = self.client.get(reverse('inbox'), secure=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['unread_count'], 1)
+        [conversation] = response.context['page_obj']
+        self.assertEqual((conversation.other_user, conversation.unread), (self.renter, 1))
+        self.assertContains(response, 'Is it available?')
+
+    def test_conversation_is_private_to_its_participants(self):
+        message = self.send(self.renter, self.owner, 'Is it available?')
+        stranger = User.objects.create_user('stranger', 'stranger@example.com', 'password')
+        self.client.force_login(stranger)
+        response = self.client.get(reverse('conversation_detail', args=[message.conversation_id]), secure=True)
+        self.assertRedirects(response, reverse('inbox'), fetch_redirect_response=False)
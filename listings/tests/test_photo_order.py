@@ -0,0 +1,71 @@
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from listings.models import ListingImage, User, assign_positions
+
+from .helpers import create_listing
+
+
+class AssignPositionsTests(SimpleTestCase):
+
+    def images(self, *ids):
+        return [ListingImage(pk=pk) for pk in ids]
+
+    def test_numbers_in_list_order_with_first_as_primary(self):
+        images = self.images(7, 3, 9)
+        assign_positions(images)
+        self.assertEqual([image.order for image in images], [0, 1, 2])
+        self.assertEqual([image.is_primary for image in images], [True, False, False])
+
+    def test_primary_id(self):
+        images = self.images(7, 3, 9)
+        assign_positions(images, primary_id=9)
+        self.assertEqual([image.is_primary for image in images], [False, False, True])
+
+    def test_unknown_primary_falls_back_to_first(self):
+        images = self.images(7, 3)
+        assign_positions(images, primary_id=99)
+        self.assertEqual([image.is_primary for image in images], [True, False])
+
+    def test_unsaved_images(self):
+        images = self.images(None, None)
+        assign_positions(images)
+        self.assertEqual([image.is_primary for image in images], [True, False])
+        assign_positions([])
+
+
+@override_settings(BACKGROUND_TASKS_EAGER=True, GEOCODE_ON_SAVE=False)
+class ArrangeViewTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', 'owner@example.com', 'password')
+        cls.listing = create_listing(cls.owner)
+        cls.images = [ListingImage.objects.create(listing=cls.listing, order=order) for order in range(3)]
+
+    def arrange(self, data):
+        self.client.force_login(self.owner)
+        url = reverse('arrange_listing_images', args=[self.listing.pk])
+        return self.client.post(url, data, secure=True)
+
+    def arrangement(self):
+        images = ListingImage.objects.filter(listing=self.listing).order_by('order')
+        return [(image.pk, image.is_primary) for image in images]
+
+    def test_reorders_and_sets_primary(self):
+        first, second, third = (image.pk for image in self.images)
+        response = self.arrange({
+            f'position_{first}': '2', f'position_{second}': '0', f'position_{third}': '1', 'primary': str(third),
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.arrangement(), [(second, False), (third, True), (first, False)])
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.primary_image_id, third)
+
+    def test_malformed_input_is_ignored(self):
+        first, second, third = (image.pk for image in self.images)
+        response = self.arrange({
+            f'position_{first}': 'nan', f'position_{second}': 'inf', f'position_{third}': 'x', 'primary': '²',
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.arrangement(), [(first, True), (second, False), (third, False)])
@@ -0,0 +1,108 @@
+from unittest import mock
+
+from django.core import mail
+from django.core.management import call_command
+from django.http import QueryDict
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from listings.models import ListingSearchDocument, SavedSearchMatch, User
+from listings.saved_searches import (
+    candidate_searches, location_prefix, match_listing, save_search, send_alerts, send_all_alerts,
+)
+
+from .helpers import create_listing
+
+
+@override_settings(BACKGROUND_TASKS_EAGER=True, GEOCODE_ON_SAVE=False, SITE_URL='https://pillow.example')
+class SavedSearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', 'owner@example.com', 'password')
+        cls.alice = User.objects.create_user('alice', 'alice@example.com', 'password')
+        cls.bob = User.objects.create_user('bob', 'bob@example.com', 'password')
+
+    def save(self, user, query):
+        return save_search(user, QueryDict(query))
+
+    def publish(self, title='Room', **fields):
+        with self.captureOnCommitCallbacks(execute=True):
+            return create_listing(self.owner, title, **fields)
+
+    def test_location_prefix(self):
+        self.assertEqual(location_prefix('Ann Arbor'), 'ann')
+        self.assertEqual(location_prefix('  NY '), 'ny')
+        self.assertEqual(location_prefix(''), '')
+
+    def test_candidates_come_from_the_indexed_filters(self):
+        ann = self.save(self.alice, 'location=ann arbor')
+        short = self.save(self.alice, 'location=a')
+        anywhere = self.save(self.alice, 'beds=1')
+        self.save(self.alice, 'location=ypsilanti')
+        self.save(self.alice, 'beds=2')
+        self.save(self.alice, 'duration=fall')
+        listing = create_listing(self.owner, beds=1, duration_type='summer')
+        document = ListingSearchDocument.objects.get(listing=listing)
+        self.assertCountEqual(candidate_searches(document), [ann, short, anywhere])
+
+    def test_full_filters_are_verified(self):
+        cheap = self.save(self.alice, 'location=ann arbor&max_price=1000')
+        self.save(self.bob, 'location=ann arbor&max_price=500')
+        listing = self.publish(rent=900)
+        self.assertEqual(list(SavedSearchMatch.objects.values_list('saved_search', 'listing')), [(cheap.pk, listing.pk)])
+        # Matching again queues nothing twice
+        self.assertEqual(match_listing(listing.pk), 1)
+        self.assertEqual(SavedSearchMatch.objects.count(), 1)
+
+    def test_own_listings_and_unsearchable_listings_never_match(self):
+        self.save(self.owner, 'location=ann arbor')
+        self.save(self.alice, 'location=ann arbor')
+        self.publish(posting_type='seeking')
+        self.publish(status='rented')
+        self.assertFalse(SavedSearchMatch.objects.exists())
+        self.publish()
+        self.assertEqual(list(SavedSearchMatch.objects.values_list('saved_search__user', flat=True)), [self.alice.pk])
+
+    def test_one_digest_per_user(self):
+        self.save(self.alice, 'location=ann arbor')
+        self.save(self.alice, 'beds=1')
+        self.save(self.bob, 'location=ann arbor')
+        first = self.publish('First')
+        self.publish('Second', beds=2)
+
+        self.assertEqual(send_alerts(), (2, 5))
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), ['alice@example.com', 'bob@example.com'])
+        alice = next(message for message in mail.outbox if message.to == ['alice@example.com'])
+        self.assertIn(f'First: https://pillow.example{reverse("listing_detail", args=[first.pk])}', alice.body)
+        self.assertFalse(SavedSearchMatch.objects.filter(notified_at__isnull=True).exists())
+        self.assertEqual(send_alerts(), (0, 0))
+
+    def test_failing_user_does_not_starve_the_rest(self):
+        self.save(self.alice, 'location=ann arbor')
+        self.save(self.bob, 'location=ann arbor')
+        self.publish('First')
+        self.publish('Second')
+
+        def send_mail(**kwargs):
+            if kwargs['recipient_list'] == ['alice@example.com']:
+                raise ConnectionError('mailbox unavailable')
+            mail.outbox.append(kwargs)
+
+        # Alice sorts first and her two matches fill every batch
+        with mock.patch('listings.saved_searches.send_mail', side_effect=send_mail), \
+                self.assertLogs('listings.saved_searches', 'WARNING'):
+            self.assertEqual(send_all_alerts(batch_size=2), (1, 1))
+        self.assertEqual([message['recipient_list'] for message in mail.outbox], [['bob@example.com']])
+        pending = SavedSearchMatch.objects.filter(notified_at__isnull=True)
+        self.assertEqual(set(pending.values_list('saved_search__user', flat=True)), {self.alice.pk})
+
+        # The next run retries her
+        self.assertEqual(send_all_alerts(batch_size=2), (1, 0))
+        self.assertFalse(pending.exists())
+
+    def test_command(self):
+        self.save(self.alice, 'location=ann arbor')
+        self.publish()
+        call_command('send_search_alerts', stdout=mock.Mock())
+        self.assertEqual(len(mail.outbox), 1)
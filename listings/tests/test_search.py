@@ -0,0 +1,165 @@
+import datetime
+from unittest import mock
+
+from django.core.cache import cache
+from django.http import QueryDict
+from django.test import TestCase, override_settings
+
+from listings.models import Listing, User
+from listings.search import MAX_OVERLAP_DAYS, SearchFilters, paginate
+
+from .helpers import create_listing
+
+
+@override_settings(BACKGROUND_TASKS_EAGER=True, GEOCODE_ON_SAVE=False)
+class SearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', 'owner@example.com', 'password')
+        cls.cheap = cls.listing(
+            'Cheap studio', rent=700, beds=0, city='Ann Arbor', state='MI', zip_code='48104',
+            lease_start=datetime.date(2026, 5, 1), lease_end=datetime.date(2026, 8, 31),
+            latitude=42.2780, longitude=-83.7382, gym=True,
+        )
+        cls.mid = cls.listing(
+            'Two bedroom', rent=1400, beds=2, city='Ann Arbor', state='Michigan', zip_code='48105',
+            lease_start=datetime.date(2026, 6, 1), lease_end=datetime.date(2026, 7, 31),
+            latitude=42.3000, longitude=-83.7200, gym=True, pool=True, listing_type='room',
+        )
+        cls.big = cls.listing(
+            'Big house', rent=2600, beds=4, city='Ypsilanti', state='MI', zip_code='48197',
+            lease_start=datetime.date(2026, 1, 1), lease_end=datetime.date(2026, 12, 31),
+            latitude=42.2411, longitude=-83.6130, pool=True,
+        )
+        cls.far = cls.listing(
+            'Far away', rent=1000, beds=1, city='Detroit', state='MI', zip_code='48201',
+            lease_start=datetime.date(2026, 8, 20), lease_end=datetime.date(2026, 12, 31),
+            latitude=42.3314, longitude=-83.0458,
+        )
+        # Never searchable
+        cls.listing('Seeking', rent=900, beds=1, posting_type='seeking')
+        cls.listing('Rented', rent=900, beds=1, status='rented')
+
+    @classmethod
+    def listing(cls, title, **fields):
+        return create_listing(cls.owner, title, **fields)
+
+    def setUp(self):
+        # Saves inside a test never commit, so the search generation is not bumped
+        cache.clear()
+
+    def search(self, query='', sort_by='recommended', cursor=None):
+        return paginate(SearchFilters(QueryDict(query)), sort_by, cursor=cursor)
+
+    def ids(self, query='', sort_by='recommended'):
+        return self.search(query, sort_by).object_list
+
+    def test_only_active_offerings(self):
+        self.assertCountEqual(self.ids(), [self.cheap.pk, self.mid.pk, self.big.pk, self.far.pk])
+
+    def test_price_and_beds(self):
+        self.assertCountEqual(self.ids('max_price=1500'), [self.cheap.pk, self.mid.pk, self.far.pk])
+        self.assertEqual(self.ids('max_price=2500'), [self.big.pk])
+        self.assertEqual(self.ids('beds=3'), [self.big.pk])
+        self.assertEqual(self.ids('beds=0'), [self.cheap.pk])
+        self.assertEqual(self.ids('listing_type=room'), [self.mid.pk])
+
+    def test_bad_numbers_are_ignored(self):
+        everything = self.ids()
+        for query in ['beds=%C2%B2', 'max_price=%C2%B2', 'beds=-1', 'max_price=99999999999999999999', 'beds=' + '9' * 5000]:
+            self.assertEqual(self.ids(query), everything, query)
+        self.assertEqual(SearchFilters(QueryDict('beds=03')).beds, '3')
+
+    def test_amenities_must_all_match(self):
+        self.assertCountEqual(self.ids('amenities=gym'), [self.cheap.pk, self.mid.pk])
+        self.assertEqual(self.ids('amenities=gym&amenities=pool'), [self.mid.pk])
+        self.assertEqual(self.ids('amenities=gym,pool,not_an_amenity'), [self.mid.pk])
+
+    def test_location_ranks_exact_city_first(self):
+        self.assertCountEqual(self.ids('location=ann arbor'), [self.cheap.pk, self.mid.pk])
+        self.assertEqual(self.ids('location=48197'), [self.big.pk])
+        # The state matches everything; the city match comes first
+        self.assertEqual(self.ids('location=ypsilanti')[0], self.big.pk)
+        self.assertEqual(len(self.ids('location=michigan')), 4)
+
+    def test_dates_contain(self):
+        ids = self.ids('start_date=2026-06-01&end_date=2026-07-31')
+        self.assertCountEqual(ids, [self.cheap.pk, self.mid.pk, self.big.pk])
+
+    def test_dates_overlap(self):
+        query = 'start_date=2026-08-01&end_date=2026-09-30&date_mode=overlap'
+        self.assertCountEqual(self.ids(query), [self.cheap.pk, self.big.pk, self.far.pk])
+        # cheap overlaps 31 days, far 42 and big the whole 61
+        self.assertCountEqual(self.ids(query + '&min_overlap_days=35'), [self.big.pk, self.far.pk])
+        self.assertCountEqual(self.ids(query + '&min_overlap_days=42'), [self.big.pk, self.far.pk])
+        self.assertEqual(self.ids(query + '&min_overlap_days=43'), [self.big.pk])
+
+    def test_overlap_longer_than_the_range_is_clamped(self):
+        query = 'start_date=2026-08-01&end_date=2026-09-30&date_mode=overlap'
+        for days in ['61', '62', '100000000', '9999999999']:
+            filters = SearchFilters(QueryDict(f'{query}&min_overlap_days={days}'))
+            self.assertEqual(filters.min_overlap_days, 61)
+            self.assertEqual(self.ids(f'{query}&min_overlap_days={days}'), [self.big.pk])
+
+        # With an open-ended range only MAX_OVERLAP_DAYS applies, and nothing overflows
+        for query in ['start_date=2026-01-01', 'end_date=2026-12-31', 'start_date=9999-12-01', 'end_date=0001-01-02']:
+            query += '&date_mode=overlap&min_overlap_days=100000000'
+            self.assertEqual(SearchFilters(QueryDict(query)).min_overlap_days, MAX_OVERLAP_DAYS)
+            self.assertEqual(self.ids(query), [], query)
+        response = self.client.get('/search/', {
+            'date_mode': 'overlap', 'start_date': '2026-01-01', 'min_overlap_days': '9999999999',
+        }, secure=True)
+        self.assertEqual(response.status_code, 200)
+
+    def test_near_and_bbox(self):
+        self.assertCountEqual(self.ids('near=42.28,-83.74&radius=3'), [self.cheap.pk, self.mid.pk])
+        self.assertCountEqual(self.ids('near=42.28,-83.74&radius=10'), [self.cheap.pk, self.mid.pk, self.big.pk])
+        self.assertEqual(self.ids('bbox=42.2,-83.1,42.4,-83.0'), [self.far.pk])
+        # Out-of-range input is ignored rather than failing
+        self.assertEqual(len(self.ids('near=95,-83.74&bbox=nan,1,2,3')), 4)
+
+    def test_sorts(self):
+        self.assertEqual(self.ids(sort_by='price_low'), [self.cheap.pk, self.far.pk, self.mid.pk, self.big.pk])
+        self.assertEqual(self.ids(sort_by='price_high'), [self.big.pk, self.mid.pk, self.far.pk, self.cheap.pk])
+        self.assertEqual(self.ids(sort_by='newest'), [self.far.pk, self.big.pk, self.mid.pk, self.cheap.pk])
+        self.assertEqual(
+            self.ids('near=42.28,-83.74&radius=100', sort_by='distance'),
+            [self.cheap.pk, self.mid.pk, self.big.pk, self.far.pk],
+        )
+        # Without a point, distance falls back to the default order
+        self.assertEqual(self.ids(sort_by='distance'), self.ids())
+
+    def test_boost_ranks_first(self):
+        Listing.objects.filter(pk=self.cheap.pk).update(is_boosted=True)
+        listing = Listing.objects.get(pk=self.cheap.pk)
+        listing.boosted_until = None
+        listing.save()
+        self.assertEqual(self.ids()[0], self.cheap.pk)
+
+    def test_equal_filters_share_a_cache_key(self):
+        first = SearchFilters(QueryDict('location=Ann%20Arbor&amenities=pool&amenities=gym&beds=2'))
+        second = SearchFilters(QueryDict('beds=2&amenities=gym,pool&location=ann  arbor'))
+        self.assertEqual(first.cache_key(), second.cache_key())
+        self.assertNotEqual(first.cache_key(), SearchFilters(QueryDict('beds=3')).cache_key())
+
+    def test_keyset_pages_walk_every_result_once(self):
+        everything = self.ids(sort_by='price_low')
+        with mock.patch('listings.search.RESULTS_PER_PAGE', 3):
+            first = self.search(sort_by='price_low')
+            self.assertEqual(first.count, 4)
+            self.assertFalse(first.has_previous())
+            second = self.search(sort_by='price_low', cursor=first.next_params['cursor'])
+            self.assertEqual(second.number, 2)
+            self.assertEqual(second.count, 4)
+            self.assertFalse(second.has_next())
+            self.assertEqual(first.object_list + second.object_list, everything)
+            back = self.search(sort_by='price_low', cursor=second.previous_params['cursor'])
+            self.assertEqual(back.object_list, first.object_list)
+
+    def test_cursor_from_another_sort_restarts(self):
+        with mock.patch('listings.search.RESULTS_PER_PAGE', 2):
+            cursor = self.search(sort_by='price_low').next_params['cursor']
+            page = self.search(sort_by='price_high', cursor=cursor)
+        self.assertEqual(page.number, 1)
+        self.assertEqual(page.object_list, [self.big.pk, self.mid.pk])
@@ -0,0 +1,102 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.http import QueryDict
+from django.test import TestCase, override_settings
+
+from listings.models import User
+from listings.search import SearchFilters, paginate, search_page
+from listings.search_cache import GENERATION_KEY, bump_generation, cached_count, get_generation
+
+from .helpers import create_listing
+
+
+@override_settings(BACKGROUND_TASKS_EAGER=True, GEOCODE_ON_SAVE=False)
+class CountCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', 'owner@example.com', 'password')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_count_runs_once_per_generation(self):
+        filters = SearchFilters(QueryDict('beds=2'))
+        count = mock.Mock(return_value=3)
+        self.assertEqual(cached_count(filters, count), 3)
+        self.assertEqual(cached_count(SearchFilters(QueryDict('beds=02')), count), 3)
+        self.assertEqual(count.call_count, 1)
+
+        count.return_value = 4
+        bump_generation()
+        self.assertEqual(cached_count(filters, count), 4)
+        self.assertEqual(count.call_count, 2)
+
+    def test_lost_generation_never_reuses_old_keys(self):
+        first = get_generation()
+        cache.delete(GENERATION_KEY)
+        with mock.patch('listings.search_cache.time.time', return_value=first + 60):
+            self.assertGreater(get_generation(), first)
+
+    def test_committed_listing_change_invalidates_counts(self):
+        create_listing(self.owner)
+        filters = SearchFilters(QueryDict(''))
+        self.assertEqual(paginate(filters, 'newest').count, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            create_listing(self.owner, 'Second room')
+        self.assertEqual(paginate(filters, 'newest').count, 2)
+
+    def test_uncommitted_change_keeps_the_cached_count(self):
+        create_listing(self.owner)
+        filters = SearchFilters(QueryDict(''))
+        self.assertEqual(paginate(filters, 'newest').count, 1)
+        create_listing(self.owner, 'Second room')
+        self.assertEqual(paginate(filters, 'newest').count, 1)
+
+
+@override_settings(BACKGROUND_TASKS_EAGER=True, GEOCODE_ON_SAVE=False)
+class PageCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', 'owner@example.com', 'password')
+        cls.first = create_listing(cls.owner, 'First', rent=900)
+        cls.second = create_listing(cls.owner, 'Second', rent=1100)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_page_is_served_from_the_cache_until_the_generation_changes(self):
+        filters = SearchFilters(QueryDict(''))
+        page = search_page(filters, 'price_low')
+        self.assertEqual(page.object_list, [self.first.pk, self.second.pk])
+        self.assertEqual(page.count, 2)
+
+        with mock.patch('listings.search.paginate') as paginate_mock:
+            again = search_page(filters, 'price_low')
+        paginate_mock.assert_not_called()
+        self.assertEqual(again.as_dict(), page.as_dict())
+
+        bump_generation()
+        with mock.patch('listings.search.paginate', wraps=paginate) as paginate_mock:
+            search_page(filters, 'price_low')
+        paginate_mock.assert_called_once()
+
+    def test_sorts_are_cached_separately(self):
+        filters = SearchFilters(QueryDict(''))
+        self.assertEqual(search_page(filters, 'price_low').object_list, [self.first.pk, self.second.pk])
+        self.assertEqual(search_page(filters, 'price_high').object_list, [self.second.pk, self.first.pk])
+
+    def test_cursor_and_offset_pages_are_cached_separately(self):
+        filters = SearchFilters(QueryDict(''))
+        with mock.patch('listings.search.RESULTS_PER_PAGE', 1):
+            first = search_page(filters, 'price_low')
+            second = search_page(filters, 'price_low', cursor=first.next_params['cursor'])
+            offset = search_page(filters, 'price_low', page='2')
+        self.assertEqual(first.object_list, [self.first.pk])
+        self.assertEqual(second.object_list, [self.second.pk])
+        self.assertEqual(offset.object_list, [self.second.pk])
+        self.assertEqual(offset.next_params, None)
+        self.assertEqual(offset.previous_params, {'page': 1})
@@ -0,0 +1,88 @@
+import hashlib
+import os
+import time
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase
+from django.urls import reverse
+
+from listings.storage import content_hash
+
+from .helpers import TemporaryMediaMixin, photo
+
+
+class ContentAddressedStorageTests(TemporaryMediaMixin, TestCase):
+
+    def make_old(self, name, seconds=2 * 86400):
+        past = time.time() - seconds
+        os.utime(default_storage.path(name), (past, past))
+
+    def test_named_after_the_content_hash(self):
+        data = photo()
+        name = default_storage.save('listings/My Photo.JPG', ContentFile(data))
+        digest = hashlib.sha256(data).hexdigest()
+        self.assertEqual(name, f'{digest[:2]}/{digest}.jpg')
+        self.assertEqual(content_hash(name), digest)
+        with default_storage.open(name) as f:
+            self.assertEqual(f.read(), data)
+
+    def test_identical_bytes_are_stored_once(self):
+        first = default_storage.save('a.jpg', ContentFile(photo()))
+        second = default_storage.save('b.jpg', ContentFile(photo()))
+        other = default_storage.save('c.jpg', ContentFile(photo(seed=3)))
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        self.assertEqual(sorted(default_storage.hashed_names()), sorted([first, other]))
+        # No temporary files are left behind
+        self.assertFalse([f for f in os.listdir(default_storage.location) if f.startswith('.upload-')])
+
+    def test_delete_keeps_shared_files(self):
+        name = default_storage.save('a.jpg', ContentFile(photo()))
+        default_storage.delete(name)
+        self.assertTrue(default_storage.exists(name))
+
+    def test_prune_removes_old_unreferenced_files(self):
+        kept = default_storage.save('a.jpg', ContentFile(photo()))
+        unreferenced = default_storage.save('b.jpg', ContentFile(photo(seed=3)))
+        recent = default_storage.save('c.jpg', ContentFile(photo(seed=5)))
+        self.make_old(kept)
+        self.make_old(unreferenced)
+        self.assertEqual(default_storage.prune({kept}, dry_run=True), [unreferenced])
+        self.assertTrue(default_storage.exists(unreferenced))
+        self.assertEqual(default_storage.prune({kept}), [unreferenced])
+        self.assertFalse(default_storage.exists(unreferenced))
+        self.assertTrue(default_storage.exists(recent))
+
+    def test_saving_again_restarts_the_prune_clock(self):
+        name = default_storage.save('a.jpg', ContentFile(photo()))
+        self.make_old(name)
+        self.assertEqual(default_storage.save('b.jpg', ContentFile(photo())), name)
+        self.assertEqual(default_storage.prune(set()), [])
+        self.assertTrue(default_storage.exists(name))
+
+
+class ServeMediaTests(TemporaryMediaMixin, TestCase):
+
+    def get(self, name, **headers):
+        return self.client.get(reverse('media', args=[name]), secure=True, headers=headers)
+
+    def test_hashed_files_are_immutable(self):
+        name = default_storage.save('a.jpg', ContentFile(photo()))
+        response = self.get(name)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response['ETag'], f'"{content_hash(name)}"')
+        cache_control = response['Cache-Control']
+        self.assertIn('immutable', cache_control)
+        self.assertIn('max-age=31536000', cache_control)
+        self.assertEqual(b''.join(response.streaming_content), photo())
+
+    def test_matching_etag_is_not_modified(self):
+        name = default_storage.save('a.jpg', ContentFile(photo()))
+        response = self.get(name, if_none_match=f'"{content_hash(name)}"')
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.get(name, if_none_match='"other"').status_code, 200)
+
+    def test_missing_file_is_not_found(self):
+        self.assertEqual(self.get('ab/' + 'a' * 64 + '.jpg').status_code, 404)
@@ -0,0 +1,71 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from listings.jobs import reconcile_unread_counts
+from listings.models import Conversation, Message, User
+from listings.unread import decrement_unread, get_unread_count, unread_key
+
+from .helpers import create_listing
+
+
+@override_settings(BACKGROUND_TASKS_EAGER=True, GEOCODE_ON_SAVE=False)
+class UnreadCountTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', 'owner@example.com', 'password')
+        cls.renter = User.objects.create_user('renter', 'renter@example.com', 'password')
+        cls.listing = create_listing(cls.owner)
+
+    def setUp(self):
+        cache.delete_many([unread_key(self.owner.pk), unread_key(self.renter.pk)])
+
+    def send(self, sender, recipient, body):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Message.objects.create(
+                listing=self.listing, sender=sender, recipient=recipient, subject='Room', body=body,
+            )
+
+    def test_counters_follow_send_and_read(self):
+        self.assertEqual(get_unread_count(self.owner.pk), 0)
+        self.send(self.renter, self.owner, 'One')
+        self.send(self.renter, self.owner, 'Two')
+        self.assertEqual(cache.get(unread_key(self.owner.pk)), 2)
+
+        conversation = Conversation.objects.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            conversation.mark_read(self.owner)
+        self.assertEqual(get_unread_count(self.owner.pk), 0)
+
+    def test_missing_counter_is_seeded_from_the_database(self):
+        self.send(self.renter, self.owner, 'One')
+        cache.delete(unread_key(self.owner.pk))
+        self.assertEqual(get_unread_count(self.owner.pk), 1)
+        self.assertEqual(cache.get(unread_key(self.owner.pk)), 1)
+
+    def test_counter_below_zero_is_recounted(self):
+        self.send(self.renter, self.owner, 'One')
+        self.send(self.renter, self.owner, 'Two')
+        # An increment lost to a racing update
+        cache.set(unread_key(self.owner.pk), 1)
+        Message.objects.filter(pk=Message.objects.first().pk).update(is_read=True)
+        decrement_unread(self.owner.pk, 2)
+        self.assertEqual(cache.get(unread_key(self.owner.pk)), 1)
+
+    def test_badge_reads_the_counter(self):
+        self.send(self.renter, self.owner, 'One')
+        cache.set(unread_key(self.owner.pk), 7)
+        self.client.force_login(self.owner)
+        response = self.client.get(reverse('inbox'), secure=True)
+        self.assertEqual(response.context['unread_message_count'], 7)
+
+    def test_reconcile_repairs_drifted_counters(self):
+        self.send(self.renter, self.owner, 'One')
+        cache.set(unread_key(self.owner.pk), 4)
+        cache.set(unread_key(self.renter.pk), 0)
+        self.assertEqual(reconcile_unread_counts(dry_run=True).rows, 1)
+        self.assertEqual(cache.get(unread_key(self.owner.pk)), 4)
+        self.assertEqual(reconcile_unread_counts().rows, 1)
+        self.assertEqual(cache.get(unread_key(self.owner.pk)), 1)
+        self.assertEqual(reconcile_unread_counts().rows, 0)
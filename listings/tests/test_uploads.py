@@ -0,0 +1,120 @@
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from listings.background import get_executor
+from listings.jobs import retry_lost_uploads
+from listings.models import ListingImage, User
+from listings.uploads import queue_uploads, retry_uploads, spool_images, upload_image
+
+from .helpers import TemporaryMediaMixin, create_listing, photo
+
+
+@override_settings(BACKGROUND_TASKS_EAGER=True, GEOCODE_ON_SAVE=False)
+class UploadTests(TemporaryMediaMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        owner = User.objects.create_user('owner', 'owner@example.com', 'password')
+        cls.listing = create_listing(owner)
+
+    def setUp(self):
+        super().setUp()
+        spool = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, spool, ignore_errors=True)
+        override = override_settings(UPLOAD_SPOOL_DIR=spool)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def spool(self, count, upload=False):
+        files = [SimpleUploadedFile(f'photo{number}.JPG', photo(seed=number)) for number in range(count)]
+        with self.captureOnCommitCallbacks(execute=upload):
+            images = spool_images(self.listing, files)
+        return ListingImage.objects.filter(pk__in=[image.pk for image in images]).order_by('order')
+
+    def age(self, images):
+        ListingImage.objects.filter(pk__in=[image.pk for image in images]).update(
+            uploaded_at=timezone.now() - timedelta(hours=1),
+        )
+
+    def test_spool_then_upload(self):
+        images = self.spool(2)
+        paths = [image.spool_path for image in images]
+        self.assertEqual([image.upload_status for image in images], ['pending', 'pending'])
+        self.assertTrue(all(os.path.exists(path) and path.endswith('.jpg') for path in paths))
+        self.assertEqual(images[0].is_primary, True)
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.primary_image_id, images[0].pk)
+
+        self.assertEqual([upload_image(image.pk) for image in images], [True, True])
+        for image in ListingImage.objects.filter(pk__in=[image.pk for image in images]):
+            self.assertTrue(image.is_ready())
+            self.assertEqual(image.spool_path, '')
+            self.assertTrue(default_storage.exists(image.original))
+            self.assertEqual(len(image.content_hash), 64)
+        self.assertFalse(any(os.path.exists(path) for path in paths))
+        # Claimed once: a second attempt does nothing
+        self.assertFalse(upload_image(images[0].pk))
+
+    def test_uploads_run_after_commit(self):
+        [image] = self.spool(1, upload=True)
+        self.assertEqual(image.upload_status, 'ready')
+
+    def test_uploads_use_their_own_pool(self):
+        with mock.patch('listings.uploads.submit_to') as submit_to:
+            queue_uploads([1, 2])
+        submit_to.assert_has_calls([mock.call('uploads', upload_image, 1), mock.call('uploads', upload_image, 2)])
+
+    @override_settings(BACKGROUND_WORKERS=1, UPLOAD_WORKERS=3)
+    def test_pool_sizes(self):
+        with mock.patch('listings.background._executors', {}):
+            self.assertEqual(get_executor()._max_workers, 1)
+            self.assertEqual(get_executor('uploads')._max_workers, 3)
+            self.assertIsNot(get_executor('uploads'), get_executor())
+            for executor in [get_executor(), get_executor('uploads')]:
+                executor.shutdown()
+
+    def test_failed_upload_keeps_the_spool_file(self):
+        [image] = self.spool(1)
+        with mock.patch.object(ListingImage, 'save', side_effect=OSError('storage down')), \
+                self.assertLogs('listings.uploads', 'WARNING'):
+            self.assertFalse(upload_image(image.pk))
+        image.refresh_from_db()
+        self.assertEqual(image.upload_status, 'failed')
+        self.assertTrue(os.path.exists(image.spool_path))
+
+    def test_retry_uploads(self):
+        recent, lost, gone, failed = self.spool(4)
+        self.age([lost, gone, failed])
+        ListingImage.objects.filter(pk=lost.pk).update(upload_status='uploading')
+        ListingImage.objects.filter(pk=failed.pk).update(upload_status='failed')
+        os.remove(gone.spool_path)
+
+        self.assertEqual(retry_uploads(), ([lost.pk], [gone.pk]))
+        statuses = dict(ListingImage.objects.values_list('pk', 'upload_status'))
+        self.assertEqual(
+            [statuses[image.pk] for image in [recent, lost, gone, failed]],
+            ['pending', 'pending', 'failed', 'failed'],
+        )
+        self.assertEqual(retry_uploads(include_failed=True), ([lost.pk, failed.pk], []))
+
+    def test_retry_lost_uploads_job(self):
+        images = self.spool(2)
+        self.age(images)
+        self.assertEqual(retry_lost_uploads(dry_run=True).rows, 2)
+        self.assertEqual(retry_lost_uploads().rows, 2)
+        self.assertTrue(all(image.is_ready() for image in ListingImage.objects.all()))
+
+    def test_retry_lost_uploads_needs_the_spool(self):
+        images = self.spool(1)
+        self.age(images)
+        with override_settings(UPLOAD_SPOOL_DIR='/nonexistent/spool'), self.assertLogs('listings.jobs', 'WARNING'):
+            self.assertEqual(retry_lost_uploads().rows, 0)
+        self.assertEqual(ListingImage.objects.get().upload_status, 'pending')
@@ -0,0 +1,68 @@
+"""Per-user unread message counts kept in the cache for the nav badge
+
+Every page shows the badge, so the count is read from the cache rather
+than counted in the database. Sending a message increments the
+recipient's counter and Conversation.mark_read() decrements it, both once
+the transaction commits. A missing counter is recounted on the next page
+view. Counters expire after UNREAD_COUNT_TIMEOUT, and the
+reconcile_unread_counts job repairs any that have drifted in between.
+
+Redis increments atomically, but DatabaseCache's incr() and decr() are a
+get followed by a set, so two updates landing together can lose one and
+leave the badge off by that much. Such drift is bounded, not prevented: a
+counter that goes negative is recounted at once, one that expires is
+recounted on the next page view (on DatabaseCache every incr()/decr()
+re-sets it with the cache's default TIMEOUT, so that is soon after the
+last update), and the hourly reconcile_unread_counts catches the rest.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+
+def unread_key(user_id):
+    return f'unread:{user_id}'
+
+
+def count_unread(user_id):
+    """The true count, from the database"""
+    from .models import Message  # models imports this module
+
+    return Message.objects.filter(recipient_id=user_id, is_read=False).count()
+
+
+def get_unread_count(user_id):
+    """The cached counter for a user, counted from the database when it is missing"""
+    count = cache.get(unread_key(user_id))
+    if count is None:
+        count = count_unread(user_id)
+        # add() so a counter another request has just started isn't overwritten
+        cache.add(unread_key(user_id), count, settings.UNREAD_COUNT_TIMEOUT)
+    return count
+
+
+def increment_unread(user_id, delta=1):
+    try:
+        cache.incr(unread_key(user_id), delta)
+    except ValueError:
+        # No counter yet; the next read counts from the database
+        pass
+
+
+def decrement_unread(user_id, delta=1):
+    try:
+        count = cache.decr(unread_key(user_id), delta)
+    except ValueError:
+        return
+    if count < 0:
+        # Out of range, so an earlier update was lost; start again from the truth
+        cache.set(unread_key(user_id), count_unread(user_id), settings.UNREAD_COUNT_TIMEOUT)
+
+
+def cached_unread_counts(user_ids):
+    """{user id: cached count} for the users that have a counter"""
+    keys = {unread_key(user_id): user_id for user_id in user_ids}
+    return {keys[key]: count for key, count in cache.get_many(keys).items()}
+
+
+def set_unread_counts(counts):
+    cache.set_many({unread_key(user_id): count for user_id, count in counts.items()}, settings.UNREAD_COUNT_TIMEOUT)
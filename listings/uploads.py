@@ -0,0 +1,109 @@
+"""Listing photo uploads pushed to storage after the request
+
+create_listing only copies each photo into UPLOAD_SPOOL_DIR and creates
+a pending ListingImage; the push to storage runs once the listing is
+committed, one task per photo on the uploads pool, so up to UPLOAD_WORKERS
+photos upload at once without waiting behind other background work.
+Pages show a placeholder for an image until it is ready. A photo whose
+upload failed, or whose process died mid-upload, keeps its spool file and
+is retried by the retry_lost_uploads job (or upload_pending_images). That
+job has to run where the spool is, so UPLOAD_SPOOL_DIR must be persistent
+storage that the web processes and the job's worker share.
+"""
+import logging
+import os
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.db import transaction
+from django.utils import timezone
+
+from .background import submit_to
+from .models import Listing, ListingImage, assign_positions, refresh_primary_images
+
+
+logger = logging.getLogger(__name__)
+
+# An upload still pending or in progress after this long is assumed lost
+STALE_AFTER = timedelta(minutes=15)
+
+
+def spool_file(uploaded):
+    os.makedirs(settings.UPLOAD_SPOOL_DIR, exist_ok=True)
+    extension = os.path.splitext(uploaded.name)[1].lower()[:10]
+    with tempfile.NamedTemporaryFile(dir=settings.UPLOAD_SPOOL_DIR, suffix=extension, delete=False) as f:
+        for chunk in uploaded.chunks():
+            f.write(chunk)
+    return f.name
+
+
+def spool_images(listing, files):
+    """Spool uploaded files as pending images of ``listing``; they upload after commit"""
+    images = [
+        ListingImage(listing=listing, upload_status='pending', spool_path=spool_file(uploaded))
+        for uploaded in files
+    ]
+    if not images:
+        return []
+    # Upload order is display order; the first photo is the cover
+    assign_positions(images)
+    ListingImage.objects.bulk_create(images)
+    # bulk_create skips ListingImage.save()
+    refresh_primary_images(Listing.objects.filter(pk=listing.pk))
+    image_ids = [image.pk for image in images]
+    transaction.on_commit(lambda: queue_uploads(image_ids))
+    return images
+
+
+def queue_uploads(image_ids):
+    for image_id in image_ids:
+        submit_to('uploads', upload_image, image_id)
+
+
+def upload_image(image_id):
+    """Push one spooled image to storage; True once it is ready"""
+    # Claim the row so a retry can't upload it a second time
+    claimed = ListingImage.objects.filter(pk=image_id, upload_status='pending').update(upload_status='uploading')
+    if not claimed:
+        return False
+    listing_image = ListingImage.objects.select_related('listing').get(pk=image_id)
+    path = listing_image.spool_path
+    try:
+        with open(path, 'rb') as f:
+            listing_image.image = UploadedFile(f, name=os.path.basename(path))
+            listing_image.upload_status = 'ready'
+            listing_image.spool_path = ''
+            listing_image.save(update_fields=['image', 'upload_status', 'spool_path'])
+    except Exception as e:
+        # Storage errors vary by backend; the spool file stays for a retry
+        logger.warning('Upload of listing image %s failed: %s', image_id, e)
+        ListingImage.objects.filter(pk=image_id).update(upload_status='failed')
+        return False
+    os.remove(path)
+    return True
+
+
+def stuck_uploads(include_failed=False):
+    """Images still waiting long after their upload should have finished"""
+    statuses = ['pending', 'uploading'] + (['failed'] if include_failed else [])
+    return ListingImage.objects.filter(
+        upload_status__in=statuses, uploaded_at__lt=timezone.now() - STALE_AFTER,
+    ).exclude(spool_path='')
+
+
+def retry_uploads(include_failed=False):
+    """Re-queue lost or failed uploads whose spool file is still there
+
+    Returns (queued, abandoned); images whose spool file is gone are
+    marked failed and left for the owner to replace.
+    """
+    stuck = stuck_uploads(include_failed)
+    queued = []
+    abandoned = []
+    for image_id, path in stuck.values_list('pk', 'spool_path'):
+        (queued if os.path.exists(path) else abandoned).append(image_id)
+    ListingImage.objects.filter(pk__in=queued).update(upload_status='pending')
+    ListingImage.objects.filter(pk__in=abandoned).update(upload_status='failed', spool_path='')
+    return queued, abandoned
@@ -4,10 +4,13 @@ from . import views
 urlpatterns = [
     path('', views.landing, name='landing'),
     path('search/', views.search_results, name='search_results'),
+    path('search/map/', views.search_map, name='search_map'),
+    path('search/autocomplete/', views.location_autocomplete, name='location_autocomplete'),
     path('listings/<int:pk>/', views.listing_detail, name='listing_detail'),
     path('listings/create/', views.create_listing, name='create_listing'),
     path('listings/<int:pk>/edit/', views.edit_listing, name='edit_listing'),
     path('listings/<int:pk>/delete/', views.delete_listing, name='delete_listing'),
+    path('listings/<int:pk>/photos/arrange/', views.arrange_listing_images, name='arrange_listing_images'),
     path('listings/<int:pk>/bump/', views.bump_listing, name='bump_listing'),
     path('listings/<int:pk>/boost/', views.boost_listing, name='boost_listing'),
     path('listings/<int:pk>/boost/success/', views.boost_success, name='boost_success'),
@@ -15,10 +18,15 @@ urlpatterns = [
     path('my-listings/', views.my_listings, name='my_listings'),
     path('saved/', views.saved_listings, name='saved_listings'),
     path('listings/<int:pk>/toggle-save/', views.toggle_save, name='toggle_save'),
+    path('saved-searches/', views.saved_searches, name='saved_searches'),
+    path('saved-searches/save/', views.save_search_view, name='save_search'),
+    path('saved-searches/<int:pk>/toggle/', views.toggle_search_alerts, name='toggle_search_alerts'),
+    path('saved-searches/<int:pk>/delete/', views.delete_saved_search, name='delete_saved_search'),
     
     # Messaging System
     path('listings/<int:pk>/message/', views.send_message, name='send_message'),
     path('listings/<int:pk>/inquiry/', views.inquiry_form, name='inquiry_form'),
     path('inbox/', views.inbox, name='inbox'),
+    path('inbox/<int:pk>/', views.conversation_detail, name='conversation_detail'),
     path('messages/<int:pk>/', views.message_detail, name='message_detail'),
 ]
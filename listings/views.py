@@ -1,17 +1,33 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.core.paginator import Paginator
-from django.db.models import Q
-from .models import Listing, SavedListing, ContactMessage, ListingImage, Message
+from django.db.models import Case, Sum, When
+from .models import Listing, SavedListing, ContactMessage, Conversation, Message, Campus, SavedSearch, AMENITY_CHOICES, arrange_images
 from .forms import ListingForm, ContactForm
-from django.http import HttpResponse
+from .search import DEFAULT_SORT, SearchFilters, search_page, hydrate
+from .pagination import page_url
+from .autocomplete import location_index
+from .facets import facet_counts
+from .saved_searches import query_string, save_search
+from .map_clusters import MapRequest
+from .search_cache import get_generation
+from .uploads import spool_images
+from .storage import IMMUTABLE_MAX_AGE, content_hash
+from django.core.paginator import Paginator
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
 from django.utils import timezone
 from django.core.mail import send_mail
 from django.template.loader import render_to_string
-from datetime import datetime
 from django.conf import settings
 from django.urls import reverse
+from django.core.files.storage import default_storage
+import math
+import mimetypes
+
+
+INBOX_PAGE_SIZE = 20
 
 
 def landing(request):
@@ -21,88 +37,67 @@ def landing(request):
 
 def search_results(request):
     """Search and filter results page - only show offerings"""
-    # Only show people offering sublets (not seeking)
-    listings = Listing.objects.filter(status='active', posting_type='offering')
-    
-    # Get query parameters
-    location = request.GET.get('location', '')
-    start_date = request.GET.get('start_date', '')
-    end_date = request.GET.get('end_date', '')
-    duration = request.GET.get('duration', '')
-    beds = request.GET.get('beds', '')
-    max_price = request.GET.get('max_price', '')
-    listing_type = request.GET.get('listing_type', '')
-    sort_by = request.GET.get('sort', 'newest')
-    
-    # Apply filters
-    if location:
-        listings = listings.filter(
-            Q(city__icontains=location) | 
-            Q(state__icontains=location) | 
-            Q(zip_code__icontains=location)
-        )
-    
-    if start_date:
-        try:
-            start_date_obj = datetime.strptime(start_date, '%Y-%m-%d').date()
-            listings = listings.filter(lease_start__lte=start_date_obj)
-        except:
-            pass
-    
-    if end_date:
-        try:
-            end_date_obj = datetime.strptime(end_date, '%Y-%m-%d').date()
-            listings = listings.filter(lease_end__gte=end_date_obj)
-        except:
-            pass
-    
-    if duration:
-        listings = listings.filter(duration_type=duration)
-    
-    if beds:
-        if beds == '3':
-            listings = listings.filter(beds__gte=3)
-        else:
-            listings = listings.filter(beds=int(beds))
-    
-    if max_price:
-        if max_price == '2500':  # Over $2,000
-            listings = listings.filter(rent__gt=2000)
-        else:
-            listings = listings.filter(rent__lte=float(max_price))
-    
-    if listing_type:
-        listings = listings.filter(listing_type=listing_type)
-    
-    # Sorting
-    if sort_by == 'price_low':
-        listings = listings.order_by('rent')
-    elif sort_by == 'price_high':
-        listings = listings.order_by('-rent')
-    elif sort_by == 'newest':
-        listings = listings.order_by('-created_at')
+    filters = SearchFilters(request.GET)
+    sort_by = request.GET.get('sort', DEFAULT_SORT)
     
-    # Pagination
-    paginator = Paginator(listings, 12)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Page of ids from the search index (cached), then full rows in one query
+    page_obj = search_page(filters, sort_by, page=request.GET.get('page'), cursor=request.GET.get('cursor'))
+    page_obj.object_list = hydrate(page_obj.object_list)
     
     context = {
         'page_obj': page_obj,
-        'location': location,
-        'start_date': start_date,
-        'end_date': end_date,
-        'duration': duration,
-        'beds': beds,
-        'max_price': max_price,
-        'listing_type': listing_type,
+        **filters.raw,
         'sort_by': sort_by,
-        'total_results': listings.count(),
+        'amenity_choices': AMENITY_CHOICES,
+        'campuses': Campus.objects.order_by('school_name'),
+        'facets': facet_counts(filters),
+        'total_results': page_obj.count,
+        'next_page_url': page_obj.has_next() and page_url(request.GET, **page_obj.next_params),
+        'previous_page_url': page_obj.has_previous() and page_url(request.GET, **page_obj.previous_params),
     }
     
     return render(request, 'listings/search_results.html', context)
 
 
+def search_map_etag(request):
+    # Changes whenever the listings generation does, so no query is needed to answer 304s
+    return f'{get_generation()}-{MapRequest(request.GET).cache_key()}'
+
+
+@condition(etag_func=search_map_etag)
+def search_map(request):
+    """Clustered map markers for every listing matching the search filters"""
+    response = JsonResponse(MapRequest(request.GET).markers())
+    patch_cache_control(response, public=True, max_age=60)
+    return response
+
+
+def media_etag(request, name):
+    # A content-addressed name is its own ETag; other files get none
+    return content_hash(name)
+
+
+@condition(etag_func=media_etag)
+def serve_media(request, name):
+    """Files from ContentAddressedStorage; hashed names never change, so they are cached for good"""
+    if not default_storage.exists(name):
+        raise Http404
+    content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+    response = FileResponse(default_storage.open(name), content_type=content_type)
+    if content_hash(name):
+        patch_cache_control(response, public=True, max_age=IMMUTABLE_MAX_AGE, immutable=True)
+    else:
+        patch_cache_control(response, public=True, max_age=3600)
+    return response
+
+
+def location_autocomplete(request):
+    """Location suggestions for a typed prefix, from the in-memory index"""
+    response = JsonResponse({'suggestions': location_index.suggest(request.GET.get('q', ''))})
+    patch_cache_control(response, public=True, max_age=300)
+    return response
+
+
 def listing_detail(request, pk):
     listing = get_object_or_404(Listing, pk=pk)
     is_saved = False
@@ -166,10 +161,8 @@ def create_listing(request):
             listing.owner = request.user
             listing.save()
             
-            # Handle image uploads
-            images = request.FILES.getlist('images')
-            for idx, img in enumerate(images):
-                ListingImage.objects.create(listing=listing, image=img, is_primary=(idx==0), order=idx)
+            # Photos are spooled here and uploaded in the background
+            spool_images(listing, request.FILES.getlist('images'))
             
             messages.success(request, 'Listing created successfully!')
             return redirect('listing_detail', pk=listing.pk)
@@ -194,6 +187,31 @@ def edit_listing(request, pk):
     return render(request, 'listings/edit.html', {'form': form, 'listing': listing})
 
 
+@login_required
+def arrange_listing_images(request, pk):
+    """Reorder a listing's photos and pick its cover in one update"""
+    listing = get_object_or_404(Listing, pk=pk, owner=request.user)
+    if request.method == 'POST':
+        positions = {}
+        for key, value in request.POST.items():
+            if key.startswith('position_'):
+                try:
+                    position = float(value)
+                    image_id = int(key[len('position_'):])
+                except ValueError:
+                    continue
+                # nan and inf have no place in a sort order
+                if math.isfinite(position):
+                    positions[image_id] = position
+        try:
+            primary = int(request.POST.get('primary', ''))
+        except ValueError:
+            primary = None
+        arrange_images(listing, sorted(positions, key=positions.get), primary)
+        messages.success(request, 'Photo order updated.')
+    return redirect('edit_listing', pk=listing.pk)
+
+
 @login_required
 def delete_listing(request, pk):
     listing = get_object_or_404(Listing, pk=pk, owner=request.user)
@@ -204,16 +222,52 @@ def delete_listing(request, pk):
 
 @login_required
 def my_listings(request):
-    listings = Listing.objects.filter(owner=request.user)
+    listings = Listing.objects.filter(owner=request.user).select_related('primary_image')
     return render(request, 'listings/my_listings.html', {'listings': listings})
 
 
 @login_required
 def saved_listings(request):
-    saved_listings = SavedListing.objects.filter(user=request.user).select_related('listing')
+    saved_listings = SavedListing.objects.filter(user=request.user).select_related('listing__primary_image')
     return render(request, 'listings/saved.html', {'saved_listings': saved_listings})
 
 
+@login_required
+def saved_searches(request):
+    searches = SavedSearch.objects.filter(user=request.user)
+    for search in searches:
+        search.url = f"{reverse('search_results')}?{query_string(search)}"
+    return render(request, 'listings/saved_searches.html', {'saved_searches': searches})
+
+
+@login_required
+def save_search_view(request):
+    if request.method == 'POST':
+        search = save_search(request.user, request.POST)
+        messages.success(request, f'Search saved! We\'ll email you about new matches for "{search.name}".')
+        return redirect('saved_searches')
+    return redirect('search_results')
+
+
+@login_required
+def toggle_search_alerts(request, pk):
+    search = get_object_or_404(SavedSearch, pk=pk, user=request.user)
+    if request.method == 'POST':
+        search.is_active = not search.is_active
+        search.save(update_fields=['is_active'])
+        messages.success(request, 'Alerts resumed.' if search.is_active else 'Alerts paused.')
+    return redirect('saved_searches')
+
+
+@login_required
+def delete_saved_search(request, pk):
+    search = get_object_or_404(SavedSearch, pk=pk, user=request.user)
+    if request.method == 'POST':
+        search.delete()
+        messages.success(request, 'Saved search deleted.')
+    return redirect('saved_searches')
+
+
 @login_required
 def toggle_save(request, pk):
     listing = get_object_or_404(Listing, pk=pk)
@@ -362,7 +416,7 @@ Message:
 {body}
 
 ---
-Reply to this message at: {request.build_absolute_uri(reverse('message_detail', args=[message.pk]))}
+Reply to this message at: {request.build_absolute_uri(reverse('conversation_detail', args=[message.conversation_id]))}
 
 Pillow Housing Team
                 ''',
@@ -384,16 +438,20 @@ Pillow Housing Team
 
 @login_required
 def inbox(request):
-    """View user's messages"""
-    received = Message.objects.filter(recipient=request.user)
-    sent = Message.objects.filter(sender=request.user)
+    """View user's conversations, most recent first"""
+    conversations = Conversation.for_user(request.user).select_related('listing', 'initiator', 'recipient')
+    page_obj = Paginator(conversations, INBOX_PAGE_SIZE).get_page(request.GET.get('page'))
+    for conversation in page_obj:
+        conversation.other_user = conversation.other_participant(request.user)
+        conversation.unread = conversation.unread_for(request.user)
     
     # Count unread
-    unread_count = received.filter(is_read=False).count()
+    unread_count = Conversation.for_user(request.user).aggregate(unread=Sum(Case(
+        When(initiator=request.user, then='initiator_unread'), default='recipient_unread',
+    )))['unread'] or 0
     
     context = {
-        'received_messages': received,
-        'sent_messages': sent,
+        'page_obj': page_obj,
         'unread_count': unread_count,
     }
     return render(request, 'listings/inbox.html', context)
@@ -401,51 +459,43 @@ def inbox(request):
 
 @login_required
 def message_detail(request, pk):
-    """View and reply to a message"""
+    """Open the conversation a message belongs to (links in notification emails point here)"""
     message = get_object_or_404(Message, pk=pk)
-    
-    # Check permissions
     if message.recipient != request.user and message.sender != request.user:
         messages.error(request, 'You do not have permission to view this message.')
         return redirect('inbox')
+    return redirect('conversation_detail', pk=message.conversation_id)
+
+
+@login_required
+def conversation_detail(request, pk):
+    """View and reply to a conversation"""
+    conversation = get_object_or_404(Conversation.objects.select_related('listing', 'initiator', 'recipient'), pk=pk)
     
-    # Mark as read if recipient
-    if message.recipient == request.user and not message.is_read:
-        message.is_read = True
-        message.save()
-    
-    # Get conversation thread
-    if message.parent_message:
-        thread = Message.objects.filter(
-            Q(pk=message.parent_message.pk) | 
-            Q(parent_message=message.parent_message)
-        ).order_by('created_at')
-    else:
-        thread = Message.objects.filter(
-            Q(pk=message.pk) | 
-            Q(parent_message=message)
-        ).order_by('created_at')
+    # Check permissions
+    if not conversation.has_participant(request.user):
+        messages.error(request, 'You do not have permission to view this message.')
+        return redirect('inbox')
     
     # Handle reply
     if request.method == 'POST':
         reply_body = request.POST.get('reply_body')
-        
-        # Determine recipient (opposite of current user)
-        reply_recipient = message.sender if message.recipient == request.user else message.recipient
+        reply_recipient = conversation.other_participant(request.user)
         
         reply_message = Message.objects.create(
-            listing=message.listing,
+            conversation=conversation,
+            listing=conversation.listing,
             sender=request.user,
             recipient=reply_recipient,
-            subject=f'Re: {message.subject}',
+            subject=f'Re: {conversation.subject}',
             body=reply_body,
-            parent_message=message.parent_message or message
+            parent_message=conversation.messages.order_by('created_at', 'pk').first(),
         )
         
         # Send email notification
         try:
             send_mail(
-                subject=f'Reply to: {message.subject}',
+                subject=f'Reply to: {conversation.subject}',
                 message=f'''
 Hello {reply_recipient.username},
 
@@ -454,7 +504,7 @@ Hello {reply_recipient.username},
 {reply_body}
 
 ---
-View conversation at: {request.build_absolute_uri(reverse('message_detail', args=[reply_message.pk]))}
+View conversation at: {request.build_absolute_uri(reverse('conversation_detail', args=[conversation.pk]))}
 
 Pillow Housing Team
                 ''',
@@ -466,10 +516,15 @@ Pillow Housing Team
             print(f"Email error: {e}")
         
         messages.success(request, 'Reply sent!')
-        return redirect('message_detail', pk=reply_message.pk)
+        return redirect('conversation_detail', pk=conversation.pk)
+    
+    # Mark as read
+    conversation.mark_read(request.user)
+    
+    thread = conversation.messages.select_related('sender').order_by('created_at', 'pk')
     
     context = {
-        'message': message,
+        'conversation': conversation,
         'thread': thread,
     }
     return render(request, 'listings/message_detail.html', context)
@@ -0,0 +1,30 @@
+// Location suggestions for any <input data-autocomplete-url="..."> via a shared <datalist>
+document.querySelectorAll('input[data-autocomplete-url]').forEach(input => {
+    const list = document.createElement('datalist');
+    list.id = input.name + 'Suggestions';
+    input.setAttribute('list', list.id);
+    input.setAttribute('autocomplete', 'off');
+    input.after(list);
+
+    let timer = null;
+    let lastQuery = '';
+    input.addEventListener('input', () => {
+        clearTimeout(timer);
+        timer = setTimeout(() => {
+            const query = input.value.trim();
+            if (!query || query === lastQuery) {
+                return;
+            }
+            lastQuery = query;
+            fetch(input.dataset.autocompleteUrl + '?q=' + encodeURIComponent(query))
+                .then(response => response.json())
+                .then(data => {
+                    list.replaceChildren(...data.suggestions.map(suggestion => {
+                        const option = document.createElement('option');
+                        option.value = suggestion.label;
+                        return option;
+                    }));
+                });
+        }, 150);
+    });
+});